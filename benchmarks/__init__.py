@@ -0,0 +1 @@
+"""Бенчмарки производительности бота (запуск: python -m benchmarks.<имя>)."""
@@ -0,0 +1,122 @@
+"""Общие утилиты бенчмарков."""
+import asyncio
+import json
+import os
+import random
+import time
+from array import array
+from typing import List, Dict, Any, Iterator
+
+# Настройки бота требуют BOT_TOKEN; для бенчмарков достаточно заглушки
+os.environ.setdefault("BOT_TOKEN", "0:benchmark")
+
+
+def iter_participants(count: int, total_laps: int = 12, seed: int = 1) -> Iterator[Dict[str, Any]]:
+    """
+    Генерирует синтетических участников гонки в формате race_2_results.json по одному.
+
+    Позиции на кругах хранятся в array, поэтому генерация 1M участников
+    не требует держать в памяти все словари.
+
+    Args:
+        count: Количество участников
+        total_laps: Количество кругов
+        seed: Зерно генератора случайных чисел
+    """
+    rng = random.Random(seed)
+    order = list(range(1, count + 1))
+    rng.shuffle(order)
+    start_positions = array('i', order)
+    del order
+    lap_positions = []
+    indexes = list(range(count))
+    for _ in range(total_laps):
+        rng.shuffle(indexes)
+        positions = array('i', [0]) * count
+        for position, idx in enumerate(indexes, 1):
+            positions[idx] = position
+        lap_positions.append(positions)
+    del indexes
+
+    for idx in range(count):
+        participant = {"user": f"user{idx}.near", "team_name": f"Team {idx}", "start_position": start_positions[idx]}
+        for lap_number, positions in enumerate(lap_positions, 1):
+            participant[f"lap{lap_number}"] = positions[idx]
+        yield participant
+
+
+def generate_participants(count: int, total_laps: int = 12, seed: int = 1) -> List[Dict[str, Any]]:
+    """
+    Генерирует синтетических участников гонки в формате race_2_results.json.
+
+    Args:
+        count: Количество участников
+        total_laps: Количество кругов
+        seed: Зерно генератора случайных чисел
+    """
+    return list(iter_participants(count, total_laps, seed))
+
+
+def write_results_file(path: str, count: int) -> int:
+    """
+    Записывает файл с результатами и возвращает его размер в байтах.
+
+    Участники пишутся по одному, чтобы файл на 1M участников не требовал
+    держать весь список в памяти.
+
+    Args:
+        path: Путь к файлу
+        count: Количество участников
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[")
+        for idx, participant in enumerate(iter_participants(count)):
+            if idx:
+                f.write(", ")
+            json.dump(participant, f)
+        f.write("]")
+    return os.path.getsize(path)
+
+
+class LoopLagMonitor:
+    """Измеряет задержку event loop: насколько позже запланированного просыпается тикер."""
+
+    def __init__(self, interval: float = 0.005):
+        """
+        Args:
+            interval: Период тикера в секундах
+        """
+        self.interval = interval
+        self.lags: List[float] = []
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, loop.time() - expected))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    def summary(self) -> str:
+        if not self.lags:
+            return "нет данных"
+        ordered = sorted(self.lags)
+        p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+        return f"max={max(ordered) * 1000:.1f} мс, p99={p99 * 1000:.1f} мс, тиков={len(ordered)}"
+
+
+def timed(func, *args, **kwargs):
+    """Выполняет функцию и возвращает (результат, время в секундах)."""
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started
@@ -0,0 +1,130 @@
+"""
+Рассылка круга во время всплеска запросов пользователей в личных сообщениях.
+
+Модель: у бота общий пул соединений с Bot API (--pool соединений, задержка
+ответа --api-latency). На старте гонки --requests пользователей присылают
+кошельки (запросы приходят равномерно за --burst-seconds), и одновременно идёт рассылка круга в --chats чатов через
+BroadcastEngine. Сравнивается обработка запросов без ограничений (как
+раньше: каждый запрос сразу проверяется и получает ответ) и через
+AdmissionController: время рассылки круга, время обработки всплеска и
+сколько запросов отклонено или схлопнуто.
+
+Запуск: python -m benchmarks.dm_burst [--requests 5000] [--burst-seconds 2] [--chats 1000] [--pool 100]
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from benchmarks.common import generate_participants
+
+from bot.admission import AdmissionController, ADMITTED, SHED
+from bot.broadcast import BroadcastEngine, OutgoingMessage
+from bot.race_data import RaceSnapshot
+from bot.settings import DM_MAX_PENDING, DM_MAX_CONCURRENCY, DM_BUSY_REPLY_WINDOW
+from bot.user_handlers import validate_user_identifier
+
+# Доля пользователей, которые в панике отправляют тот же текст повторно
+REPEAT_SHARE = 0.3
+
+
+class FakeBot:
+    """Bot API с ограниченным пулом соединений и фиксированной задержкой."""
+
+    def __init__(self, pool: int, latency: float):
+        self._pool = asyncio.Semaphore(pool)
+        self._latency = latency
+        self.calls = 0
+
+    async def send_message(self, chat_id, text, reply_markup=None):
+        async with self._pool:
+            self.calls += 1
+            await asyncio.sleep(self._latency)
+
+
+def build_requests(snapshot: RaceSnapshot, count: int):
+    """Запросы всплеска: (user_id, текст); часть пользователей повторяет свой текст."""
+    rng = random.Random(count)
+    team_name = snapshot.columns.team_name
+    requests = []
+    for user_id in range(1, count + 1):
+        text = team_name(rng.randrange(len(snapshot)))
+        requests.append((user_id, text))
+        if rng.random() < REPEAT_SHARE:
+            requests.append((user_id, text))
+    rng.shuffle(requests)
+    return requests
+
+
+async def run(name: str, snapshot: RaceSnapshot, requests, chats: int, pool: int, latency: float, burst_seconds: float, admission):
+    fake_bot = FakeBot(pool, latency)
+    engine = BroadcastEngine(fake_bot, global_rate=100000, private_chat_rate=100000, group_chat_rate=100000)
+
+    async def answer(user_id: int, text: str):
+        validate_user_identifier(text, snapshot.standings)
+        await fake_bot.send_message(user_id, text)
+
+    async def handle(user_id: int, text: str):
+        if admission is None:
+            await answer(user_id, text)
+            return
+        result, sequence = admission.admit(user_id, text)
+        if result != ADMITTED:
+            if result == SHED:
+                try:
+                    await fake_bot.send_message(user_id, "busy")
+                finally:
+                    admission.shed_replied()
+            return
+        async with admission.processing(user_id, sequence) as is_latest:
+            if is_latest:
+                await answer(user_id, text)
+
+    async def arrive(delay: float, user_id: int, text: str):
+        await asyncio.sleep(delay)
+        await handle(user_id, text)
+
+    started = time.perf_counter()
+    step = burst_seconds / len(requests)
+    burst = asyncio.gather(*(arrive(i * step, user_id, text) for i, (user_id, text) in enumerate(requests)))
+    # Рассылка круга начинается, когда всплеск уже идёт
+    await asyncio.sleep(0)
+    report = await engine.broadcast(
+        (OutgoingMessage(chat_id=-chat_id, text="lap") for chat_id in range(1, chats + 1)), label=name
+    )
+    broadcast_elapsed = time.perf_counter() - started
+    await burst
+    burst_elapsed = time.perf_counter() - started
+
+    line = (
+        f"{name}: рассылка круга {broadcast_elapsed:.2f} с (p99 {report.percentile(99):.2f} с), "
+        f"всплеск обработан за {burst_elapsed:.2f} с, вызовов Bot API {fake_bot.calls}"
+    )
+    if admission is not None:
+        stats = admission.get_stats()
+        line += (
+            f", максимум в очереди {stats['max_depth']}, повторов {stats['duplicates']}, "
+            f"отклонено {stats['shed']}"
+        )
+    print(line)
+
+
+async def main(args):
+    snapshot = RaceSnapshot.from_records(generate_participants(2000, 12), 1, None)
+    requests = build_requests(snapshot, args.requests)
+    print(f"Запросов {len(requests)} от {args.requests} пользователей, чатов {args.chats}, "
+          f"за {args.burst_seconds:g} с, пул {args.pool} соединений, задержка Bot API {args.api_latency * 1000:.0f} мс")
+    await run("без ограничений", snapshot, requests, args.chats, args.pool, args.api_latency, args.burst_seconds, None)
+    admission = AdmissionController(DM_MAX_PENDING, DM_MAX_CONCURRENCY, DM_BUSY_REPLY_WINDOW)
+    await run("контроль допуска", snapshot, requests, args.chats, args.pool, args.api_latency, args.burst_seconds, admission)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--chats", type=int, default=1000)
+    parser.add_argument("--pool", type=int, default=100)
+    parser.add_argument("--api-latency", type=float, default=0.05)
+    parser.add_argument("--burst-seconds", type=float, default=2.0, help="За сколько секунд приходят все запросы")
+    args = parser.parse_args()
+    asyncio.run(main(args))
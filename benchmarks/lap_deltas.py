@@ -0,0 +1,72 @@
+"""
+Расчёт изменений позиций и отрисовка лидерборд круга.
+
+Сравнивает прежний расчёт по списку словарей (dict.get и f-строки ключей на
+каждого участника) с пакетным расчётом по колонкам, который StandingsIndex
+выполняет один раз на снимок, и измеряет отрисовку лидерборд из колонок.
+
+Запуск: python -m benchmarks.lap_deltas [--sizes 10000 100000]
+"""
+import argparse
+
+from benchmarks.common import generate_participants, timed
+
+from bot.columnar import ParticipantColumns
+from bot.leaderboard import render_lap_leaderboard, render_final_leaderboard
+from bot.standings import StandingsIndex, _column_deltas
+
+TOTAL_LAPS = 12
+REPEATS = 5
+
+
+def best_of(func, *args):
+    """Минимальное время из REPEATS запусков, в миллисекундах."""
+    return min(timed(func, *args)[1] for _ in range(REPEATS)) * 1000
+
+
+def dict_deltas(lap_orders):
+    """Прежний расчёт изменений по отсортированным спискам словарей."""
+    deltas = {}
+    for lap_number, ordered in lap_orders.items():
+        lap_key = f"lap{lap_number}"
+        previous_key = f"lap{lap_number - 1}" if lap_number > 1 else "start_position"
+        deltas[lap_number] = [p.get(previous_key, p[lap_key]) - p[lap_key] for p in ordered]
+    return deltas
+
+
+def column_deltas(standings):
+    """Пакетный расчёт изменений по колонкам для всех кругов."""
+    columns = standings.columns
+    previous = columns.start_positions
+    deltas = {}
+    for lap_number in range(1, standings.total_laps + 1):
+        current = columns.lap_column(lap_number)
+        deltas[lap_number] = _column_deltas(previous, current)
+        previous = current
+    return deltas
+
+
+def run(count: int):
+    participants = generate_participants(count, TOTAL_LAPS)
+    standings, build_time = timed(StandingsIndex, ParticipantColumns.from_records(participants, TOTAL_LAPS))
+    lap_orders = {
+        lap_number: standings.get_records(standings.get_lap_order(lap_number))
+        for lap_number in range(1, TOTAL_LAPS + 1)
+    }
+
+    print(f"{count} участников, {TOTAL_LAPS} кругов (лучшее из {REPEATS}):")
+    print(f"  построение StandingsIndex целиком: {build_time * 1000:.1f} мс")
+    print(f"  изменения позиций: словари {best_of(dict_deltas, lap_orders):.1f} мс, "
+          f"колонки {best_of(column_deltas, standings):.1f} мс")
+
+    lap_number = TOTAL_LAPS // 2
+    print(f"  лидерборда круга: {best_of(render_lap_leaderboard, standings, lap_number):.1f} мс")
+    print(f"  финальная лидерборда: {best_of(render_final_leaderboard, standings):.1f} мс")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    args = parser.parse_args()
+    for size in args.sizes:
+        run(size)
@@ -0,0 +1,82 @@
+"""
+Время запуска и пиковое потребление памяти при загрузке файла с результатами.
+
+Каждый вариант загрузки выполняется в отдельном процессе, пиковый RSS берётся
+из getrusage(RUSAGE_SELF).ru_maxrss:
+- json.load: прежний путь (весь файл в список словарей, затем колонки и индексы)
+- потоковый: RaceDataClient.load_columns (участники сразу в колонки по одному)
+
+Запуск: python -m benchmarks.load_memory [--count 1000000] [--max-rss-mb 1500]
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import write_results_file
+
+MODES = {
+    "json": "json.load",
+    "stream": "потоковый",
+}
+
+
+def child(mode: str, path: str) -> None:
+    """Загружает файл указанным способом и печатает время и пиковый RSS."""
+    from bot.api_client import RaceDataClient
+    from bot.race_data import RaceSnapshot
+    from bot.settings import TOTAL_LAPS
+
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    client = RaceDataClient(path)
+    if mode == "json":
+        snapshot = RaceSnapshot.from_records(client.load_data(), 1, None)
+    else:
+        snapshot = RaceSnapshot(client.load_columns(TOTAL_LAPS), 1, None)
+    elapsed = time.perf_counter() - started
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{elapsed:.3f} {baseline_kb} {peak_kb} {len(snapshot)}")
+
+
+def run(mode: str, path: str):
+    """Запускает загрузку в отдельном процессе, возвращает (секунды, RSS до, пиковый RSS в МБ)."""
+    stdout = subprocess.run(
+        [sys.executable, "-m", "benchmarks.load_memory", "--child", mode, path],
+        check=True, capture_output=True, text=True
+    ).stdout
+    # Последняя строка - результат, выше - логи бота
+    output = stdout.strip().splitlines()[-1].split()
+    elapsed, baseline_kb, peak_kb = float(output[0]), int(output[1]), int(output[2])
+    return elapsed, baseline_kb / 1024, peak_kb / 1024
+
+
+def main(count: int, max_rss_mb: float) -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "race_results.json")
+        size = write_results_file(path, count)
+        print(f"Файл: {size / 1024 / 1024:.1f} МБ, {count} участников")
+
+        exceeded = False
+        for mode, label in MODES.items():
+            elapsed, baseline, peak = run(mode, path)
+            print(f"{label}: загрузка и индексы {elapsed:.1f} с, RSS после импорта {baseline:.0f} МБ, пиковый RSS {peak:.0f} МБ")
+            if mode == "stream" and max_rss_mb and peak > max_rss_mb:
+                print(f"❌ Пиковый RSS потоковой загрузки превышает бюджет {max_rss_mb:.0f} МБ")
+                exceeded = True
+        return 1 if exceeded else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=1_000_000)
+    parser.add_argument("--max-rss-mb", type=float, default=0, help="бюджет пикового RSS потоковой загрузки (0 - без проверки)")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(*args.child)
+    else:
+        sys.exit(main(args.count, args.max_rss_mb))
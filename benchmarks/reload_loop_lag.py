@@ -0,0 +1,60 @@
+"""
+Задержка event loop при перезагрузке большого файла с результатами.
+
+Сравнивает загрузку прямо в корутине (как раньше) и RaceDataStore.refresh(),
+который читает, разбирает и индексирует файл вне event loop.
+
+Запуск: python -m benchmarks.reload_loop_lag [--size-mb 50]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+
+from benchmarks.common import LoopLagMonitor, write_results_file
+
+from bot.api_client import RaceDataClient
+from bot.race_data import RaceDataStore, RaceSnapshot
+
+# Примерный размер одного участника в JSON (12 кругов), байт
+BYTES_PER_PARTICIPANT = 230
+
+
+async def measure(name: str, reload_coro_factory):
+    monitor = LoopLagMonitor()
+    monitor.start()
+    await asyncio.sleep(0.05)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    await reload_coro_factory()
+    elapsed = loop.time() - started
+    await asyncio.sleep(0.05)
+    await monitor.stop()
+    print(f"{name}: перезагрузка {elapsed:.2f} с, задержка event loop {monitor.summary()}")
+
+
+async def main(size_mb: float):
+    count = int(size_mb * 1024 * 1024 / BYTES_PER_PARTICIPANT)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "race_results.json")
+        size = write_results_file(path, count)
+        print(f"Файл: {size / 1024 / 1024:.1f} МБ, {count} участников")
+
+        async def inline_reload():
+            # Прежнее поведение: open + json.load + валидация + индексы в event loop
+            RaceSnapshot.from_records(RaceDataClient(path).load_data(), 1, None)
+
+        store = RaceDataStore(RaceDataClient(path))
+
+        async def offloaded_reload():
+            await store.refresh(force=True)
+
+        await measure("до (в event loop)", inline_reload)
+        await measure("после (refresh вне event loop)", offloaded_reload)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-mb", type=float, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.size_mb))
@@ -0,0 +1,89 @@
+"""
+Рассылка круга и ответы пользователям при общем лимите Bot API.
+
+Модель: глобальный лимит бота --rate сообщений в секунду, задержка ответа
+Bot API --api-latency. На границе круга уходит рассылка в --chats чатов
+(лидерборды и персональные обновления), а --replies пользователей ждут ответа
+на /start, /language или ввод кошелька: запросы приходят равномерно за
+--reply-seconds, рассылка начинается через --broadcast-at секунд, когда
+очередь ответов уже накопилась. Сравнивается общая очередь отправки (FIFO, как раньше)
+и приоритетная (BroadcastEngine.reply): время рассылки круга, задержка ответов
+и доля доставок в пределах SLO по классам.
+
+Запуск: python -m benchmarks.reply_priority [--chats 550] [--replies 300] [--rate 30]
+"""
+import argparse
+import asyncio
+import time
+
+import benchmarks.common  # noqa: F401 - заглушка BOT_TOKEN для настроек бота
+
+from bot.broadcast import BroadcastEngine, OutgoingMessage, PRIORITY_LAP, PRIORITY_NAMES, PRIORITY_REPLY
+from bot.settings import BROADCAST_MAX_CONCURRENCY, REPLY_DELIVERY_SLO
+
+
+class FakeBot:
+    """Bot API с фиксированной задержкой ответа."""
+
+    def __init__(self, latency: float):
+        self._latency = latency
+        self.calls = 0
+
+    async def send_message(self, chat_id, text, reply_markup=None):
+        self.calls += 1
+        await asyncio.sleep(self._latency)
+
+
+async def run(name: str, prioritized: bool, chats: int, replies: int, reply_seconds: float, broadcast_at: float,
+              rate: float, latency: float):
+    fake_bot = FakeBot(latency)
+    engine = BroadcastEngine(
+        fake_bot, max_concurrency=BROADCAST_MAX_CONCURRENCY,
+        global_rate=rate, private_chat_rate=100000, group_chat_rate=100000
+    )
+
+    async def answer(user_id: int):
+        await asyncio.sleep(user_id * reply_seconds / replies)
+        request = lambda: fake_bot.send_message(user_id, "reply")
+        if prioritized:
+            await engine.reply(user_id, request)
+            return
+        # Общая очередь: ответ занимает слот наравне с рассылкой
+        started = time.monotonic()
+        await engine._call(user_id, PRIORITY_LAP, request)
+        engine.slo.record(PRIORITY_NAMES[PRIORITY_REPLY], REPLY_DELIVERY_SLO, time.monotonic() - started)
+
+    burst = asyncio.gather(*(answer(user_id) for user_id in range(1, replies + 1)))
+    await asyncio.sleep(broadcast_at)
+    started = time.perf_counter()
+    await engine.broadcast(
+        (OutgoingMessage(chat_id=-chat_id, text="lap") for chat_id in range(1, chats + 1)), label=name
+    )
+    broadcast_elapsed = time.perf_counter() - started
+    await burst
+
+    print(f"{name}: рассылка круга {broadcast_elapsed:.2f} с, вызовов Bot API {fake_bot.calls}")
+    for class_name, stats in engine.slo.get_stats().items():
+        print(
+            f"  {class_name}: {stats['delivered']}, p50 {stats['p50']:.2f} с, p99 {stats['p99']:.2f} с, "
+            f"в пределах SLO {stats['slo']:g} с {stats['within_slo']:.1%}"
+        )
+
+
+async def main(args):
+    print(f"Чатов {args.chats}, ответов {args.replies} за {args.reply_seconds:g} с, рассылка через {args.broadcast_at:g} с, "
+          f"лимит {args.rate:g} сообщений/с, задержка Bot API {args.api_latency * 1000:.0f} мс")
+    for name, prioritized in (("общая очередь", False), ("приоритеты", True)):
+        await run(name, prioritized, args.chats, args.replies, args.reply_seconds, args.broadcast_at, args.rate, args.api_latency)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chats", type=int, default=550)
+    parser.add_argument("--replies", type=int, default=300)
+    parser.add_argument("--reply-seconds", type=float, default=2.0, help="За сколько секунд приходят запросы пользователей")
+    parser.add_argument("--broadcast-at", type=float, default=1.0, help="Через сколько секунд начинается рассылка круга")
+    parser.add_argument("--rate", type=float, default=30)
+    parser.add_argument("--api-latency", type=float, default=0.05)
+    args = parser.parse_args()
+    asyncio.run(main(args))
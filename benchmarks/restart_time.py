@@ -0,0 +1,75 @@
+"""
+Время перезапуска бота до готовности данных гонки.
+
+Каждый запуск выполняется в отдельном процессе (как перезапуск бота):
+- JSON: снимок отключён (RACE_DATA_SNAPSHOT=0), разбор JSON и построение индексов
+- первый запуск: снимка ещё нет, он собирается и записывается рядом с JSON
+- перезапуск: содержимое JSON не изменилось, колонки и индексы отображаются через mmap
+
+Готовность - загружен снимок данных и сформирована лидерборда одного круга.
+
+Запуск: python -m benchmarks.restart_time [--count 1000000]
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import write_results_file
+
+RUNS = [
+    ("JSON без бинарного снимка", "0"),
+    ("первый запуск (сборка снимка)", "1"),
+    ("перезапуск (mmap)", "1"),
+]
+
+
+def child(path: str) -> None:
+    """Загружает данные так же, как main() при старте, и печатает время и пиковый RSS."""
+    started = time.perf_counter()
+    from bot.api_client import RaceDataClient
+    from bot.race_data import RaceDataStore
+    from bot.render_cache import RenderCache
+
+    snapshot = RaceDataStore(RaceDataClient(path)).get_snapshot()
+    loaded = time.perf_counter() - started
+    RenderCache().get_lap_leaderboard(snapshot, 1)
+    ready = time.perf_counter() - started
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{loaded:.3f} {ready:.3f} {peak_kb}")
+
+
+def main(count: int) -> None:
+    from bot.settings import LAP_DURATION
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "race_results.json")
+        size = write_results_file(path, count)
+        print(f"Файл: {size / 1024 / 1024:.1f} МБ, {count} участников, круг {LAP_DURATION} с")
+
+        for label, snapshot_enabled in RUNS:
+            env = dict(os.environ, RACE_DATA_SNAPSHOT=snapshot_enabled)
+            stdout = subprocess.run(
+                [sys.executable, "-m", "benchmarks.restart_time", "--child", path],
+                check=True, capture_output=True, text=True, env=env
+            ).stdout
+            # Последняя строка - результат, выше - логи бота
+            loaded, ready, peak_kb = stdout.strip().splitlines()[-1].split()
+            print(
+                f"{label}: данные {float(loaded):.1f} с, готовность {float(ready):.1f} с "
+                f"({float(ready) / LAP_DURATION:.0%} круга), пиковый RSS {int(peak_kb) / 1024:.0f} МБ"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=1_000_000)
+    parser.add_argument("--child", metavar="PATH", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child)
+    else:
+        main(args.count)
@@ -0,0 +1,124 @@
+"""
+Память на состояние пользователя и чата.
+
+Сравнивает прежние объекты состояния (dataclass UserState с __dict__,
+ChatState с множеством опубликованных кругов) с компактными (__slots__,
+битовая маска кругов). Дополнительно показывается полная стоимость
+отслеживающего пользователя в UserStateManager вместе с индексами.
+
+Запуск: python -m benchmarks.state_memory [--sizes 100000 1000000]
+"""
+import argparse
+import gc
+import tracemalloc
+from dataclasses import dataclass
+from typing import Optional
+
+from bot.state import ChatState
+from bot.user_state import UserState, UserStateManager
+
+TEAMS = 200
+PUBLISHED_LAPS = 6
+
+
+@dataclass
+class LegacyUserState:
+    """Прежнее состояние пользователя (dataclass с __dict__)."""
+    user_id: int
+    language: str = "ru"
+    entity_type: Optional[str] = None
+    entity_value: Optional[str] = None
+    last_sent_lap: int = 0
+    is_tracking: bool = False
+
+
+class LegacyChatState:
+    """Прежнее состояние чата (множество опубликованных кругов)."""
+
+    def __init__(self, chat_id: int):
+        self.chat_id = chat_id
+        self.start_leaderboard_published = False
+        self.published_laps = set()
+        self.final_leaderboard_published = False
+
+
+def measure(build) -> int:
+    """Возвращает объём памяти, выделенной build(), в байтах (результат удерживается)."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def build_users(state_class, count: int, team_names):
+    """Словарь user_id -> состояние отслеживающего пользователя."""
+    return {
+        user_id: state_class(
+            user_id=user_id,
+            language="en",
+            entity_type="team",
+            entity_value=team_names[user_id % TEAMS],
+            last_sent_lap=user_id % 12,
+            is_tracking=True,
+        )
+        for user_id in range(1_000_000_000, 1_000_000_000 + count)
+    }
+
+
+def build_chats(mark_laps, state_class, count: int):
+    """Словарь chat_id -> состояние чата с PUBLISHED_LAPS опубликованными кругами."""
+    states = {}
+    for chat_id in range(-1_000_000_000_000, -1_000_000_000_000 + count):
+        state = state_class(chat_id)
+        state.start_leaderboard_published = True
+        mark_laps(state)
+        states[chat_id] = state
+    return states
+
+
+def legacy_mark_laps(state: LegacyChatState):
+    """Отмечает круги в прежнем состоянии чата."""
+    state.published_laps.update(range(1, PUBLISHED_LAPS + 1))
+
+
+def compact_mark_laps(state: ChatState):
+    """Отмечает круги в компактном состоянии чата."""
+    for lap_number in range(1, PUBLISHED_LAPS + 1):
+        state.mark_lap_published(lap_number)
+
+
+def build_manager(count: int, team_names) -> UserStateManager:
+    """UserStateManager с count отслеживающими пользователями (вместе с индексами)."""
+    manager = UserStateManager()
+    for user_id in range(1_000_000_000, 1_000_000_000 + count):
+        manager.start_tracking(user_id, "team", team_names[user_id % TEAMS])
+        manager.mark_lap_sent(user_id, user_id % 12)
+    return manager
+
+
+def run(count: int):
+    team_names = [f"Team {index}" for index in range(TEAMS)]
+    legacy_users = measure(lambda: build_users(LegacyUserState, count, team_names))
+    compact_users = measure(lambda: build_users(UserState, count, team_names))
+    manager = measure(lambda: build_manager(count, team_names))
+    legacy_chats = measure(lambda: build_chats(legacy_mark_laps, LegacyChatState, count))
+    compact_chats = measure(lambda: build_chats(compact_mark_laps, ChatState, count))
+
+    print(f"{count} пользователей/чатов:")
+    print(f"  UserState: dataclass {legacy_users / count:.0f} Б, __slots__ {compact_users / count:.0f} Б на пользователя "
+          f"({legacy_users / 2**20:.1f} -> {compact_users / 2**20:.1f} МБ)")
+    print(f"  UserStateManager с индексами: {manager / count:.0f} Б на отслеживающего ({manager / 2**20:.1f} МБ)")
+    print(f"  ChatState: множество {legacy_chats / count:.0f} Б, маска {compact_chats / count:.0f} Б на чат "
+          f"({legacy_chats / 2**20:.1f} -> {compact_chats / 2**20:.1f} МБ)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    args = parser.parse_args()
+    for size in args.sizes:
+        run(size)
@@ -0,0 +1,68 @@
+"""
+Выборка получателей персональных обновлений круга.
+
+Сравнивает прежний полный обход всех состояний пользователей (включая тех,
+кто только выбрал язык) с индексами UserStateManager: ожидающие круг
+отслеживающие и группировка по сущности и языку (один текст на группу).
+
+Запуск: python -m benchmarks.tracker_fanout [--users 100000 1000000] [--trackers 5000] [--teams 200]
+"""
+import argparse
+import random
+
+from benchmarks.common import timed
+
+from bot.user_state import UserStateManager
+
+LANGUAGES = ("ru", "en", "uk")
+REPEATS = 5
+
+
+def best_of(func, *args):
+    """Минимальное время из REPEATS запусков, в миллисекундах."""
+    return min(timed(func, *args)[1] for _ in range(REPEATS)) * 1000
+
+
+def scan_pending(manager: UserStateManager, lap_number: int):
+    """Прежний обход всех состояний пользователей."""
+    return [
+        (user_id, state) for user_id, state in manager._states.items()
+        if state.is_tracking and state.entity_type and state.entity_value and state.last_sent_lap < lap_number
+    ]
+
+
+def build_manager(users: int, trackers: int, teams: int) -> UserStateManager:
+    """Заполняет менеджер: все пользователи выбрали язык, часть отслеживает команды."""
+    rng = random.Random(users)
+    manager = UserStateManager()
+    for user_id in range(1, users + 1):
+        manager.set_language(user_id, rng.choice(LANGUAGES))
+    for user_id in rng.sample(range(1, users + 1), trackers):
+        manager.start_tracking(user_id, "team", f"Team {rng.randrange(teams)}")
+    return manager
+
+
+def run(users: int, trackers: int, teams: int):
+    manager = build_manager(users, trackers, teams)
+    lap_number = 6
+    for state in manager.get_trackers():
+        manager.mark_lap_sent(state.user_id, lap_number - 1)
+
+    groups = manager.get_pending_groups(lap_number)
+    assert len(scan_pending(manager, lap_number)) == sum(map(len, groups.values())) == trackers
+
+    print(f"{users} пользователей, {trackers} отслеживают, {teams} команд (лучшее из {REPEATS}):")
+    print(f"  обход всех состояний: {best_of(scan_pending, manager, lap_number):.2f} мс")
+    print(f"  индекс ожидающих круг: {best_of(manager.get_pending_trackers, lap_number):.2f} мс")
+    print(f"  группы по сущности и языку: {best_of(manager.get_pending_groups, lap_number):.2f} мс "
+          f"({len(groups)} текстов вместо {trackers})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--trackers", type=int, default=5_000)
+    parser.add_argument("--teams", type=int, default=200)
+    args = parser.parse_args()
+    for size in args.users:
+        run(size, args.trackers, args.teams)
@@ -0,0 +1,85 @@
+"""
+Формирование персональных лидерборд круга в процессах-шардах.
+
+Сравнивает отрисовку всех групп (сущность, язык) в event loop и в
+TrackerShardPool с разным числом процессов: время, тексты в секунду и
+задержку event loop. Ускорение ограничено числом ядер (os.cpu_count()).
+
+Запуск: python -m benchmarks.tracker_shards [--participants 20000] [--groups 20000] [--workers 1 2 4]
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+
+from benchmarks.common import LoopLagMonitor, generate_participants
+
+from bot.leaderboard import render_user_leaderboard
+from bot.race_data import RaceSnapshot
+from bot.tracker_shards import TrackerShardPool
+from bot.user_state import UserState
+
+LANGUAGES = ("ru", "en", "uk")
+LAP_NUMBER = 6
+
+
+def build_groups(snapshot: RaceSnapshot, count: int):
+    """Группы по одному пользователю: разные команды и языки."""
+    rng = random.Random(count)
+    team_name = snapshot.columns.team_name
+    groups = {}
+    user_id = 1
+    while len(groups) < count:
+        key = ("team", team_name(rng.randrange(len(snapshot))), rng.choice(LANGUAGES))
+        if key not in groups:
+            groups[key] = [UserState(user_id=user_id, language=key[2])]
+            user_id += 1
+    return groups
+
+
+async def measure(name: str, groups_count: int, render):
+    monitor = LoopLagMonitor()
+    monitor.start()
+    await asyncio.sleep(0.05)
+    started = time.perf_counter()
+    await render()
+    elapsed = time.perf_counter() - started
+    await asyncio.sleep(0.05)
+    await monitor.stop()
+    print(f"{name}: {elapsed:.2f} с, {groups_count / elapsed:.0f} текстов/с, задержка event loop {monitor.summary()}")
+    return elapsed
+
+
+async def main(participants: int, groups_count: int, workers_list):
+    snapshot = RaceSnapshot.from_records(generate_participants(participants, 12), 1, None)
+    groups = build_groups(snapshot, groups_count)
+    print(f"{participants} участников, {groups_count} текстов, ядер: {os.cpu_count()}")
+
+    async def inline():
+        for entity_type, entity_value, language in groups:
+            render_user_leaderboard(snapshot.standings, LAP_NUMBER, entity_type, entity_value, language)
+
+    baseline = await measure("event loop", groups_count, inline)
+    for workers in workers_list:
+        pool = TrackerShardPool(workers)
+        pool.start()
+        # Первый вызов выгружает снимок для процессов
+        await pool.render("bench", snapshot, LAP_NUMBER - 1, dict(list(groups.items())[:workers]), timeout=60)
+
+        async def sharded():
+            texts = await pool.render("bench", snapshot, LAP_NUMBER, groups, timeout=60)
+            assert len(texts) == groups_count
+
+        elapsed = await measure(f"шарды x{workers}", groups_count, sharded)
+        print(f"  ускорение относительно event loop: {baseline / elapsed:.2f}x")
+        await pool.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--participants", type=int, default=20000)
+    parser.add_argument("--groups", type=int, default=20000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+    asyncio.run(main(args.participants, args.groups, args.workers))
@@ -0,0 +1,193 @@
+"""
+Нагрузочный тест webhook: воспроизводит обновления на локальном сервере.
+
+Поднимает webhook-сервер бота (WebhookRequestHandler с диспетчером и
+обработчиками из bot.main) и локальную заглушку Bot API, куда уходят
+ответы бота (с задержкой --api-latency). Обновления берутся из файла
+(JSON Lines, одно обновление Telegram на строку) или генерируются: всплеск
+/start, выбор языка и ввод команд в личных сообщениях, как при старте гонки.
+Обновления отправляются в --connections параллельных соединений (как
+max_connections у Telegram); 503 повторяются после Retry-After.
+
+Запуск: python -m benchmarks.webhook_load [--updates recorded.jsonl] [--count 5000] [--connections 1 40]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from typing import Any, Dict, List
+
+# Без постоянного хранилища состояния: тест не должен трогать bot_state.db
+os.environ["STATE_DB_PATH"] = ""
+os.environ.pop("RACES_FILE", None)
+
+from benchmarks.common import generate_participants
+
+import aiohttp
+from aiohttp import web
+from aiogram import Bot
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.enums import ParseMode
+
+import bot.main as bot_main
+from bot.webhook import start_webhook_server
+
+HOST = "127.0.0.1"
+API_PORT = 18081
+WEBHOOK_PORT = 18080
+WEBHOOK_PATH = "/webhook"
+TOKEN = "123456:benchmark"
+
+
+async def start_fake_api(latency: float) -> web.AppRunner:
+    """Заглушка Bot API: отвечает на любой метод успешным результатом."""
+    calls = {"count": 0}
+
+    async def handle(request: web.Request) -> web.Response:
+        calls["count"] += 1
+        method = request.match_info["method"]
+        data = await request.post()
+        await asyncio.sleep(latency)
+        if method.startswith(("send", "edit")):
+            chat_id = int(data.get("chat_id", 1))
+            result: Any = {
+                "message_id": calls["count"],
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": data.get("text", ""),
+            }
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    app = web.Application()
+    app.router.add_post("/bot{token}/{method}", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, HOST, API_PORT).start()
+    return runner
+
+
+def generate_updates(count: int, team_names: List[str]) -> List[Dict[str, Any]]:
+    """Всплеск обновлений при старте гонки: /start, выбор языка, ввод команды или кошелька."""
+    rng = random.Random(count)
+    updates = []
+    for update_id in range(1, count + 1):
+        user_id = 1_000_000 + rng.randrange(count)
+        user = {"id": user_id, "is_bot": False, "first_name": "Racer"}
+        chat = {"id": user_id, "type": "private"}
+        message = {"message_id": update_id, "date": int(time.time()), "chat": chat, "from": user}
+        kind = rng.random()
+        if kind < 0.3:
+            updates.append({"update_id": update_id, "message": {**message, "text": "/start"}})
+        elif kind < 0.5:
+            updates.append({"update_id": update_id, "callback_query": {
+                "id": str(update_id), "from": user, "chat_instance": "1",
+                "data": f"language_{rng.choice(('ru', 'en', 'uk'))}", "message": message,
+            }})
+        elif kind < 0.9:
+            updates.append({"update_id": update_id, "message": {**message, "text": rng.choice(team_names)}})
+        else:
+            updates.append({"update_id": update_id, "message": {**message, "text": f"0x{rng.getrandbits(160):040x}"}})
+    return updates
+
+
+async def replay(updates: List[Dict[str, Any]], connections: int) -> Dict[str, Any]:
+    """Отправляет обновления в connections параллельных потоков, повторяя 503."""
+    queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+    for update in updates:
+        queue.put_nowait(update)
+    latencies: List[float] = []
+    retries = 0
+    url = f"http://{HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}"
+
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=connections)) as session:
+        async def worker():
+            nonlocal retries
+            while not queue.empty():
+                update = queue.get_nowait()
+                while True:
+                    started = time.perf_counter()
+                    async with session.post(url, json=update) as response:
+                        await response.read()
+                        latencies.append(time.perf_counter() - started)
+                        if response.status != 503:
+                            break
+                        retries += 1
+                        await asyncio.sleep(float(response.headers.get("Retry-After", 1)))
+
+        await asyncio.gather(*(worker() for _ in range(connections)))
+
+    latencies.sort()
+    return {
+        "p50": latencies[len(latencies) // 2],
+        "p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        "retries": retries,
+    }
+
+
+async def run(updates: List[Dict[str, Any]], connections: int, max_concurrency: int, max_pending: int, api_latency: float):
+    bot = Bot(
+        token=TOKEN,
+        session=AiohttpSession(api=TelegramAPIServer.from_base(f"http://{HOST}:{API_PORT}")),
+        default=DefaultBotProperties(parse_mode=ParseMode.HTML),
+    )
+    api_runner = await start_fake_api(api_latency)
+    runner, handler = await start_webhook_server(
+        bot_main.dp, bot, WEBHOOK_PATH, HOST, WEBHOOK_PORT,
+        max_concurrency=max_concurrency, max_pending=max_pending
+    )
+    try:
+        started = time.perf_counter()
+        client_stats = await replay(updates, connections)
+        # Ждём обработки всех принятых обновлений
+        while handler.depth:
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - started
+    finally:
+        await runner.cleanup()
+        await api_runner.cleanup()
+        await bot.session.close()
+
+    stats = handler.get_stats()
+    print(
+        f"соединений {connections}: {len(updates)} обновлений за {elapsed:.2f} с ({len(updates) / elapsed:.0f}/с), "
+        f"ответ webhook p50 {client_stats['p50'] * 1000:.1f} мс, p99 {client_stats['p99'] * 1000:.1f} мс, "
+        f"обработка p50 {stats['p50'] * 1000:.1f} мс, p99 {stats['p99'] * 1000:.1f} мс, "
+        f"максимум в очереди {stats['max_depth']}, отклонено (503) {stats['rejected']}, ошибок {stats['errors']}"
+    )
+
+
+async def main(args):
+    race = bot_main.race_registry.default
+    participants = generate_participants(args.participants, 12)
+    snapshot = race.data_store.install(participants, None)
+    race.data_store.get_snapshot = lambda reload=False: snapshot
+
+    if args.updates:
+        with open(args.updates, "r", encoding="utf-8") as f:
+            updates = [json.loads(line) for line in f if line.strip()]
+    else:
+        updates = generate_updates(args.count, [participant["team_name"] for participant in participants])
+    print(f"Обновлений: {len(updates)}, задержка Bot API {args.api_latency * 1000:.0f} мс, "
+          f"обработка: до {args.max_concurrency} одновременно, очередь до {args.max_pending}")
+
+    for connections in args.connections:
+        await run(updates, connections, args.max_concurrency, args.max_pending, args.api_latency)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--updates", help="JSON Lines с записанными обновлениями Telegram")
+    parser.add_argument("--count", type=int, default=5000, help="Сколько обновлений сгенерировать без --updates")
+    parser.add_argument("--participants", type=int, default=1000)
+    parser.add_argument("--connections", type=int, nargs="+", default=[1, 40])
+    parser.add_argument("--max-concurrency", type=int, default=64)
+    parser.add_argument("--max-pending", type=int, default=1000)
+    parser.add_argument("--api-latency", type=float, default=0.05)
+    args = parser.parse_args()
+    asyncio.run(main(args))
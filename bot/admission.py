@@ -0,0 +1,156 @@
+"""Контроль допуска запросов пользователей в личных сообщениях."""
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Tuple
+
+# Результаты допуска запроса
+ADMITTED = "admitted"
+DUPLICATE = "duplicate"
+SHED = "shed"
+# Отклонён, но ответ «попробуйте позже» пользователю уже отправлен в этом окне
+SHED_QUIET = "shed_quiet"
+
+
+class AdmissionController:
+    """
+    Допуск запросов пользователей (ввод кошелька или команды) при всплесках.
+
+    - Ограниченная очередь: принятых, но не обработанных запросов не больше
+      max_pending; сверх неё запрос отклоняется (SHED) и пользователь получает
+      короткий ответ «попробуйте позже». Ответ отправляется не чаще раза за
+      busy_reply_window секунд и не больше max_concurrency одновременно, иначе
+      отказ молчаливый (SHED_QUIET): ответы об отказе тоже расходуют лимиты Bot API.
+    - Дедупликация: повтор текста, который совпадает с последним запросом
+      пользователя, ещё ожидающим или обрабатываемым, не принимается
+      (DUPLICATE). После обработки тот же текст принимается снова (например,
+      повтор после «не найдено»), а возврат к прежнему тексту (A → B → A)
+      заменяет B.
+    - Debounce: если пользователь прислал новый текст, пока прежний ждёт
+      очереди, прежний запрос пропускается при старте (superseded).
+    - Общий лимит конкурентности: проверку выполняют не больше
+      max_concurrency запросов одновременно, остальные ждут в очереди,
+      не занимая event loop.
+    """
+
+    def __init__(self, max_pending: int, max_concurrency: int, busy_reply_window: float):
+        """
+        Инициализация контроля допуска.
+
+        Args:
+            max_pending: Максимум принятых, но не обработанных запросов
+            max_concurrency: Максимум одновременно обрабатываемых запросов
+            busy_reply_window: Не чаще скольких секунд пользователь получает ответ об отказе
+        """
+        self.max_pending = max_pending
+        self.busy_reply_window = busy_reply_window
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # Последний принятый и ещё не обработанный запрос пользователя:
+        # user_id -> (номер, нормализованный текст)
+        self._latest: Dict[int, Tuple[int, str]] = {}
+        # Пользователи, получившие ответ «попробуйте позже»: user_id -> момент ответа
+        self._shed_notified: "OrderedDict[int, float]" = OrderedDict()
+        self._max_shed_replies = max_concurrency
+        self._shed_replying = 0
+        self._sequence = 0
+        self.pending = 0
+        self.active = 0
+        self.max_depth = 0
+        self.admitted = 0
+        self.duplicates = 0
+        self.shed = 0
+        self.superseded = 0
+
+    @property
+    def depth(self) -> int:
+        """Количество принятых запросов, ожидающих обработки."""
+        return self.pending - self.active
+
+    def _prune(self, now: float) -> None:
+        """Удаляет отметки об ответах об отказе старше окна."""
+        shed_notified = self._shed_notified
+        while shed_notified and now - next(iter(shed_notified.values())) >= self.busy_reply_window:
+            shed_notified.popitem(last=False)
+
+    def admit(self, user_id: int, text: str) -> Tuple[str, int]:
+        """
+        Решает, принять ли запрос пользователя.
+
+        Args:
+            user_id: ID пользователя
+            text: Текст запроса
+
+        Returns:
+            (ADMITTED, DUPLICATE, SHED или SHED_QUIET; номер запроса для processing())
+        """
+        now = time.monotonic()
+        self._prune(now)
+        text_key = text.strip().lower()
+        latest = self._latest.get(user_id)
+        if latest is not None and latest[1] == text_key:
+            self.duplicates += 1
+            return DUPLICATE, 0
+        if self.pending >= self.max_pending:
+            self.shed += 1
+            if user_id in self._shed_notified or self._shed_replying >= self._max_shed_replies:
+                return SHED_QUIET, 0
+            self._shed_notified[user_id] = now
+            self._shed_replying += 1
+            return SHED, 0
+
+        self._sequence += 1
+        self._latest[user_id] = (self._sequence, text_key)
+        self.pending += 1
+        self.admitted += 1
+        self.max_depth = max(self.max_depth, self.depth)
+        return ADMITTED, self._sequence
+
+    def shed_replied(self) -> None:
+        """Отмечает, что ответ об отказе (SHED) отправлен."""
+        self._shed_replying -= 1
+
+    def _is_latest(self, user_id: int, sequence: int) -> bool:
+        """Проверяет, что запрос - последний принятый запрос пользователя."""
+        latest = self._latest.get(user_id)
+        return latest is not None and latest[0] == sequence
+
+    @asynccontextmanager
+    async def processing(self, user_id: int, sequence: int) -> AsyncIterator[bool]:
+        """
+        Ждёт свободного слота для принятого запроса.
+
+        Args:
+            user_id: ID пользователя
+            sequence: Номер запроса из admit()
+
+        Yields:
+            False, если за время ожидания пользователь прислал более новый запрос
+            (обрабатывать не нужно), иначе True
+        """
+        try:
+            async with self._semaphore:
+                current = self._is_latest(user_id, sequence)
+                if not current:
+                    self.superseded += 1
+                self.active += 1
+                try:
+                    yield current
+                finally:
+                    self.active -= 1
+        finally:
+            self.pending -= 1
+            if self._is_latest(user_id, sequence):
+                del self._latest[user_id]
+
+    def get_stats(self) -> Dict[str, int]:
+        """Возвращает глубину очереди и счётчики допуска."""
+        return {
+            "depth": self.depth,
+            "active": self.active,
+            "max_depth": self.max_depth,
+            "admitted": self.admitted,
+            "duplicates": self.duplicates,
+            "shed": self.shed,
+            "superseded": self.superseded,
+        }
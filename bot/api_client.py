@@ -1,24 +1,129 @@
 """Клиент для работы с API данных гонки."""
 import json
 import os
-from typing import List, Dict, Any, Optional
+from functools import lru_cache
+from typing import List, Dict, Any, FrozenSet, Optional
 from pathlib import Path
 
+from bot.columnar import ParticipantColumns, lap_keys
+from bot.json_stream import iter_json_array
 from bot.logger import setup_logger
 
 logger = setup_logger()
 
 
+class ValidationReport:
+    """
+    Сводка предупреждений валидации данных гонки.
+
+    Вместо отдельного предупреждения на каждое отсутствующее поле копит
+    количество участников по каждому полю и несколько примеров, а затем
+    пишет в лог по одной строке на поле.
+    """
+
+    # Сколько номеров участников показывать в примерах
+    EXAMPLES_LIMIT = 5
+
+    def __init__(self):
+        """Инициализация пустой сводки."""
+        self.checked = 0
+        self.missing_fields: Dict[str, int] = {}
+        self.examples: Dict[str, List[int]] = {}
+
+    def add_missing(self, field: str, idx: int) -> None:
+        """
+        Учитывает отсутствующее поле у участника.
+
+        Args:
+            field: Название поля
+            idx: Номер участника в данных
+        """
+        self.missing_fields[field] = self.missing_fields.get(field, 0) + 1
+        examples = self.examples.setdefault(field, [])
+        if len(examples) < self.EXAMPLES_LIMIT:
+            examples.append(idx)
+
+    def log(self) -> None:
+        """Пишет сводку в лог (одно предупреждение на поле)."""
+        for field, count in self.missing_fields.items():
+            examples = ", ".join(f"#{idx}" for idx in self.examples[field])
+            more = ", ..." if count > len(self.examples[field]) else ""
+            logger.warning(f"⚠️ Поле '{field}' отсутствует у {count} из {self.checked} участников ({examples}{more})")
+
+
+@lru_cache(maxsize=None)
+def _lap_key_set(total_laps: int) -> FrozenSet[str]:
+    """Множество ключей кругов для быстрой проверки их наличия."""
+    return frozenset(lap_keys(total_laps))
+
+
+def validate_participant(idx: int, participant: Any, report: ValidationReport, total_laps: int = 12) -> None:
+    """
+    Валидирует одного участника.
+
+    Args:
+        idx: Номер участника в данных
+        participant: Данные участника
+        report: Сводка, в которую записываются предупреждения
+        total_laps: Общее количество кругов
+
+    Raises:
+        ValueError: Если структура данных участника невалидна
+    """
+    if not isinstance(participant, dict):
+        raise ValueError(f"Участник #{idx} должен быть словарём")
+
+    for field in ('user', 'team_name', 'start_position'):
+        if field not in participant:
+            raise ValueError(f"У участника #{idx} отсутствует поле '{field}'")
+
+    # Проверяем, что start_position - число
+    if not isinstance(participant['start_position'], int):
+        raise ValueError(f"У участника #{idx} start_position должен быть числом")
+
+    # Проверяем наличие полей lap1-lap12 (быстрая проверка, если все на месте)
+    if not participant.keys() >= _lap_key_set(total_laps):
+        for lap_key in lap_keys(total_laps):
+            if lap_key not in participant:
+                report.add_missing(lap_key, idx)
+    report.checked += 1
+
+
+def validate_race_data(data: List[Dict[str, Any]], total_laps: int = 12) -> ValidationReport:
+    """
+    Валидирует структуру данных гонки (общая для файла и HTTP-источника).
+    
+    Args:
+        data: Список словарей с данными участников
+        total_laps: Общее количество кругов
+    
+    Returns:
+        Сводка предупреждений (уже записана в лог)
+    
+    Raises:
+        ValueError: Если структура данных невалидна
+    """
+    if not isinstance(data, list):
+        raise ValueError("Данные должны быть списком объектов")
+    
+    report = ValidationReport()
+    for idx, participant in enumerate(data):
+        validate_participant(idx, participant, report, total_laps)
+    report.log()
+    return report
+
+
 class RaceDataClient:
     """Клиент для загрузки и работы с данными гонки."""
     
-    def __init__(self, json_file_path: Optional[str] = None):
+    def __init__(self, json_file_path: Optional[str] = None, total_laps: int = 12):
         """
         Инициализация клиента.
         
         Args:
             json_file_path: Путь к JSON файлу с данными. 
                           По умолчанию используется race_2_results.json в корне проекта.
+            total_laps: Общее количество кругов гонки (для проверки полей lapN)
         """
         if json_file_path is None:
             # Путь к файлу относительно корня проекта
@@ -26,7 +131,7 @@ class RaceDataClient:
             json_file_path = project_root / "race_2_results.json"
         
         self.json_file_path = Path(json_file_path)
-        self._data: Optional[List[Dict[str, Any]]] = None
+        self.total_laps = total_laps
     
     def load_data(self) -> List[Dict[str, Any]]:
         """
@@ -52,9 +157,8 @@ class RaceDataClient:
                 raise ValueError("Данные должны быть списком объектов")
             
             # Валидация структуры данных
-            self._validate_data(data)
+            validate_race_data(data, self.total_laps)
             
-            self._data = data
             logger.info(f"Загружено {len(data)} участников")
             return data
             
@@ -65,83 +169,46 @@ class RaceDataClient:
             logger.error(f"Ошибка при загрузке данных: {e}")
             raise
     
-    def _validate_data(self, data: List[Dict[str, Any]]) -> None:
-        """
-        Валидирует структуру данных.
-        
-        Args:
-            data: Список словарей с данными участников
-        
-        Raises:
-            ValueError: Если структура данных невалидна
+    def load_columns(self, total_laps: Optional[int] = None) -> ParticipantColumns:
         """
-        required_fields = ['user', 'team_name', 'start_position']
+        Потоково загружает данные из JSON файла сразу в колоночное хранилище.
         
-        for idx, participant in enumerate(data):
-            if not isinstance(participant, dict):
-                raise ValueError(f"Участник #{idx} должен быть словарём")
-            
-            for field in required_fields:
-                if field not in participant:
-                    raise ValueError(f"У участника #{idx} отсутствует поле '{field}'")
-            
-            # Проверяем, что start_position - число
-            if not isinstance(participant['start_position'], int):
-                raise ValueError(f"У участника #{idx} start_position должен быть числом")
-            
-            # Проверяем наличие полей lap1-lap12
-            for lap_num in range(1, 13):
-                lap_key = f"lap{lap_num}"
-                if lap_key not in participant:
-                    logger.warning(f"У участника #{idx} отсутствует поле '{lap_key}'")
-    
-    def get_data(self, reload: bool = False) -> List[Dict[str, Any]]:
-        """
-        Получает загруженные данные.
+        Участники разбираются, валидируются и добавляются в колонки по одному
+        по мере чтения файла, поэтому в памяти не создаётся список словарей
+        на всех участников. Предупреждения валидации пишутся в лог одной сводкой.
         
         Args:
-            reload: Если True, перезагружает данные из файла
-        
-        Returns:
-            Список словарей с данными участников
-        """
-        if self._data is None or reload:
-            return self.load_data()
-        
-        return self._data
-    
-    def get_participants_sorted_by_start_position(self) -> List[Dict[str, Any]]:
-        """
-        Возвращает участников, отсортированных по стартовой позиции.
+            total_laps: Общее количество кругов (по умолчанию - заданное клиенту)
         
         Returns:
-            Список участников, отсортированных по start_position
-        """
-        data = self.get_data()
-        return sorted(data, key=lambda x: x['start_position'])
-    
-    def get_participants_sorted_by_lap(self, lap_number: int) -> List[Dict[str, Any]]:
-        """
-        Возвращает участников, отсортированных по позиции на указанном круге.
-        
-        Args:
-            lap_number: Номер круга (1-12)
+            Колоночное хранилище участников
         
-        Returns:
-            Список участников, отсортированных по позиции на круге
+        Raises:
+            FileNotFoundError: Если файл не найден
+            json.JSONDecodeError: Если файл содержит невалидный JSON
+            ValueError: Если структура данных невалидна
         """
-        if lap_number < 1 or lap_number > 12:
-            raise ValueError("Номер круга должен быть от 1 до 12")
+        if not self.json_file_path.exists():
+            raise FileNotFoundError(f"Файл с данными не найден: {self.json_file_path}")
         
-        data = self.get_data()
-        lap_key = f"lap{lap_number}"
+        logger.info(f"Потоковая загрузка данных из {self.json_file_path}")
         
-        # Фильтруем участников, у которых есть данные для этого круга
-        participants_with_lap = [
-            p for p in data 
-            if lap_key in p and isinstance(p[lap_key], int)
-        ]
+        if total_laps is None:
+            total_laps = self.total_laps
+        columns = ParticipantColumns(total_laps)
+        report = ValidationReport()
+        try:
+            with open(self.json_file_path, 'r', encoding='utf-8') as f:
+                for idx, participant in enumerate(iter_json_array(f)):
+                    validate_participant(idx, participant, report, total_laps)
+                    columns.append(participant)
+        except json.JSONDecodeError as e:
+            logger.error(f"Ошибка парсинга JSON: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке данных: {e}")
+            raise
         
-        # Сортируем по позиции на круге
-        return sorted(participants_with_lap, key=lambda x: x[lap_key])
-
+        report.log()
+        logger.info(f"Загружено {len(columns)} участников")
+        return columns
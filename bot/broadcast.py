@@ -0,0 +1,478 @@
+"""Конкурентная рассылка сообщений с учётом лимитов Telegram."""
+import asyncio
+import heapq
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+
+from bot.logger import setup_logger
+from bot.message_split import split_message
+from bot.retry_queue import RetryQueue
+from bot.settings import (
+    BROADCAST_MAX_CONCURRENCY,
+    BROADCAST_GLOBAL_RATE,
+    BROADCAST_PRIVATE_CHAT_RATE,
+    BROADCAST_GROUP_CHAT_RATE,
+    LAP_DURATION,
+    REPLY_DELIVERY_SLO,
+)
+
+logger = setup_logger()
+
+# Классы приоритета отправки (меньше - важнее): рассылки на границе круга
+# (лидерборды в группы и персональные обновления) и ответы в диалоге
+# (/start, /language, результат проверки кошелька)
+PRIORITY_LAP = 0
+PRIORITY_REPLY = 1
+PRIORITY_NAMES = {PRIORITY_LAP: "рассылка кругов", PRIORITY_REPLY: "ответы"}
+
+# Сколько последних задержек каждого класса хранится для перцентилей
+SLO_WINDOW = 10000
+
+
+class TokenBucket:
+    """
+    Ограничитель частоты по алгоритму token bucket.
+
+    Если токенов не хватает, следующий токен получает ожидающий с наименьшим
+    номером приоритета, при равном приоритете - пришедший раньше.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        """
+        Инициализация ограничителя.
+
+        Args:
+            rate: Скорость пополнения (токенов в секунду)
+            capacity: Ёмкость (допустимый всплеск)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._condition = asyncio.Condition()
+        # Очередь ожидающих: (приоритет, порядковый номер)
+        self._waiters: List[Tuple[int, int]] = []
+        self._sequence = 0
+
+    def _refill(self) -> None:
+        """Пополняет токены пропорционально прошедшему времени."""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def is_idle(self) -> bool:
+        """Проверяет, что ограничитель полностью пополнен (им давно не пользовались)."""
+        self._refill()
+        return self._tokens >= self.capacity
+
+    async def acquire(self, priority: int = 0) -> None:
+        """
+        Ожидает и забирает один токен.
+
+        Args:
+            priority: Класс приоритета (меньше - важнее)
+        """
+        async with self._condition:
+            self._sequence += 1
+            entry = (priority, self._sequence)
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    timeout = None
+                    # Токен забирает только первый в очереди; остальные ждут своей очереди
+                    if self._waiters[0] == entry:
+                        self._refill()
+                        if self._tokens >= 1:
+                            self._tokens -= 1
+                            return
+                        timeout = (1 - self._tokens) / self.rate
+                    try:
+                        await asyncio.wait_for(self._condition.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                if self._waiters[0] == entry:
+                    heapq.heappop(self._waiters)
+                else:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                # Следующий в очереди (в том числе более важный, пришедший позже) проверяет токены
+                self._condition.notify_all()
+
+
+class PrioritySemaphore:
+    """
+    Семафор с приоритетами.
+
+    Освободившийся слот получает ожидающий с наименьшим номером приоритета,
+    при равном приоритете - пришедший раньше.
+    """
+
+    def __init__(self, value: int):
+        """
+        Инициализация семафора.
+
+        Args:
+            value: Количество слотов
+        """
+        self._value = value
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = 0
+        # Ожидающие слот по приоритетам
+        self.waiting: Dict[int, int] = {}
+
+    @asynccontextmanager
+    async def acquire(self, priority: int) -> AsyncIterator[None]:
+        """Занимает слот на время блока with."""
+        if self._value > 0 and not self._waiters:
+            self._value -= 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._sequence += 1
+            heapq.heappush(self._waiters, (priority, self._sequence, future))
+            self.waiting[priority] = self.waiting.get(priority, 0) + 1
+            try:
+                await future
+            except asyncio.CancelledError:
+                # Слот уже передан этой задаче - отдаём его следующему
+                if future.done() and not future.cancelled():
+                    self._release()
+                raise
+            finally:
+                self.waiting[priority] -= 1
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _release(self) -> None:
+        """Передаёт слот ожидающему с наивысшим приоритетом или возвращает его."""
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._value += 1
+
+
+class SloTracker:
+    """
+    Задержка доставки по классам (рассылка кругов каждой гонки, ответы)
+    и доля доставок в пределах SLO класса.
+    """
+
+    def __init__(self):
+        """Инициализация учёта (классы появляются при первой доставке)."""
+        self.slos: Dict[str, float] = {}
+        self._latencies: Dict[str, "deque[float]"] = {}
+        self.delivered: Dict[str, int] = {}
+        self.violations: Dict[str, int] = {}
+
+    def record(self, name: str, slo: float, latency: float) -> None:
+        """
+        Учитывает доставку.
+
+        Args:
+            name: Класс доставки
+            slo: Целевая задержка доставки класса в секундах
+            latency: Секунды от постановки в очередь до доставки
+        """
+        if name not in self._latencies:
+            self._latencies[name] = deque(maxlen=SLO_WINDOW)
+            self.delivered[name] = 0
+            self.violations[name] = 0
+        self.slos[name] = slo
+        self._latencies[name].append(latency)
+        self.delivered[name] += 1
+        if latency > slo:
+            self.violations[name] += 1
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """Возвращает по каждому классу: SLO, доставки, нарушения, долю в SLO и p50/p99 задержки."""
+        stats = {}
+        for name, slo in self.slos.items():
+            ordered = sorted(self._latencies[name])
+
+            def percentile(percent: float) -> float:
+                if not ordered:
+                    return 0.0
+                return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+            delivered = self.delivered[name]
+            stats[name] = {
+                "slo": slo,
+                "delivered": delivered,
+                "violations": self.violations[name],
+                "within_slo": 1 - self.violations[name] / delivered if delivered else 1.0,
+                "p50": percentile(50),
+                "p99": percentile(99),
+            }
+        return stats
+
+
+@dataclass
+class OutgoingMessage:
+    """Сообщение для рассылки."""
+    chat_id: int
+    text: str
+    reply_markup: Any = None
+    on_sent: Optional[Callable[[], None]] = None  # Вызывается после успешной отправки
+    is_stale: Optional[Callable[[], bool]] = None  # True, если повтор уже не нужен
+    sent_parts: int = 0  # Сколько частей длинного текста уже доставлено
+    priority: int = PRIORITY_LAP  # Класс приоритета отправки
+    race_id: Optional[str] = None  # Гонка (SLO рассылки кругов зависит от длительности её круга)
+    created_at: float = field(default_factory=time.monotonic)  # Момент постановки в рассылку (для SLO)
+
+
+@dataclass
+class BroadcastReport:
+    """Итоги рассылки: количество доставок и задержки доставки (секунды от старта рассылки)."""
+    label: str
+    sent: int = 0
+    deferred: int = 0  # Не доставлено сразу (переданы в очередь повторов)
+    latencies: List[float] = field(default_factory=list)
+    duration: float = 0.0
+
+    def percentile(self, percent: float) -> float:
+        """
+        Возвращает перцентиль задержки доставки.
+
+        Args:
+            percent: Перцентиль (0-100)
+        """
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, max(0, int(round(percent / 100 * (len(ordered) - 1)))))
+        return ordered[index]
+
+    def summary(self) -> str:
+        """Возвращает строку с итогами рассылки для лога."""
+        return (
+            f"{self.label}: отправлено {self.sent}, в очереди повторов {self.deferred}, "
+            f"p50={self.percentile(50):.2f}с p95={self.percentile(95):.2f}с "
+            f"p99={self.percentile(99):.2f}с, всего {self.duration:.2f}с"
+        )
+
+
+class BroadcastEngine:
+    """
+    Диспетчер рассылки с ограниченной конкурентностью.
+
+    Соблюдает глобальный лимит бота и лимиты на отдельный чат (личный/группа),
+    при TelegramRetryAfter приостанавливает все отправки на указанное время.
+    Неудачные отправки уходят в фоновую RetryQueue и не задерживают рассылку.
+
+    Через диспетчер идут и ответы в диалоге (reply()): слоты отправки и токены
+    лимитов выдаются по приоритету, поэтому рассылка круга обгоняет
+    накопившиеся ответы пользователям. Задержка доставки учитывается по классам (slo):
+    SLO рассылки гонки - длительность её круга (set_lap_slo).
+    """
+
+    # Порог числа ограничителей чатов, после которого удаляются неактивные
+    _CHAT_BUCKETS_PRUNE_THRESHOLD = 10000
+
+    def __init__(
+        self,
+        bot: Bot,
+        max_concurrency: int = BROADCAST_MAX_CONCURRENCY,
+        global_rate: float = BROADCAST_GLOBAL_RATE,
+        private_chat_rate: float = BROADCAST_PRIVATE_CHAT_RATE,
+        group_chat_rate: float = BROADCAST_GROUP_CHAT_RATE,
+        on_forbidden: Optional[Callable[[int], None]] = None,
+    ):
+        """
+        Инициализация диспетчера.
+
+        Args:
+            bot: Экземпляр бота
+            max_concurrency: Максимум одновременных запросов
+            global_rate: Глобальный лимит сообщений в секунду
+            private_chat_rate: Лимит сообщений в секунду в личный чат
+            group_chat_rate: Лимит сообщений в секунду в группу
+            on_forbidden: Вызывается с chat_id, если бот заблокирован в чате
+        """
+        self.bot = bot
+        self._slots = PrioritySemaphore(max_concurrency)
+        self._global_bucket = TokenBucket(global_rate, capacity=global_rate)
+        self._private_chat_rate = private_chat_rate
+        self._group_chat_rate = group_chat_rate
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+        self._paused_until = 0.0
+        self.retry_queue = RetryQueue(self._attempt, on_forbidden=on_forbidden)
+        self.slo = SloTracker()
+        # SLO рассылки кругов по гонкам; для сообщений без гонки - LAP_DURATION
+        self._lap_slos: Dict[str, float] = {}
+
+    def set_lap_slo(self, race_id: str, slo: float) -> None:
+        """
+        Задаёт SLO рассылки кругов гонки: круг должен дойти до начала следующего.
+
+        Args:
+            race_id: ID гонки
+            slo: Целевая задержка доставки в секундах (длительность круга гонки)
+        """
+        self._lap_slos[race_id] = slo
+
+    def _record_delivery(self, message: OutgoingMessage) -> None:
+        """Учитывает задержку доставки сообщения рассылки в его классе."""
+        name = PRIORITY_NAMES[message.priority]
+        if message.priority == PRIORITY_REPLY:
+            slo = REPLY_DELIVERY_SLO
+        else:
+            slo = self._lap_slos.get(message.race_id, LAP_DURATION)
+            if message.race_id is not None:
+                name = f"{name} {message.race_id}"
+        self.slo.record(name, slo, time.monotonic() - message.created_at)
+
+    def _get_chat_bucket(self, chat_id: int) -> TokenBucket:
+        """Возвращает ограничитель для чата, создавая его при необходимости."""
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= self._CHAT_BUCKETS_PRUNE_THRESHOLD:
+                self._chat_buckets = {
+                    cid: b for cid, b in self._chat_buckets.items() if not b.is_idle()
+                }
+            # Отрицательные ID - группы и каналы
+            rate = self._group_chat_rate if chat_id < 0 else self._private_chat_rate
+            bucket = TokenBucket(rate)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    async def _wait_flood_pause(self) -> None:
+        """Ожидает окончания паузы, заданной TelegramRetryAfter."""
+        delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _call(self, chat_id: int, priority: int, request: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Выполняет один запрос к Bot API с учётом лимитов чата и бота.
+
+        Args:
+            chat_id: ID чата
+            priority: Класс приоритета (слот отправки получает более важный)
+            request: Функция, создающая корутину запроса
+
+        Raises:
+            Exception: Ошибка запроса (TelegramRetryAfter также ставит общую паузу)
+        """
+        # Лимит чата - до слота: ожидание своего чата не должно занимать слот других чатов
+        await self._get_chat_bucket(chat_id).acquire(priority)
+
+        async with self._slots.acquire(priority):
+            await self._wait_flood_pause()
+            # Слоты держат и ответы, и рассылки: токен первым получает более важный
+            await self._global_bucket.acquire(priority)
+            try:
+                return await request()
+            except TelegramRetryAfter as e:
+                # Приостанавливаем все отправки, а не только этот чат
+                self._paused_until = max(self._paused_until, time.monotonic() + e.retry_after)
+                raise
+
+    async def _attempt(self, message: OutgoingMessage) -> None:
+        """
+        Выполняет одну попытку отправки с учётом лимитов.
+
+        Текст длиннее лимита Telegram отправляется несколькими сообщениями
+        по границам строк (клавиатура - у последнего). Каждая часть расходует
+        свой токен лимитов; повтор продолжает с первой недоставленной части.
+
+        Raises:
+            Exception: Ошибка отправки (TelegramRetryAfter также ставит общую паузу)
+        """
+        parts = split_message(message.text)
+        last_part = len(parts) - 1
+        for index in range(message.sent_parts, len(parts)):
+            await self._call(message.chat_id, message.priority, lambda: self.bot.send_message(
+                chat_id=message.chat_id,
+                text=parts[index],
+                reply_markup=message.reply_markup if index == last_part else None
+            ))
+            message.sent_parts = index + 1
+
+        self._record_delivery(message)
+        if message.on_sent is not None:
+            message.on_sent()
+
+    async def reply(self, chat_id: int, request: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Отправляет ответ в диалоге (message.answer, edit_text) с приоритетом
+        ниже рассылок круга.
+
+        Ответ не повторяется через очередь повторов: ошибка передаётся вызывающему.
+
+        Args:
+            chat_id: ID чата
+            request: Функция, создающая корутину запроса к Bot API
+
+        Returns:
+            Результат запроса
+        """
+        created_at = time.monotonic()
+        result = await self._call(chat_id, PRIORITY_REPLY, request)
+        self.slo.record(PRIORITY_NAMES[PRIORITY_REPLY], REPLY_DELIVERY_SLO, time.monotonic() - created_at)
+        return result
+
+    def get_queue_depth(self) -> Dict[str, int]:
+        """Возвращает количество отправок, ожидающих слот, по классам приоритета."""
+        return {name: self._slots.waiting.get(priority, 0) for priority, name in PRIORITY_NAMES.items()}
+
+    async def send(self, message: OutgoingMessage) -> bool:
+        """
+        Отправляет одно сообщение; при ошибке передаёт его в очередь повторов.
+
+        Args:
+            message: Сообщение для отправки
+
+        Returns:
+            True, если сообщение доставлено с первой попытки
+        """
+        try:
+            await self._attempt(message)
+        except Exception as e:
+            self.retry_queue.submit(message, e)
+            return False
+        return True
+
+    def start(self) -> None:
+        """Запускает фоновые задачи диспетчера (очередь повторов)."""
+        self.retry_queue.start()
+
+    async def stop(self) -> None:
+        """Останавливает фоновые задачи диспетчера."""
+        await self.retry_queue.stop()
+
+    async def broadcast(self, messages: Iterable[OutgoingMessage], label: str) -> BroadcastReport:
+        """
+        Рассылает сообщения конкурентно и собирает статистику доставки.
+
+        Args:
+            messages: Сообщения для отправки
+            label: Название рассылки для лога (например, "Круг 3")
+
+        Returns:
+            Итоги рассылки с задержками доставки
+        """
+        report = BroadcastReport(label=label)
+        started = time.monotonic()
+
+        async def deliver(message: OutgoingMessage):
+            if await self.send(message):
+                report.sent += 1
+                report.latencies.append(time.monotonic() - started)
+            else:
+                report.deferred += 1
+
+        await asyncio.gather(*(deliver(message) for message in messages))
+        report.duration = time.monotonic() - started
+        if report.sent or report.deferred:
+            logger.info(f"📊 Рассылка {report.summary()}")
+        return report
@@ -0,0 +1,148 @@
+"""Компактное колоночное хранилище участников гонки."""
+import sys
+from array import array
+from functools import lru_cache
+from typing import List, Dict, Any, Iterable, Sequence, Tuple
+
+# Значение в колонке круга, если у участника нет позиции на этом круге
+MISSING = -1
+
+
+@lru_cache(maxsize=None)
+def lap_keys(total_laps: int) -> Tuple[str, ...]:
+    """Возвращает ключи кругов ("lap1", "lap2", ...) в исходном формате данных."""
+    return tuple(f"lap{lap_number}" for lap_number in range(1, total_laps + 1))
+
+
+class ParticipantColumns:
+    """
+    Участники гонки в колоночном виде.
+
+    Вместо списка словарей хранит таблицу кошельков, таблицу уникальных
+    названий команд (строки интернированы) и колонки array('i') со стартовой
+    позицией, id команды и позицией на каждом круге. Участник адресуется
+    целочисленным id - индексом в колонках (порядок как в исходных данных).
+    """
+
+    def __init__(self, total_laps: int = 12):
+        """
+        Инициализация пустого хранилища.
+
+        Args:
+            total_laps: Общее количество кругов
+        """
+        self.total_laps = total_laps
+        self.users: List[str] = []
+        self.team_table: List[str] = []
+        self._team_lookup: Dict[str, int] = {}
+        self.team_ids = array('i')
+        self.start_positions = array('i')
+        self.laps: List[array] = [array('i') for _ in range(total_laps)]
+        self._lap_keys = lap_keys(total_laps)
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]], total_laps: int = 12) -> "ParticipantColumns":
+        """
+        Строит колонки из списка словарей в формате race_2_results.json.
+
+        Args:
+            records: Словари с данными участников
+            total_laps: Общее количество кругов
+        """
+        columns = cls(total_laps)
+        for record in records:
+            columns.append(record)
+        return columns
+
+    @classmethod
+    def from_arrays(
+        cls,
+        users: List[str],
+        team_table: List[str],
+        team_ids: Sequence[int],
+        start_positions: Sequence[int],
+        laps: List[Sequence[int]],
+    ) -> "ParticipantColumns":
+        """
+        Собирает хранилище из готовых колонок без копирования.
+
+        Колонки могут быть array('i') или memoryview('i') поверх бинарного
+        снимка; в последнем случае хранилище доступно только для чтения.
+
+        Args:
+            users: Кошельки участников
+            team_table: Уникальные названия команд
+            team_ids: id команды каждого участника
+            start_positions: Стартовые позиции
+            laps: Колонки позиций по кругам
+        """
+        columns = cls(len(laps))
+        columns.users = users
+        columns.team_table = team_table
+        columns._team_lookup = {team_name: team_id for team_id, team_name in enumerate(team_table)}
+        columns.team_ids = team_ids
+        columns.start_positions = start_positions
+        columns.laps = laps
+        return columns
+
+    def append(self, record: Dict[str, Any]) -> int:
+        """
+        Добавляет участника.
+
+        Args:
+            record: Словарь с данными участника (user, team_name, start_position, lapN)
+
+        Returns:
+            id участника
+        """
+        user = record.get('user', '')
+        self.users.append(sys.intern(user) if isinstance(user, str) else user)
+
+        team_name = record.get('team_name', 'Unknown')
+        team_id = self._team_lookup.get(team_name)
+        if team_id is None:
+            team_id = len(self.team_table)
+            self.team_table.append(sys.intern(team_name) if isinstance(team_name, str) else team_name)
+            self._team_lookup[team_name] = team_id
+        self.team_ids.append(team_id)
+
+        self.start_positions.append(record.get('start_position', 0))
+        for lap_key, column in zip(self._lap_keys, self.laps):
+            value = record.get(lap_key)
+            column.append(value if isinstance(value, int) else MISSING)
+        return len(self.users) - 1
+
+    def __len__(self) -> int:
+        """Количество участников."""
+        return len(self.users)
+
+    def team_name(self, participant_id: int) -> str:
+        """Возвращает название команды участника."""
+        return self.team_table[self.team_ids[participant_id]]
+
+    def lap_column(self, lap_number: int) -> array:
+        """
+        Возвращает колонку позиций на круге (MISSING, если данных нет).
+
+        Args:
+            lap_number: Номер круга (с 1)
+        """
+        return self.laps[lap_number - 1]
+
+    def record(self, participant_id: int) -> Dict[str, Any]:
+        """
+        Возвращает данные участника в виде словаря исходного формата.
+
+        Args:
+            participant_id: id участника
+        """
+        record: Dict[str, Any] = {
+            'user': self.users[participant_id],
+            'team_name': self.team_name(participant_id),
+            'start_position': self.start_positions[participant_id],
+        }
+        for lap_key, column in zip(self._lap_keys, self.laps):
+            value = column[participant_id]
+            if value != MISSING:
+                record[lap_key] = value
+        return record
@@ -32,6 +32,7 @@ LANGUAGE_MESSAGES = {
         "tracking_already_active": "Отслеживание уже активно для: {entity_display}",
         "tracking_not_active": "Отслеживание не активно.",
         "error": "❌ Произошла ошибка при обработке запроса. Попробуйте позже.",
+        "busy": "⏳ Сейчас много запросов. Отправьте кошелёк или название команды ещё раз через несколько секунд.",
         "account": "кошелёк <b>{value}</b>",
         "team": "команда <b>{value}</b>",
         "current_language_warning": "Внимание! Контент будет отображаться на выбранном языке. Убедитесь, что язык выбран правильно.\nТекущий язык: {language}",
@@ -43,6 +44,9 @@ LANGUAGE_MESSAGES = {
         "no_data_lap": "Нет данных для круга {lap_number}",
         "lap": "Круг",
         "you_place": "Вы: {position} место",
+        "final_leaderboard": "🏁 <b>ФИНАЛЬНЫЕ РЕЗУЛЬТАТЫ</b>\n",
+        "no_data_final": "Нет данных о финальных результатах",
+        "final": "финал",
     },
     "en": {
         "start": (
@@ -76,6 +80,7 @@ LANGUAGE_MESSAGES = {
         "tracking_already_active": "Tracking is already active for: {entity_display}",
         "tracking_not_active": "Tracking is not active.",
         "error": "❌ An error occurred while processing the request. Please try again later.",
+        "busy": "⏳ Too many requests right now. Please send your wallet or team name again in a few seconds.",
         "account": "wallet <b>{value}</b>",
         "team": "team <b>{value}</b>",
         "current_language_warning": "Warning! Content will be displayed in the selected language. Make sure the language is correct.\nCurrent language: {language}",
@@ -87,6 +92,9 @@ LANGUAGE_MESSAGES = {
         "no_data_lap": "No data for lap {lap_number}",
         "lap": "Lap",
         "you_place": "You: {position} place",
+        "final_leaderboard": "🏁 <b>FINAL RESULTS</b>\n",
+        "no_data_final": "No final results data",
+        "final": "final",
     },
     "uk": {
         "start": (
@@ -120,6 +128,7 @@ LANGUAGE_MESSAGES = {
         "tracking_already_active": "Відстеження вже активне для: {entity_display}",
         "tracking_not_active": "Відстеження не активне.",
         "error": "❌ Сталася помилка під час обробки запиту. Спробуйте пізніше.",
+        "busy": "⏳ Зараз забагато запитів. Надішліть гаманець або назву команди ще раз за кілька секунд.",
         "account": "гаманець <b>{value}</b>",
         "team": "команда <b>{value}</b>",
         "current_language_warning": "Увага! Контент буде відображатися на вибраній мові. Переконайтеся, що обрано правильну мову.\nПоточна мова: {language}",
@@ -131,6 +140,9 @@ LANGUAGE_MESSAGES = {
         "no_data_lap": "Немає даних для круга {lap_number}",
         "lap": "Круг",
         "you_place": "Ви: {position} місце",
+        "final_leaderboard": "🏁 <b>ФІНАЛЬНІ РЕЗУЛЬТАТИ</b>\n",
+        "no_data_final": "Немає даних про фінальні результати",
+        "final": "фінал",
     }
 }
 
@@ -0,0 +1,141 @@
+"""HTTP-источник данных гонки с условными запросами."""
+import asyncio
+import json
+import time
+from typing import List, Dict, Any, Optional
+
+import aiohttp
+
+from bot.api_client import validate_race_data
+from bot.logger import setup_logger
+from bot.settings import RACE_DATA_TIMEOUT, TOTAL_LAPS
+
+logger = setup_logger()
+
+
+def _parse_race_data(body: bytes, total_laps: int) -> List[Dict[str, Any]]:
+    """Разбирает и валидирует тело ответа с данными гонки."""
+    data = json.loads(body)
+    validate_race_data(data, total_laps)
+    return data
+
+
+class HttpRaceDataSource:
+    """
+    Источник данных гонки по HTTP.
+
+    Использует одну сессию aiohttp с пулом keep-alive соединений и условные
+    запросы (If-None-Match/If-Modified-Since): если данные не изменились,
+    сервер отвечает 304 и тело не передаётся. При ошибке или таймауте
+    сохраняются последние успешно полученные данные (stale-while-revalidate).
+    """
+
+    def __init__(
+        self,
+        url: str,
+        timeout: float = RACE_DATA_TIMEOUT,
+        session: Optional[aiohttp.ClientSession] = None,
+        total_laps: int = TOTAL_LAPS,
+    ):
+        """
+        Инициализация источника.
+
+        Args:
+            url: Адрес эндпоинта с JSON-списком участников
+            timeout: Общий таймаут одного запроса в секундах
+            session: Готовая сессия (по умолчанию создаётся своя при первом запросе)
+            total_laps: Общее количество кругов гонки (для проверки полей lapN)
+        """
+        self.url = url
+        self.total_laps = total_laps
+        self._timeout = aiohttp.ClientTimeout(total=timeout)
+        self._session = session
+        self._owns_session = session is None
+        self._etag: Optional[str] = None
+        self._last_modified: Optional[str] = None
+        self._data: Optional[List[Dict[str, Any]]] = None
+        self._lock = asyncio.Lock()
+        self.last_success: Optional[float] = None
+        self.requests = 0
+        self.not_modified = 0
+        self.errors = 0
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Возвращает общую сессию, создавая её при необходимости."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=4, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self._timeout)
+            self._owns_session = True
+        return self._session
+
+    @property
+    def version_tag(self) -> Optional[str]:
+        """Метка версии последних данных (ETag или Last-Modified)."""
+        return self._etag or self._last_modified
+
+    def get_cached(self) -> Optional[List[Dict[str, Any]]]:
+        """Возвращает последние успешно полученные данные без запроса."""
+        return self._data
+
+    async def fetch(self) -> bool:
+        """
+        Выполняет условный запрос к источнику.
+
+        Ошибки сети, таймауты и невалидные данные не пробрасываются: в этом
+        случае остаются прежние данные.
+
+        Returns:
+            True, если получены новые данные
+        """
+        # Параллельные вызовы не должны дублировать запросы
+        async with self._lock:
+            headers = {}
+            if self._data is not None:
+                if self._etag:
+                    headers["If-None-Match"] = self._etag
+                if self._last_modified:
+                    headers["If-Modified-Since"] = self._last_modified
+
+            self.requests += 1
+            try:
+                async with self._get_session().get(self.url, headers=headers, timeout=self._timeout) as response:
+                    if response.status == 304:
+                        self.not_modified += 1
+                        self.last_success = time.time()
+                        return False
+                    response.raise_for_status()
+                    body = await response.read()
+                    etag = response.headers.get("ETag")
+                    last_modified = response.headers.get("Last-Modified")
+
+                # Разбор и валидация большого ответа - вне event loop
+                data = await asyncio.to_thread(_parse_race_data, body, self.total_laps)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                # json.JSONDecodeError - подкласс ValueError
+                self.errors += 1
+                if self._data is not None:
+                    logger.warning(f"⚠️ Источник {self.url} недоступен, используются прежние данные: {e}")
+                else:
+                    logger.error(f"❌ Не удалось получить данные гонки из {self.url}: {e}")
+                return False
+
+            self._data = data
+            self._etag = etag
+            self._last_modified = last_modified
+            self.last_success = time.time()
+            logger.info(f"Получено {len(data)} участников из {self.url}")
+            return True
+
+    async def close(self) -> None:
+        """Закрывает сессию, если она создана источником."""
+        if self._owns_session and self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает счётчики запросов."""
+        return {
+            "requests": self.requests,
+            "not_modified": self.not_modified,
+            "errors": self.errors,
+            "last_success": self.last_success,
+        }
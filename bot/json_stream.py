@@ -0,0 +1,107 @@
+"""Потоковый разбор JSON-массива объектов без загрузки всего файла в память."""
+import json
+import re
+from typing import Any, Iterator, TextIO
+
+# Размер блока чтения файла в символах
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_DELIMITER = re.compile(r"[,\]]")
+
+
+def iter_json_array(f: TextIO, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[Any]:
+    """
+    Последовательно разбирает элементы JSON-массива верхнего уровня.
+
+    Файл читается блоками по chunk_size символов, каждый элемент разбирается
+    C-сканером json (JSONDecoder.raw_decode) сразу после того, как целиком
+    попал в буфер. В памяти одновременно находятся только текущий блок
+    и один разобранный элемент.
+
+    Args:
+        f: Файл, открытый в текстовом режиме
+        chunk_size: Размер блока чтения
+
+    Yields:
+        Элементы массива по порядку
+
+    Raises:
+        json.JSONDecodeError: Если файл не является корректным JSON-массивом
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = "", 0, False
+    while not eof:
+        pos = _WHITESPACE.match(buffer, pos).end()
+        if pos < len(buffer):
+            break
+        buffer, pos = f.read(chunk_size), 0
+        eof = not buffer
+    if pos >= len(buffer) or buffer[pos] != "[":
+        raise json.JSONDecodeError("Ожидался JSON-массив", buffer, pos)
+    pos += 1
+    expect_comma = after_comma = False
+
+    while True:
+        pos = _WHITESPACE.match(buffer, pos).end()
+        if pos >= len(buffer):
+            if eof:
+                raise json.JSONDecodeError("Неожиданный конец файла", buffer, pos)
+            buffer, pos = f.read(chunk_size), 0
+            eof = not buffer
+            continue
+
+        char = buffer[pos]
+        if char == "]" and not after_comma:
+            _check_trailing(f, buffer, pos + 1, eof, chunk_size)
+            return
+        if expect_comma:
+            if char != ",":
+                raise json.JSONDecodeError("Ожидалась ',' между элементами массива", buffer, pos)
+            pos += 1
+            expect_comma = False
+            after_comma = True
+            continue
+
+        if char not in '{["' and not eof and _DELIMITER.search(buffer, pos) is None:
+            # Число или литерал на границе блока могли быть прочитаны не полностью
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # Элемент не поместился в буфер целиком - дочитываем следующий блок
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+
+        yield item
+        pos = end
+        expect_comma = True
+        after_comma = False
+        if pos >= chunk_size:
+            # Отбрасываем уже разобранную часть буфера
+            buffer, pos = buffer[pos:], 0
+
+
+def _check_trailing(f: TextIO, buffer: str, pos: int, eof: bool, chunk_size: int) -> None:
+    """
+    Проверяет, что после закрывающей скобки массива до конца файла только пробелы.
+
+    Raises:
+        json.JSONDecodeError: Если после массива есть другие данные
+    """
+    while True:
+        pos = _WHITESPACE.match(buffer, pos).end()
+        if pos < len(buffer):
+            raise json.JSONDecodeError("Лишние данные после JSON-массива", buffer, pos)
+        if eof:
+            return
+        buffer, pos = f.read(chunk_size), 0
+        eof = not buffer
@@ -1,229 +1,167 @@
 """Формирование лидерборды для гонки."""
-from typing import List, Dict, Any, Optional
-from bot.user_handlers import find_user_position, slice_leaderboard
+from bot.user_handlers import slice_leaderboard
 from bot.config.language_config import LANGUAGE_MESSAGES
+from bot.standings import StandingsIndex
 
 
-def format_start_leaderboard(participants: List[Dict[str, Any]]) -> str:
+def _position_emoji(idx: int) -> str:
+    """Возвращает медаль для первых трёх мест или номер позиции."""
+    if idx == 1:
+        return "🥇"
+    if idx == 2:
+        return "🥈"
+    if idx == 3:
+        return "🥉"
+    return f"{idx}."
+
+
+def _format_position_change(position_change: int) -> str:
+    """Форматирует изменение позиции со стрелкой."""
+    if position_change > 0:
+        return f"⬆️ +{position_change}"
+    if position_change < 0:
+        return f"⬇️ {position_change}"
+    return "➡️ 0"
+
+
+def render_start_leaderboard(standings: StandingsIndex, language: str = "ru") -> str:
     """
-    Формирует стартовую лидерборду по стартовым позициям.
-    
+    Формирует стартовую лидерборду напрямую из колонок снимка.
+
+    Словари участников не создаются: названия команд берутся из таблицы по id.
+
     Args:
-        participants: Список участников, отсортированных по start_position
-    
+        standings: Индекс снимка данных
+        language: Язык для переводов (ru, en, uk)
+
     Returns:
         Отформатированная строка с лидербордой
     """
-    if not participants:
-        return "Нет данных об участниках"
-    
-    lines = ["🏁 <b>СТАРТОВАЯ ПОЗИЦИЯ</b>\n"]
-    
-    # Показываем всех участников
-    for idx, participant in enumerate(participants, 1):
-        team_name = participant.get('team_name', 'Unknown')
-        
-        # Форматируем позицию с эмодзи
-        if idx == 1:
-            emoji = "🥇"
-        elif idx == 2:
-            emoji = "🥈"
-        elif idx == 3:
-            emoji = "🥉"
-        else:
-            emoji = f"{idx}."
-        
-        lines.append(f"{emoji} <b>{team_name}</b>")
-    
+    messages = LANGUAGE_MESSAGES.get(language, LANGUAGE_MESSAGES["ru"])
+    order = standings.get_start_order()
+    if not order:
+        return messages["no_data"]
+
+    team_table, team_ids = standings.columns.team_table, standings.columns.team_ids
+    lines = [messages["start_leaderboard"]]
+    for idx, participant_id in enumerate(order, 1):
+        lines.append(f"{_position_emoji(idx)} <b>{team_table[team_ids[participant_id]]}</b>")
     return "\n".join(lines)
 
 
-def format_lap_leaderboard(participants: List[Dict[str, Any]], lap_number: int) -> str:
+def render_lap_leaderboard(standings: StandingsIndex, lap_number: int, language: str = "ru") -> str:
     """
-    Формирует лидерборду для конкретного круга.
-    
+    Формирует лидерборду круга напрямую из колонок снимка.
+
+    Изменения позиций берутся из предрассчитанной колонки индекса.
+
     Args:
-        participants: Список участников, отсортированных по позиции на круге
+        standings: Индекс снимка данных
         lap_number: Номер круга
-    
+        language: Язык для переводов (ru, en, uk)
+
     Returns:
         Отформатированная строка с лидербордой
     """
-    if not participants:
-        return f"Нет данных для круга {lap_number}"
-    
-    lines = [f"🏁 <b>КРУГ {lap_number}</b>\n"]
-    
-    # Для первого круга сравниваем со стартовой позицией
-    # Для остальных кругов - с предыдущим кругом
-    previous_lap_key = f"lap{lap_number - 1}" if lap_number > 1 else None
-    
-    # Показываем всех участников
-    for idx, participant in enumerate(participants, 1):
-        team_name = participant.get('team_name', 'Unknown')
-        lap_position = participant.get(f'lap{lap_number}', 0)
-        
-        # Форматируем позицию с эмодзи
-        if idx == 1:
-            emoji = "🥇"
-        elif idx == 2:
-            emoji = "🥈"
-        elif idx == 3:
-            emoji = "🥉"
-        else:
-            emoji = f"{idx}."
-        
-        # Вычисляем изменение позиции
-        if lap_number == 1:
-            # Для первого круга сравниваем со стартовой позицией
-            start_pos = participant.get('start_position', 0)
-            position_change = start_pos - lap_position
-        else:
-            # Для остальных кругов сравниваем с предыдущим кругом
-            previous_lap_position = participant.get(previous_lap_key, lap_position)
-            position_change = previous_lap_position - lap_position
-        
-        # Форматируем изменение позиции
-        if position_change > 0:
-            change_str = f"⬆️ +{position_change}"
-        elif position_change < 0:
-            change_str = f"⬇️ {position_change}"
-        else:
-            change_str = "➡️ 0"
-        
-        lines.append(f"{emoji} <b>{team_name}</b> ({change_str})")
-    
+    messages = LANGUAGE_MESSAGES.get(language, LANGUAGE_MESSAGES["ru"])
+    order = standings.get_lap_order(lap_number)
+    if not order:
+        return messages["no_data_lap"].format(lap_number=lap_number)
+
+    team_table, team_ids = standings.columns.team_table, standings.columns.team_ids
+    deltas = standings.get_lap_deltas(lap_number)
+    lines = [messages["lap_leaderboard"].format(lap_number=lap_number)]
+    for idx, participant_id in enumerate(order, 1):
+        change_str = _format_position_change(deltas[participant_id])
+        lines.append(f"{_position_emoji(idx)} <b>{team_table[team_ids[participant_id]]}</b> ({change_str})")
     return "\n".join(lines)
 
 
-def format_final_leaderboard(participants: List[Dict[str, Any]]) -> str:
+def render_final_leaderboard(standings: StandingsIndex, language: str = "ru") -> str:
     """
-    Формирует финальную лидерборду по результатам последнего круга.
-    
+    Формирует финальную лидерборду напрямую из колонок снимка.
+
     Args:
-        participants: Список участников, отсортированных по финальной позиции
-    
+        standings: Индекс снимка данных
+        language: Язык для переводов (ru, en, uk)
+
     Returns:
         Отформатированная строка с финальной лидербордой
     """
-    if not participants:
-        return "Нет данных о финальных результатах"
-    
-    lines = ["🏁 <b>ФИНАЛЬНЫЕ РЕЗУЛЬТАТЫ</b>\n"]
-    
-    # Показываем всех участников
-    for idx, participant in enumerate(participants, 1):
-        team_name = participant.get('team_name', 'Unknown')
-        final_position = participant.get('lap12', 0)
-        start_pos = participant.get('start_position', 0)
-        
-        # Форматируем позицию с эмодзи
-        if idx == 1:
-            emoji = "🥇"
-        elif idx == 2:
-            emoji = "🥈"
-        elif idx == 3:
-            emoji = "🥉"
-        else:
-            emoji = f"{idx}."
-        
-        # Показываем изменение позиции относительно старта
-        position_change = start_pos - final_position
-        if position_change > 0:
-            change_str = f"⬆️ +{position_change}"
-        elif position_change < 0:
-            change_str = f"⬇️ {position_change}"
-        else:
-            change_str = "➡️ 0"
-        
-        lines.append(f"{emoji} <b>{team_name}</b> (финал: {final_position}, {change_str})")
-    
+    messages = LANGUAGE_MESSAGES.get(language, LANGUAGE_MESSAGES["ru"])
+    final_lap = standings.total_laps
+    order = standings.get_lap_order(final_lap)
+    if not order:
+        return messages["no_data_final"]
+
+    columns = standings.columns
+    team_table, team_ids = columns.team_table, columns.team_ids
+    final_positions = columns.lap_column(final_lap)
+    deltas = standings.get_final_deltas()
+    lines = [messages["final_leaderboard"]]
+    for idx, participant_id in enumerate(order, 1):
+        final_position = final_positions[participant_id]
+        change_str = _format_position_change(deltas[participant_id])
+        lines.append(
+            f"{_position_emoji(idx)} <b>{team_table[team_ids[participant_id]]}</b> "
+            f"({messages['final']}: {final_position}, {change_str})"
+        )
     return "\n".join(lines)
 
 
-def format_user_leaderboard(
-    leaderboard: List[Dict[str, Any]], 
-    lap_number: int, 
-    total_laps: int,
-    entity_type: str, 
+def render_user_leaderboard(
+    standings: StandingsIndex,
+    lap_number: int,
+    entity_type: str,
     entity_value: str,
-    previous_lap_leaderboard: Optional[List[Dict[str, Any]]] = None,
     language: str = "ru"
 ) -> str:
     """
-    Формирует персональную лидерборду для пользователя с окном ±5 позиций.
-    
+    Формирует персональную лидерборду (окно ±5 позиций) напрямую из колонок снимка.
+
+    Позиции на текущем и предыдущем круге берутся из индекса за O(1),
+    из колонок читаются только названия команд в окне.
+
     Args:
-        leaderboard: Полный список участников, отсортированных по позиции на круге
+        standings: Индекс снимка данных
         lap_number: Номер текущего круга
-        total_laps: Общее количество кругов
         entity_type: Тип сущности ("account" или "team")
         entity_value: Значение (кошелёк или название команды)
-        previous_lap_leaderboard: Лидерборда предыдущего круга (для расчёта изменения позиции)
         language: Язык для переводов (ru, en, uk)
-    
+
     Returns:
         Отформатированная строка с персональной лидербордой
     """
     messages = LANGUAGE_MESSAGES.get(language, LANGUAGE_MESSAGES["ru"])
-    
-    if not leaderboard:
+    order = standings.get_lap_order(lap_number)
+    if not order:
         return messages["no_data_lap"].format(lap_number=lap_number)
-    
-    # Находим позицию пользователя
-    position_result = find_user_position(leaderboard, entity_type, entity_value)
+
+    position_result = standings.find_position(lap_number, entity_type, entity_value)
     if position_result is None:
         return f"Участник не найден в лидерборде для круга {lap_number}"
-    
+
     user_position, user_index = position_result
-    
-    # Создаём окно ±5 позиций
-    window_leaderboard, start_idx, end_idx = slice_leaderboard(leaderboard, user_index, window_size=5)
-    
-    # Формируем заголовок с отступом сверху
-    lines = [f"\n🏁 {messages['lap']} {lap_number} / {total_laps}\n"]
-    
-    # Вычисляем изменение позиции относительно предыдущего круга
-    position_change = None
-    if previous_lap_leaderboard is not None:
-        # Находим позицию на предыдущем круге
-        prev_position_result = find_user_position(previous_lap_leaderboard, entity_type, entity_value)
-        if prev_position_result is not None:
-            prev_position, _ = prev_position_result
-            position_change = prev_position - user_position
-    
-    # Добавляем информацию о позиции пользователя
+    window, start_idx, _ = slice_leaderboard(order, user_index, window_size=5)
+
+    lines = [f"\n🏁 {messages['lap']} {lap_number} / {standings.total_laps}\n"]
+
     change_str = ""
-    if position_change is not None:
-        if position_change > 0:
-            change_str = f" ⬆️ +{position_change}"
-        elif position_change < 0:
-            change_str = f" ⬇️ {position_change}"
-        else:
-            change_str = " ➡️ 0"
-    
+    if lap_number > 1:
+        prev_position_result = standings.find_position(lap_number - 1, entity_type, entity_value)
+        if prev_position_result is not None:
+            change_str = " " + _format_position_change(prev_position_result[0] - user_position)
+
     lines.append(f"➡️ {messages['you_place'].format(position=user_position)}{change_str}\n")
-    
-    # Форматируем участников в окне
-    for idx, participant in enumerate(window_leaderboard):
-        actual_position = start_idx + idx + 1  # Позиция в полной лидерборде (1-based)
-        team_name = participant.get('team_name', 'Unknown')
-        
-        # Проверяем, это ли пользователь
-        is_user = False
-        if entity_type == "account":
-            is_user = participant.get('user', '').lower() == entity_value.lower()
-        elif entity_type == "team":
-            is_user = participant.get('team_name', '').lower() == entity_value.lower()
-        
-        # Форматируем позицию
-        if is_user:
-            # Выделяем пользователя с отступами сверху и снизу
-            lines.append("")  # Отступ сверху
-            lines.append(f"{actual_position}. 🔥 <b>{team_name}</b>")
-            lines.append("")  # Отступ снизу
+
+    team_table, team_ids = standings.columns.team_table, standings.columns.team_ids
+    user_ids = set(standings.get_entity_ids(entity_type, entity_value))
+    for idx, participant_id in enumerate(window):
+        actual_position = start_idx + idx + 1
+        if participant_id in user_ids:
+            lines.append("")
+            lines.append(f"{actual_position}. 🔥 <b>{team_table[team_ids[participant_id]]}</b>")
+            lines.append("")
         else:
-            lines.append(f"{actual_position}. {team_name}")
-    
+            lines.append(f"{actual_position}. {team_table[team_ids[participant_id]]}")
     return "\n".join(lines)
-
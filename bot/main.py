@@ -1,20 +1,27 @@
 """Главный файл бота."""
 import asyncio
 import sys
+from datetime import datetime
+from typing import Optional
 from aiogram import Bot, Dispatcher
 from aiogram.enums import ParseMode
 from aiogram.filters import ChatMemberUpdatedFilter, IS_MEMBER, IS_NOT_MEMBER, Command
 from aiogram.types import ChatMemberUpdated, Update, Message, CallbackQuery
 from aiogram.client.default import DefaultBotProperties
 
-from bot.settings import BOT_TOKEN, RACE_START_TIME, CHAT_ID, CHAT_ID_STR, TOTAL_LAPS
+from bot.settings import (
+    BOT_TOKEN, CHAT_ID, CHAT_ID_STR, RACE_DATA_POLL_INTERVAL, RACE_DATA_WATCH_INTERVAL, RACES_FILE,
+    TRACKER_SHARDS, TRACKER_SHARD_MIN_GROUPS, DM_MAX_PENDING, DM_MAX_CONCURRENCY, DM_BUSY_REPLY_WINDOW, WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_HOST, WEBHOOK_PORT,
+    WEBHOOK_SECRET, WEBHOOK_MAX_CONNECTIONS, WEBHOOK_MAX_CONCURRENCY, WEBHOOK_MAX_PENDING
+)
 from bot.logger import setup_logger
-from bot.race_clock import get_race_status, get_current_lap, is_race_active
-from bot.api_client import RaceDataClient
-from bot.leaderboard import format_start_leaderboard, format_lap_leaderboard, format_user_leaderboard
-from bot.state import StateManager
+from bot.admission import AdmissionController, ADMITTED, SHED
+from bot.race_registry import Race, RaceRegistry, load_race_configs
+from bot.broadcast import BroadcastEngine, OutgoingMessage
+from bot.scheduler import LapScheduler, RaceEvent
+from bot.tracker_shards import TrackerShardPool
+from bot.webhook import WebhookRequestHandler, start_webhook_server
 from bot.user_handlers import validate_user_identifier
-from bot.user_state import UserStateManager
 from bot.keyboards import get_language_keyboard, get_stop_tracking_keyboard, get_empty_keyboard
 from bot.config.language_config import LANGUAGE_MESSAGES, DEFAULT_LANGUAGE
 
@@ -25,14 +32,80 @@ logger = setup_logger()
 bot = Bot(token=BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
 dp = Dispatcher()
 
-# Менеджер состояний для чатов
-state_manager = StateManager()
+# Реестр гонок: у каждой гонки свои расписание, источник данных, снимок,
+# кэш отрисовки, состояния чатов и отслеживающие пользователи.
+# Без RACES_FILE - одна гонка из настроек (RACE_START_TIME, RACE_DATA_URL)
+race_registry = RaceRegistry(load_race_configs(RACES_FILE))
 
-# Менеджер состояний для пользователей (user-mode)
-user_state_manager = UserStateManager()
 
-# Список активных чатов (где бот добавлен)
-active_chats: set[int] = set()
+def on_chat_forbidden(chat_id: int):
+    """Отключает рассылку в чат, где бот заблокирован или удалён."""
+    if chat_id < 0:
+        for race in race_registry:
+            race.state_manager.deactivate_chat(chat_id)
+        logger.warning(f"🚫 Чат {chat_id} удалён из активных: бот не может туда писать")
+    elif any([race.user_state_manager.stop_tracking(chat_id) for race in race_registry]):
+        logger.warning(f"🚫 Пользователь {chat_id} заблокировал бота, отслеживание остановлено")
+
+
+# Диспетчер рассылки с ограничением конкурентности и лимитами Telegram (общий для всех гонок)
+broadcast_engine = BroadcastEngine(bot, on_forbidden=on_chat_forbidden)
+
+# Планировщик событий всех гонок (старт, окончание кругов, финиш)
+lap_scheduler = LapScheduler()
+
+# Процессы-шарды для персональных лидерборд (если TRACKER_SHARDS > 1)
+tracker_shard_pool = TrackerShardPool(TRACKER_SHARDS) if TRACKER_SHARDS > 1 else None
+
+# Контроль допуска ввода пользователей: ограниченная очередь, дедупликация и лимит конкурентности
+dm_admission = AdmissionController(DM_MAX_PENDING, DM_MAX_CONCURRENCY, DM_BUSY_REPLY_WINDOW)
+
+# Обработчик webhook (если задан WEBHOOK_URL), создаётся при запуске
+webhook_handler: Optional[WebhookRequestHandler] = None
+
+# Интервал логирования статуса гонки в секундах
+STATUS_LOG_INTERVAL = 30
+
+# Через сколько персональных текстов прогрев отдаёт управление event loop
+PREWARM_YIELD_EVERY = 500
+
+
+def get_active_chats() -> set[int]:
+    """Возвращает активные чаты (где бот добавлен) по всем гонкам."""
+    chat_ids = set()
+    for race in race_registry:
+        chat_ids.update(race.active_chats)
+    return chat_ids
+
+
+def get_user_language(user_id: int) -> str:
+    """Возвращает язык пользователя (выбор языка общий для всех гонок)."""
+    return race_registry.default.user_state_manager.get_state(user_id).language
+
+
+def with_race_title(race: Race, text: str) -> str:
+    """
+    Добавляет к тексту название гонки, если в процессе несколько гонок.
+
+    Вызывается один раз на отрисованный текст, а не на получателя.
+    """
+    if len(race_registry) == 1:
+        return text
+    return f"🏎 <b>{race.race_id}</b>\n{text}"
+
+
+async def reply(message: Message, text: str, **kwargs):
+    """
+    Отвечает пользователю через диспетчер рассылки с приоритетом ниже
+    рассылок круга: на границе круга ответы ждут, пока уходят лидерборды.
+
+    Args:
+        message: Сообщение, на которое отвечаем
+        text: Текст ответа
+        **kwargs: Параметры message.answer (например, reply_markup)
+    """
+    return await broadcast_engine.reply(message.chat.id, lambda: message.answer(text, **kwargs))
+
 
 # Бот не обрабатывает команды в группах - только публикует сообщения автоматически
 # В личных сообщениях обрабатывает ввод пользователя (user-mode)
@@ -46,7 +119,8 @@ async def cmd_start(message: Message):
     
     # Всегда показываем выбор языка на английском при первом запуске
     messages = LANGUAGE_MESSAGES["en"]
-    await message.answer(
+    await reply(
+        message,
         messages["choose_language"],
         reply_markup=get_language_keyboard()
     )
@@ -58,13 +132,14 @@ async def process_language_choice(callback: CallbackQuery):
     try:
         language = callback.data.split("_")[1]
         user_id = callback.from_user.id
-        
-        # Сохраняем выбор языка
-        user_state_manager.set_language(user_id, language)
-        
+
+        # Сохраняем выбор языка (во всех гонках: от него зависят персональные тексты)
+        for race in race_registry:
+            race.user_state_manager.set_language(user_id, language)
+
         # Показываем начальное сообщение на выбранном языке
         messages = LANGUAGE_MESSAGES[language]
-        await callback.message.edit_text(messages["start"])
+        await broadcast_engine.reply(callback.message.chat.id, lambda: callback.message.edit_text(messages["start"]))
         
         # Уведомление на выбранном языке
         lang_names = {"ru": "Русский", "en": "English", "uk": "Українська"}
@@ -82,7 +157,8 @@ async def cmd_language(message: Message):
     
     # Показываем выбор языка на английском
     messages = LANGUAGE_MESSAGES["en"]
-    await message.answer(
+    await reply(
+        message,
         messages["choose_language"],
         reply_markup=get_language_keyboard()
     )
@@ -92,61 +168,99 @@ async def cmd_language(message: Message):
 async def handle_user_input(message: Message):
     """Обработчик ввода пользователя и кнопки 'Прекратить отслеживание'."""
     user_id = message.from_user.id
-    user_state = user_state_manager.get_state(user_id)
-    language = user_state.language
+    language = get_user_language(user_id)
     messages = LANGUAGE_MESSAGES[language]
     
     # Проверяем, не нажата ли кнопка "Прекратить отслеживание"
     if message.text == messages["stop_tracking"]:
-        if user_state.is_tracking:
-            # Останавливаем отслеживание
-            user_state.is_tracking = False
-            await message.answer(
+        # Останавливаем отслеживание во всех гонках
+        if any([race.user_state_manager.stop_tracking(user_id) for race in race_registry]):
+            await reply(
+                message,
                 messages["tracking_stopped"],
                 reply_markup=get_empty_keyboard()
             )
         else:
-            await message.answer(messages.get("tracking_not_active", "Отслеживание не активно."))
+            await reply(message, messages.get("tracking_not_active", "Отслеживание не активно."))
         return
     
     # Обрабатываем обычный ввод (кошелёк или команда)
     user_input = message.text.strip()
     
     logger.info(f"Пользователь {user_id} ввёл: {user_input}")
-    
+
+    # При всплеске запросов повторы не обрабатываются, а сверх очереди - отклоняются
+    admission, sequence = dm_admission.admit(user_id, user_input)
+    if admission != ADMITTED:
+        if admission == SHED:
+            try:
+                await reply(message, messages["busy"])
+            finally:
+                dm_admission.shed_replied()
+        return
+
+    async with dm_admission.processing(user_id, sequence) as is_latest:
+        if is_latest:
+            await process_user_input(message, user_id, user_input, language)
+
+
+async def process_user_input(message: Message, user_id: int, user_input: str, language: str):
+    """
+    Ищет введённый кошелёк или команду в данных гонок и включает отслеживание.
+
+    Args:
+        message: Сообщение пользователя
+        user_id: ID пользователя
+        user_input: Введённый текст
+        language: Язык пользователя
+    """
+    messages = LANGUAGE_MESSAGES[language]
     try:
-        # Загружаем данные гонки
-        api_client = RaceDataClient()
-        data = api_client.get_data()
-        
-        # Валидируем ввод пользователя
-        result = validate_user_identifier(data, user_input)
-        
-        if result is None:
+        # Ищем сущность в данных каждой гонки (поиск по хеш-индексу снимка)
+        matches = []
+        for race in race_registry:
+            try:
+                snapshot = race.data_store.get_snapshot()
+            except Exception as e:
+                logger.warning(f"⚠️ Данные гонки {race.race_id} недоступны: {e}")
+                continue
+            result = validate_user_identifier(user_input, snapshot.standings)
+            if result is not None:
+                matches.append((race, result))
+
+        if not matches:
             # Сущность не найдена
-            await message.answer(messages["not_found"].format(input=user_input))
+            await reply(message, messages["not_found"].format(input=user_input))
             return
-        
-        entity_type, entity_value, participant_data = result
-        
-        # Получаем состояние пользователя
-        user_state = user_state_manager.get_state(user_id)
-        
-        # Проверяем, не отслеживается ли уже эта сущность
-        if user_state.is_tracking and user_state.entity_type == entity_type and user_state.entity_value == entity_value:
+
+        entity_type, entity_value, participant_data = matches[0][1]
+
+        # Проверяем, не отслеживается ли уже эта сущность во всех гонках, где она найдена
+        already_tracking = True
+        for race, (found_type, found_value, _) in matches:
+            user_state = race.user_state_manager.get_state(user_id)
+            if not (user_state.is_tracking and user_state.entity_type == found_type and user_state.entity_value == found_value):
+                already_tracking = False
+        if already_tracking:
             # Уже отслеживается
             entity_display = messages[entity_type].format(value=entity_value)
-            await message.answer(messages["tracking_already_active"].format(entity_display=entity_display))
+            await reply(message, messages["tracking_already_active"].format(entity_display=entity_display))
             return
-        
-        # Сохраняем выбор пользователя и включаем отслеживание
-        user_state_manager.set_tracked_entity(user_id, entity_type, entity_value)
-        user_state.is_tracking = True
-        user_state.last_sent_lap = 0  # Сбрасываем счётчик отправленных кругов
-        
+
+        # Сохраняем выбор пользователя и включаем отслеживание с первого круга в каждой
+        # гонке, где сущность найдена; в остальных гонках прежнее отслеживание выключается
+        found_race_ids = set()
+        for race, (found_type, found_value, _) in matches:
+            race.user_state_manager.start_tracking(user_id, found_type, found_value)
+            found_race_ids.add(race.race_id)
+        for race in race_registry:
+            if race.race_id not in found_race_ids:
+                race.user_state_manager.stop_tracking(user_id)
+
         # Формируем сообщение
         entity_display = messages[entity_type].format(value=entity_value)
-        await message.answer(
+        await reply(
+            message,
             messages["found"].format(
                 entity_display=entity_display,
                 team_name=participant_data.get('team_name', 'Unknown'),
@@ -154,10 +268,31 @@ async def handle_user_input(message: Message):
             ),
             reply_markup=get_stop_tracking_keyboard(language)
         )
-        
+                
     except Exception as e:
         logger.error(f"Ошибка при обработке ввода пользователя {user_id}: {e}", exc_info=True)
-        await message.answer(messages["error"])
+        await reply(message, messages["error"])
+
+
+async def register_chat(chat_id: int):
+    """
+    Добавляет чат в активные во всех гонках и отправляет стартовую
+    лидерборду уже идущих гонок.
+
+    Args:
+        chat_id: ID чата
+    """
+    for race in race_registry:
+        race.state_manager.activate_chat(chat_id)
+    logger.info(f"📋 Теперь активных чатов: {len(get_active_chats())}")
+
+    # Если гонка уже началась, отправляем стартовую лидерборду
+    active_races = race_registry.get_active()
+    for race in active_races:
+        logger.info(f"Гонка {race.race_id} активна, отправляем стартовую лидерборду в чат {chat_id}")
+        await send_start_leaderboard(race, chat_id)
+    if not active_races:
+        logger.info(f"Гонка ещё не началась, стартовая лидерборда будет отправлена при старте")
 
 
 @dp.message(lambda m: m.chat.type != "private")
@@ -167,16 +302,10 @@ async def on_any_message(message: Message):
     
     # Для групп/каналов - регистрируем чат
     chat_title = message.chat.title or "группа"
-    
-    if chat_id not in active_chats:
-        active_chats.add(chat_id)
+
+    if any(chat_id not in race.active_chats for race in race_registry):
         logger.info(f"📝 Обнаружен чат {chat_id} ({chat_title}) через сообщение")
-        logger.info(f"📋 Теперь активных чатов: {len(active_chats)}")
-        
-        # Если гонка уже началась, отправляем стартовую лидерборду
-        if is_race_active():
-            logger.info(f"Гонка активна, отправляем стартовую лидерборду в чат {chat_id}")
-            await send_start_leaderboard(chat_id)
+        await register_chat(chat_id)
     else:
         # Логируем первые несколько сообщений для отладки
         if not hasattr(on_any_message, '_log_count'):
@@ -192,293 +321,632 @@ async def on_any_message(message: Message):
 async def on_bot_added_to_chat(event: ChatMemberUpdated):
     """Обработчик добавления бота в чат (my_chat_member - для самого бота)."""
     chat_id = event.chat.id
-    active_chats.add(chat_id)
     chat_title = event.chat.title or 'личный чат'
     logger.info(f"🤖 Бот добавлен в чат {chat_id} ({chat_title})")
-    logger.info(f"📋 Теперь активных чатов: {len(active_chats)}")
-    
-    # Если гонка уже началась, отправляем стартовую лидерборду
-    if is_race_active():
-        logger.info(f"Гонка активна, отправляем стартовую лидерборду в чат {chat_id}")
-        await send_start_leaderboard(chat_id)
-    else:
-        logger.info(f"Гонка ещё не началась, стартовая лидерборда будет отправлена при старте")
+    await register_chat(chat_id)
 
 
-async def send_start_leaderboard(chat_id: int):
-    """Отправляет стартовую лидерборду в чат."""
+async def send_start_leaderboard(race: Race, chat_id: int, leaderboard_text: Optional[str] = None):
+    """
+    Отправляет стартовую лидерборду в чат.
+    
+    Args:
+        race: Гонка
+        chat_id: ID чата
+        leaderboard_text: Уже отрисованный текст (при рассылке во все чаты);
+                          если не указан, берётся из кэша отрисовки
+    """
     try:
-        state = state_manager.get_state(chat_id)
-        
+        state = race.state_manager.get_state(chat_id)
+
         # Проверяем, не опубликована ли уже стартовая лидерборда
         if state.start_leaderboard_published:
             return
         
-        # Загружаем данные и формируем лидерборду
-        api_client = RaceDataClient()
-        participants = api_client.get_participants_sorted_by_start_position()
-        leaderboard_text = format_start_leaderboard(participants)
-        
-        # Отправляем сообщение
-        await bot.send_message(chat_id=chat_id, text=leaderboard_text)
-        
-        # Отмечаем, что стартовая лидерборда опубликована
-        state.mark_start_leaderboard_published()
-        logger.info(f"✅ Стартовая лидерборда отправлена в чат {chat_id}")
-        
+        if leaderboard_text is None:
+            leaderboard_text = with_race_title(
+                race, race.render_cache.get_start_leaderboard(race.data_store.get_snapshot())
+            )
+
+        # Отправляем сообщение и отмечаем, что стартовая лидерборда опубликована
+        await broadcast_engine.send(_start_leaderboard_message(race, chat_id, leaderboard_text))
+
     except Exception as e:
         logger.error(f"❌ Ошибка при отправке стартовой лидерборды в чат {chat_id}: {e}", exc_info=True)
 
 
-async def send_lap_leaderboard(chat_id: int, lap_number: int):
-    """Отправляет лидерборду для конкретного круга в чат."""
+async def send_lap_leaderboard(race: Race, chat_id: int, lap_number: int, leaderboard_text: Optional[str] = None):
+    """
+    Отправляет лидерборду для конкретного круга в чат.
+    
+    Args:
+        race: Гонка
+        chat_id: ID чата
+        lap_number: Номер круга
+        leaderboard_text: Уже отрисованный текст (при рассылке во все чаты);
+                          если не указан, берётся из кэша отрисовки
+    """
     try:
-        state = state_manager.get_state(chat_id)
-        
+        state = race.state_manager.get_state(chat_id)
+
         # Проверяем, не опубликована ли уже лидерборда для этого круга
         if state.is_lap_published(lap_number):
             return
         
-        # Загружаем данные и формируем лидерборду
-        api_client = RaceDataClient()
-        participants = api_client.get_participants_sorted_by_lap(lap_number)
-        leaderboard_text = format_lap_leaderboard(participants, lap_number)
-        
-        # Отправляем сообщение
-        await bot.send_message(chat_id=chat_id, text=leaderboard_text)
-        
-        # Отмечаем, что лидерборда для круга опубликована
-        state.mark_lap_published(lap_number)
-        logger.info(f"✅ Лидерборда для круга {lap_number} отправлена в чат {chat_id}")
-        
+        if leaderboard_text is None:
+            leaderboard_text = with_race_title(
+                race, race.render_cache.get_lap_leaderboard(race.data_store.get_snapshot(), lap_number)
+            )
+
+        # Отправляем сообщение и отмечаем, что лидерборда для круга опубликована
+        await broadcast_engine.send(_lap_leaderboard_message(race, chat_id, lap_number, leaderboard_text))
+
     except Exception as e:
         logger.error(f"❌ Ошибка при отправке лидерборды для круга {lap_number} в чат {chat_id}: {e}", exc_info=True)
 
 
-async def check_and_send_start_leaderboard():
-    """Проверяет и отправляет стартовую лидерборду при старте гонки."""
-    if RACE_START_TIME is None:
-        return
+def _start_leaderboard_message(race: Race, chat_id: int, leaderboard_text: str) -> OutgoingMessage:
+    """Создаёт сообщение со стартовой лидербордой, отмечающее публикацию после отправки."""
+    state = race.state_manager.get_state(chat_id)
+    active_chats = race.active_chats
+
+    def on_sent():
+        state.mark_start_leaderboard_published()
+        logger.info(f"✅ Стартовая лидерборда ({race.race_id}) отправлена в чат {chat_id}")
+
+    def is_stale() -> bool:
+        return state.start_leaderboard_published or chat_id not in active_chats
+    
+    return OutgoingMessage(
+        chat_id=chat_id, text=leaderboard_text, on_sent=on_sent, is_stale=is_stale, race_id=race.race_id
+    )
+
+
+def _lap_leaderboard_message(race: Race, chat_id: int, lap_number: int, leaderboard_text: str) -> OutgoingMessage:
+    """Создаёт сообщение с лидербордой круга, отмечающее публикацию после отправки."""
+    state = race.state_manager.get_state(chat_id)
+    active_chats = race.active_chats
+
+    def on_sent():
+        state.mark_lap_published(lap_number)
+        logger.info(f"✅ Лидерборда для круга {lap_number} ({race.race_id}) отправлена в чат {chat_id}")
+
+    def is_stale() -> bool:
+        return state.is_lap_published(lap_number) or chat_id not in active_chats
+    
+    return OutgoingMessage(
+        chat_id=chat_id, text=leaderboard_text, on_sent=on_sent, is_stale=is_stale, race_id=race.race_id
+    )
+
+
+def _final_leaderboard_message(race: Race, chat_id: int, leaderboard_text: str) -> OutgoingMessage:
+    """Создаёт сообщение с финальной лидербордой, отмечающее публикацию после отправки."""
+    state = race.state_manager.get_state(chat_id)
+    active_chats = race.active_chats
+
+    def on_sent():
+        state.mark_final_leaderboard_published()
+        logger.info(f"✅ Финальная лидерборда ({race.race_id}) отправлена в чат {chat_id}")
+
+    def is_stale() -> bool:
+        return state.final_leaderboard_published or chat_id not in active_chats
     
-    # Получаем список чатов для отправки
+    return OutgoingMessage(
+        chat_id=chat_id, text=leaderboard_text, on_sent=on_sent, is_stale=is_stale, race_id=race.race_id
+    )
+
+
+def get_target_chat_ids(race: Race) -> set[int]:
+    """Возвращает ID групповых чатов для публикации гонки (CHAT_ID из конфига и активные чаты)."""
     chat_ids = set()
     if CHAT_ID:
         chat_ids.add(CHAT_ID)
     # Добавляем активные чаты (где бот добавлен)
-    chat_ids.update(active_chats)
-    
-    # Логируем информацию о чатах только раз в 30 секунд
-    if not hasattr(check_and_send_start_leaderboard, '_last_log_time'):
-        check_and_send_start_leaderboard._last_log_time = 0
-    
-    import time
-    current_time = time.time()
-    if current_time - check_and_send_start_leaderboard._last_log_time >= 30:
-        if CHAT_ID:
-            logger.info(f"📋 Используется CHAT_ID из конфига: {CHAT_ID}")
-        if active_chats:
-            logger.info(f"📋 Активные чаты (обнаружены автоматически): {active_chats}")
+    chat_ids.update(race.active_chats)
+    return chat_ids
+
+
+async def broadcast_start_leaderboard(race: Race):
+    """Формирует стартовую лидерборду один раз и рассылает её во все чаты."""
+    chat_ids = get_target_chat_ids(race)
+
+    # Чаты, куда стартовая лидерборда ещё не отправлена
+    pending_chat_ids = [
+        chat_id for chat_id in chat_ids
+        if not race.state_manager.get_state(chat_id).start_leaderboard_published
+    ]
+    if not pending_chat_ids:
         if not chat_ids:
             logger.warning("⚠️ Нет чатов для отправки! Укажите CHAT_ID в .env или отправьте сообщение в чат, где находится бот")
-        check_and_send_start_leaderboard._last_log_time = current_time
-    
-    if not chat_ids:
         return
-    
-    # Проверяем, началась ли гонка
-    race_active = is_race_active()
-    
-    if not race_active:
+
+    logger.info(f"🏁 Гонка {race.race_id} началась! Отправляем стартовую лидерборду в чаты: {pending_chat_ids}")
+    # Формируем текст один раз и рассылаем во все чаты
+    try:
+        leaderboard_text = with_race_title(
+            race, race.render_cache.get_start_leaderboard(race.data_store.get_snapshot())
+        )
+    except Exception as e:
+        logger.error(f"❌ Ошибка при формировании стартовой лидерборды: {e}", exc_info=True)
         return
-    
-    logger.info(f"🏁 Гонка началась! Отправляем стартовую лидерборду в чаты: {chat_ids}")
-    # Отправляем стартовую лидерборду во все чаты
-    for chat_id in chat_ids:
-        await send_start_leaderboard(chat_id)
+    await broadcast_engine.broadcast(
+        (_start_leaderboard_message(race, chat_id, leaderboard_text) for chat_id in pending_chat_ids),
+        label=f"Старт ({race.race_id})"
+    )
 
 
-async def check_and_send_lap_leaderboards():
-    """Проверяет и отправляет лидерборды для завершенных кругов (в конце круга)."""
-    if RACE_START_TIME is None:
-        return
-    
-    # Получаем список чатов для отправки
-    chat_ids = set()
-    if CHAT_ID:
-        chat_ids.add(CHAT_ID)
-    chat_ids.update(active_chats)
+async def broadcast_lap_leaderboard(race: Race, chat_ids: set[int], lap_number: int):
+    """
+    Формирует лидерборду круга один раз и рассылает её во все чаты.
     
-    if not chat_ids:
+    Args:
+        race: Гонка
+        chat_ids: ID чатов для отправки
+        lap_number: Номер круга
+    """
+    try:
+        leaderboard_text = with_race_title(
+            race, race.render_cache.get_lap_leaderboard(race.data_store.get_snapshot(), lap_number)
+        )
+    except Exception as e:
+        logger.error(f"❌ Ошибка при формировании лидерборды для круга {lap_number}: {e}", exc_info=True)
         return
     
-    # Храним предыдущий круг для отслеживания изменений
-    if not hasattr(check_and_send_lap_leaderboards, '_previous_lap'):
-        check_and_send_lap_leaderboards._previous_lap = None
-    
-    # Проверяем текущий круг
-    current_lap = get_current_lap()
-    
-    # Если круг изменился, значит предыдущий круг завершился
-    if check_and_send_lap_leaderboards._previous_lap is not None:
-        if current_lap != check_and_send_lap_leaderboards._previous_lap:
-            # Круг изменился - отправляем лидерборду для завершенного круга
-            completed_lap = check_and_send_lap_leaderboards._previous_lap
-            for chat_id in chat_ids:
-                await send_lap_leaderboard(chat_id, completed_lap)
-    
-    # Если гонка завершена (current_lap = None), но предыдущий круг был 12
-    if current_lap is None and check_and_send_lap_leaderboards._previous_lap == 12:
-        # Отправляем лидерборду для 12-го круга (финальная)
-        for chat_id in chat_ids:
-            await send_lap_leaderboard(chat_id, 12)
-    
-    # Сохраняем текущий круг для следующей проверки
-    check_and_send_lap_leaderboards._previous_lap = current_lap
+    pending_chat_ids = [
+        chat_id for chat_id in chat_ids
+        if not race.state_manager.get_state(chat_id).is_lap_published(lap_number)
+    ]
+    await broadcast_engine.broadcast(
+        (_lap_leaderboard_message(race, chat_id, lap_number, leaderboard_text) for chat_id in pending_chat_ids),
+        label=f"Круг {lap_number} (чаты, {race.race_id})"
+    )
 
 
-async def send_user_updates():
-    """Отправляет персональные обновления пользователям по каждому завершенному кругу (в конце круга)."""
-    if RACE_START_TIME is None:
-        return
-    
-    # Храним предыдущий круг для отслеживания изменений
-    if not hasattr(send_user_updates, '_previous_lap'):
-        send_user_updates._previous_lap = None
-    
-    # Проверяем текущий круг
-    current_lap = get_current_lap()
+async def broadcast_final_leaderboard(race: Race, chat_ids: set[int]):
+    """
+    Формирует финальную лидерборду один раз и рассылает её в чаты, где она ещё не опубликована.
     
-    # Если круг изменился, значит предыдущий круг завершился
-    completed_lap = None
-    if send_user_updates._previous_lap is not None:
-        if current_lap != send_user_updates._previous_lap:
-            # Круг изменился - отправляем обновление для завершенного круга
-            completed_lap = send_user_updates._previous_lap
-    
-    # Если гонка завершена (current_lap = None), но предыдущий круг был 12
-    if current_lap is None and send_user_updates._previous_lap == 12:
-        # Отправляем обновление для 12-го круга (финальная)
-        completed_lap = 12
+    Args:
+        race: Гонка
+        chat_ids: ID чатов для отправки
+    """
+    pending_chat_ids = [
+        chat_id for chat_id in chat_ids
+        if not race.state_manager.get_state(chat_id).final_leaderboard_published
+    ]
+    if not pending_chat_ids:
+        return
+    try:
+        leaderboard_text = with_race_title(
+            race, race.render_cache.get_final_leaderboard(race.data_store.get_snapshot())
+        )
+    except Exception as e:
+        logger.error(f"❌ Ошибка при формировании финальной лидерборды: {e}", exc_info=True)
+        return
+    await broadcast_engine.broadcast(
+        (_final_leaderboard_message(race, chat_id, leaderboard_text) for chat_id in pending_chat_ids),
+        label=f"Финал ({race.race_id})"
+    )
+
+
+def _user_update_message(
+    race: Race, user_id: int, user_state, lap_number: int, leaderboard_text: str
+) -> OutgoingMessage:
+    """Создаёт персональное обновление, обновляющее счётчик отправленных кругов после отправки."""
+    user_state_manager = race.user_state_manager
+
+    def on_sent():
+        user_state_manager.mark_lap_sent(user_id, lap_number)
+        logger.info(f"✅ Персональное обновление отправлено пользователю {user_id} для круга {lap_number}")
     
-    # Сохраняем текущий круг для следующей проверки
-    send_user_updates._previous_lap = current_lap
+    def is_stale() -> bool:
+        # Пользователь остановил отслеживание или уже получил более свежий круг
+        return not user_state.is_tracking or user_state.last_sent_lap >= lap_number
     
-    # Если нет завершенного круга, ничего не делаем
-    if completed_lap is None:
-        return
+    return OutgoingMessage(
+        chat_id=user_id,
+        text=leaderboard_text,
+        reply_markup=get_stop_tracking_keyboard(user_state.language),
+        on_sent=on_sent,
+        is_stale=is_stale,
+        race_id=race.race_id
+    )
+
+
+async def send_user_updates(race: Race, completed_lap: int):
+    """
+    Отправляет персональные обновления пользователям по завершенному кругу.
     
-    # Получаем всех пользователей с активным отслеживанием
-    tracking_users = []
-    for user_id, user_state in user_state_manager._states.items():
-        if user_state.is_tracking and user_state.entity_type and user_state.entity_value:
-            # Проверяем, нужно ли отправить обновление для завершенного круга
-            if user_state.last_sent_lap < completed_lap:
-                tracking_users.append((user_id, user_state))
+    Пользователи берутся из индекса ожидающих круг и сгруппированы по
+    сущности и языку: текст отрисовывается (или берётся из кэша) один раз
+    на группу. Если прогрев успел, здесь только отправка.
     
-    if not tracking_users:
+    Args:
+        race: Гонка
+        completed_lap: Номер завершенного круга
+    """
+    # Группы пользователей с активным отслеживанием, которым круг ещё не отправлен
+    groups = race.user_state_manager.get_pending_groups(completed_lap)
+
+    if not groups:
         return
     
     try:
-        # Загружаем данные гонки
-        api_client = RaceDataClient()
-        
-        # Получаем лидерборду завершенного круга
-        completed_leaderboard = api_client.get_participants_sorted_by_lap(completed_lap)
-        
-        # Получаем лидерборду предыдущего круга (если есть)
-        previous_leaderboard = None
-        if completed_lap > 1:
-            try:
-                previous_leaderboard = api_client.get_participants_sorted_by_lap(completed_lap - 1)
-            except Exception:
-                pass  # Если нет данных для предыдущего круга, игнорируем
-        
-        # Отправляем обновления каждому пользователю
-        for user_id, user_state in tracking_users:
+        if tracker_shard_pool is not None:
+            # Тексты, не сформированные прогревом, формируют процессы-шарды
+            await render_user_groups(race, completed_lap, groups)
+
+        # Берём данные гонки из хранилища гонки
+        snapshot = race.data_store.get_snapshot()
+
+        # Формируем персональные обновления и рассылаем их конкурентно
+        messages = []
+        for (entity_type, entity_value, language), user_states in groups.items():
             try:
-                # Формируем персональную лидерборду для завершенного круга
-                leaderboard_text = format_user_leaderboard(
-                    leaderboard=completed_leaderboard,
-                    lap_number=completed_lap,
-                    total_laps=TOTAL_LAPS,
-                    entity_type=user_state.entity_type,
-                    entity_value=user_state.entity_value,
-                    previous_lap_leaderboard=previous_leaderboard,
-                    language=user_state.language
-                )
-                
-                # Отправляем сообщение с повторными попытками при ошибке
-                max_retries = 3
-                for attempt in range(max_retries):
-                    try:
-                        await bot.send_message(
-                            chat_id=user_id,
-                            text=leaderboard_text,
-                            reply_markup=get_stop_tracking_keyboard(user_state.language)
-                        )
-                        # Обновляем счётчик отправленных кругов
-                        user_state.last_sent_lap = completed_lap
-                        logger.info(f"✅ Персональное обновление отправлено пользователю {user_id} для круга {completed_lap}")
-                        break
-                    except Exception as e:
-                        if attempt < max_retries - 1:
-                            logger.warning(f"⚠️ Ошибка при отправке пользователю {user_id} (попытка {attempt + 1}/{max_retries}): {e}")
-                            await asyncio.sleep(2)  # Пауза перед повторной попыткой
-                        else:
-                            logger.error(f"❌ Не удалось отправить обновление пользователю {user_id} после {max_retries} попыток: {e}", exc_info=True)
-                            
+                # Персональная лидерборда для завершенного круга (одна на группу)
+                leaderboard_text = with_race_title(race, race.render_cache.get_user_leaderboard(
+                    snapshot,
+                    completed_lap,
+                    entity_type,
+                    entity_value,
+                    language
+                ))
             except Exception as e:
-                logger.error(f"❌ Ошибка при формировании обновления для пользователя {user_id}: {e}", exc_info=True)
+                user_ids = [user_state.user_id for user_state in user_states]
+                logger.error(f"❌ Ошибка при формировании обновления для пользователей {user_ids}: {e}", exc_info=True)
+                continue
+            messages.extend(
+                _user_update_message(race, user_state.user_id, user_state, completed_lap, leaderboard_text)
+                for user_state in user_states
+            )
+
+        await broadcast_engine.broadcast(messages, label=f"Круг {completed_lap} (пользователи, {race.race_id})")
+
+        hits, misses, hit_ratio = race.render_cache.get_lap_hit_ratio(completed_lap)
+        logger.info(
+            f"🎯 Кэш персональных лидерборд круга {completed_lap} ({race.race_id}): попаданий {hits}, "
+            f"промахов {misses} ({hit_ratio:.0%}), текстов {len(groups)} на {len(messages)} пользователей"
+        )
                 
     except Exception as e:
         logger.error(f"❌ Ошибка при отправке пользовательских обновлений: {e}", exc_info=True)
 
 
+def log_lap_movers(race: Race, lap_number: Optional[int] = None):
+    """
+    Логирует участников с наибольшим ростом и падением позиции (из индекса снимка).
+
+    Args:
+        race: Гонка
+        lap_number: Номер круга; если не указан, берутся итоги всей гонки
+    """
+    try:
+        snapshot = race.data_store.get_snapshot()
+        standings = snapshot.standings
+        gainers, losers = standings.get_final_movers() if lap_number is None else standings.get_lap_movers(lap_number)
+    except Exception as e:
+        logger.error(f"Ошибка при расчёте изменений позиций: {e}", exc_info=True)
+        return
+
+    team_name = snapshot.columns.team_name
+    label = "за гонку" if lap_number is None else f"на круге {lap_number}"
+    if len(race_registry) > 1:
+        label += f" ({race.race_id})"
+    if gainers:
+        logger.info(f"📈 Больше всех поднялись {label}: " + ", ".join(f"{team_name(pid)} (+{delta})" for pid, delta in gainers))
+    if losers:
+        logger.info(f"📉 Больше всех опустились {label}: " + ", ".join(f"{team_name(pid)} ({delta})" for pid, delta in losers))
+
+
+async def render_user_groups(race: Race, lap_number: int, groups: dict):
+    """
+    Формирует персональные лидерборды групп, которых ещё нет в кэше отрисовки.
+
+    Крупные пакеты формируют процессы-шарды (TRACKER_SHARDS), остальные -
+    event loop с периодической уступкой управления.
+
+    Args:
+        race: Гонка
+        lap_number: Номер круга
+        groups: Группы (тип сущности, значение, язык) -> состояния пользователей
+    """
+    snapshot = race.data_store.get_snapshot()
+    render_cache = race.render_cache
+    missing = render_cache.get_missing_user_leaderboards(snapshot, lap_number, groups)
+
+    if tracker_shard_pool is not None and len(missing) >= TRACKER_SHARD_MIN_GROUPS:
+        try:
+            # Тексты нужны к границе круга: дольше половины круга ждать процессы нет смысла
+            texts = await tracker_shard_pool.render(
+                race.race_id, snapshot, lap_number, {key: groups[key] for key in missing},
+                timeout=race.clock.lap_duration / 2
+            )
+        except Exception as e:
+            logger.error(f"❌ Ошибка процессов-шардов, тексты будут сформированы в event loop: {e}", exc_info=True)
+        else:
+            for (entity_type, entity_value, language), text in texts.items():
+                render_cache.put_user_leaderboard(snapshot, lap_number, entity_type, entity_value, language, text)
+            return
+
+    for count, (entity_type, entity_value, language) in enumerate(missing, 1):
+        try:
+            render_cache.get_user_leaderboard(snapshot, lap_number, entity_type, entity_value, language)
+        except Exception as e:
+            logger.error(
+                f"❌ Ошибка при прогреве обновления для {entity_type} {entity_value}: {e}", exc_info=True
+            )
+        # Отдаём управление event loop, чтобы не блокировать обработку сообщений
+        if count % PREWARM_YIELD_EVERY == 0:
+            await asyncio.sleep(0)
+
+
+async def prewarm_lap(race: Race, lap_number: int, boundary_at: datetime):
+    """
+    Заранее формирует тексты для ближайшей границы: групповую лидерборду и
+    персональные лидерборды всех отслеживающих пользователей.
+    
+    Args:
+        race: Гонка
+        lap_number: Номер круга (0 - стартовая лидерборда)
+        boundary_at: Момент границы, к которой готовятся тексты
+    """
+    snapshot = race.data_store.get_snapshot()
+    render_cache = race.render_cache
+
+    if lap_number == 0:
+        render_cache.get_start_leaderboard(snapshot)
+    else:
+        render_cache.get_lap_leaderboard(snapshot, lap_number)
+        if lap_number == race.clock.total_laps:
+            render_cache.get_final_leaderboard(snapshot)
+        # Один текст на группу пользователей с одинаковой сущностью и языком
+        await render_user_groups(race, lap_number, race.user_state_manager.get_pending_groups(lap_number))
+    
+    lead = (boundary_at - datetime.now()).total_seconds()
+    race.prewarm_leads[lap_number] = lead
+    if lead >= 0:
+        logger.info(f"🔥 Прогрев круга {lap_number} ({race.race_id}) завершён за {lead:.2f} сек до границы")
+    else:
+        logger.warning(f"⚠️ Прогрев круга {lap_number} ({race.race_id}) опоздал на {-lead:.2f} сек")
+
+
+async def resume_delivery(race: Race):
+    """
+    Досылает завершённые круги, пропущенные из-за перезапуска (посреди гонки
+    или после её окончания).
+    
+    Планировщик пропускает уже прошедшие круги. Отметки об опубликованных
+    кругах и last_sent_lap восстановлены из хранилища, поэтому круги получат
+    только чаты и пользователи, которым они не были доставлены до перезапуска.
+    Круги досылаются по порядку, после последнего круга - финальная лидерборда.
+
+    Args:
+        race: Гонка
+    """
+    completed_lap = race.clock.get_last_completed_lap()
+    if race.state_store is None or completed_lap == 0:
+        return
+    chat_ids = get_target_chat_ids(race)
+    chat_states = [race.state_manager.get_state(chat_id) for chat_id in chat_ids]
+    missed_laps = [
+        lap_number for lap_number in range(1, completed_lap + 1)
+        if any(not state.is_lap_published(lap_number) for state in chat_states)
+        or race.user_state_manager.get_pending_groups(lap_number)
+    ]
+    missed_final = completed_lap == race.clock.total_laps and any(
+        not state.final_leaderboard_published for state in chat_states
+    )
+    if not missed_laps and not missed_final:
+        return
+    logger.info(
+        f"⏩ Досылаем круги {missed_laps}{' и финал' if missed_final else ''} ({race.race_id}) "
+        f"тем, кто не получил их до перезапуска"
+    )
+    for lap_number in missed_laps:
+        await asyncio.gather(
+            broadcast_lap_leaderboard(race, chat_ids, lap_number),
+            send_user_updates(race, lap_number)
+        )
+    if missed_final:
+        await broadcast_final_leaderboard(race, chat_ids)
+
+
+async def on_race_event(event: RaceEvent):
+    """Публикует лидерборды по событиям планировщика гонки."""
+    race = race_registry.get(event.race_id)
+    if event.kind == "prewarm":
+        await prewarm_lap(race, event.lap_number, event.boundary_at)
+    elif event.kind == "start":
+        await broadcast_start_leaderboard(race)
+        await resume_delivery(race)
+    elif event.kind == "lap":
+        # Лидерборда завершенного круга в группы и персональные обновления (user-mode).
+        # Последний круг в группы отправляет событие "final" (в тот же момент),
+        # чтобы финальная лидерборда шла в чатах после него
+        if event.lap_number < race.clock.total_laps:
+            await asyncio.gather(
+                broadcast_lap_leaderboard(race, get_target_chat_ids(race), event.lap_number),
+                send_user_updates(race, event.lap_number)
+            )
+        else:
+            await send_user_updates(race, event.lap_number)
+        log_lap_movers(race, event.lap_number)
+    elif event.kind == "final":
+        logger.info(f"🏆 Гонка {race.race_id} завершена")
+        chat_ids = get_target_chat_ids(race)
+        await broadcast_lap_leaderboard(race, chat_ids, event.lap_number)
+        await broadcast_final_leaderboard(race, chat_ids)
+        log_lap_movers(race)
+
+
 async def log_race_status():
-    """Периодически логирует статус гонки каждые 5 секунд и проверяет отправку лидерборд."""
+    """Периодически логирует статус гонки и метрики (публикация идёт по событиям планировщика)."""
     while True:
         try:
-            status = get_race_status()
-            logger.info(f"Статус гонки: {status}")
-            
-            # Проверяем и отправляем стартовую лидерборду при старте гонки
-            await check_and_send_start_leaderboard()
-            
-            # Проверяем и отправляем лидерборды для завершенных кругов (в конце круга)
-            await check_and_send_lap_leaderboards()
-            
-            # Отправляем персональные обновления пользователям (user-mode)
-            await send_user_updates()
+            for race in race_registry:
+                status = race.clock.get_race_status()
+                cache_stats = race.data_store.get_stats()
+                prefix = f"[{race.race_id}] " if len(race_registry) > 1 else ""
+                logger.info(
+                    f"{prefix}Статус гонки: {status} | Кэш данных: попаданий {cache_stats['hits']}, "
+                    f"промахов {cache_stats['misses']}, версия {cache_stats['version']}"
+                )
+                state_writer = race.state_writer
+                if state_writer is not None and state_writer.errors:
+                    writer_stats = state_writer.get_stats()
+                    logger.warning(
+                        f"⚠️ {prefix}Запись состояния: ошибок {writer_stats['errors']}, "
+                        f"ожидают записи {writer_stats['pending']}"
+                    )
+            retry_stats = broadcast_engine.retry_queue.get_stats()
+            if retry_stats["depth"] or retry_stats["dead_letters"]:
+                logger.info(
+                    f"Очередь повторов: глубина {retry_stats['depth']}, "
+                    f"доставлено повторно {retry_stats['recovered']}, "
+                    f"отброшено устаревших {retry_stats['dropped_stale']}, "
+                    f"dead-letter {retry_stats['dead_letters']}"
+                )
+            if tracker_shard_pool is not None and tracker_shard_pool.jobs:
+                shard_stats = tracker_shard_pool.get_stats()
+                logger.info(
+                    f"🧩 Процессы-шарды: {shard_stats['workers']}, заданий {shard_stats['jobs']}, "
+                    f"текстов {shard_stats['rendered']}, ошибок {shard_stats['errors']}, "
+                    f"перезапусков {shard_stats['restarts']}"
+                )
+            if dm_admission.admitted or dm_admission.shed:
+                admission_stats = dm_admission.get_stats()
+                logger.info(
+                    f"📨 Запросы пользователей: в очереди {admission_stats['depth']} "
+                    f"(максимум {admission_stats['max_depth']}), обрабатываются {admission_stats['active']}, "
+                    f"принято {admission_stats['admitted']}, повторов {admission_stats['duplicates']}, "
+                    f"заменено новыми {admission_stats['superseded']}, отклонено {admission_stats['shed']}"
+                )
+            if webhook_handler is not None and webhook_handler.accepted:
+                webhook_stats = webhook_handler.get_stats()
+                logger.info(
+                    f"📥 Webhook: принято {webhook_stats['accepted']}, отклонено (503) {webhook_stats['rejected']}, "
+                    f"в очереди {webhook_stats['depth']} (максимум {webhook_stats['max_depth']}), "
+                    f"обработка p50 {webhook_stats['p50'] * 1000:.0f} мс, p99 {webhook_stats['p99'] * 1000:.0f} мс"
+                )
+            for name, slo_stats in broadcast_engine.slo.get_stats().items():
+                log = logger.warning if slo_stats["violations"] else logger.info
+                log(
+                    f"⏱ Доставка ({name}): {slo_stats['delivered']}, в пределах SLO {slo_stats['slo']:g} с "
+                    f"{slo_stats['within_slo']:.1%}, p50 {slo_stats['p50']:.2f} с, p99 {slo_stats['p99']:.2f} с"
+                )
+            queue_depth = broadcast_engine.get_queue_depth()
+            if any(queue_depth.values()):
+                logger.info("⏳ Ждут отправки: " + ", ".join(f"{name} {depth}" for name, depth in queue_depth.items()))
+            if CHAT_ID:
+                logger.info(f"📋 Используется CHAT_ID из конфига: {CHAT_ID}")
+            active_chats = get_active_chats()
+            if active_chats:
+                logger.info(f"📋 Активные чаты (обнаружены автоматически): {active_chats}")
             
         except Exception as e:
             logger.error(f"Ошибка при получении статуса гонки: {e}", exc_info=True)
         
-        await asyncio.sleep(5)
+        await asyncio.sleep(STATUS_LOG_INTERVAL)
 
 
-async def main():
-    """Главная функция запуска бота."""
-    logger.info("Запуск бота...")
-    
-    if RACE_START_TIME is None:
-        logger.warning("RACE_START_TIME не задан в .env. Бот будет работать, но гонка не настроена.")
-    else:
-        logger.info(f"Время старта гонки: {RACE_START_TIME}")
-    
-    # Проверяем загрузку данных гонки
+async def restore_state(race: Race):
+    """Восстанавливает состояние чатов и пользователей гонки из постоянного хранилища."""
+    state_store = race.state_store
+    if state_store is None:
+        logger.info("💾 STATE_DB_PATH не задан: состояние хранится только в памяти")
+        return
     try:
-        api_client = RaceDataClient()
-        data = api_client.load_data()
-        logger.info(f"Данные гонки загружены: {len(data)} участников")
-        
+        chat_rows = await asyncio.to_thread(state_store.load_chats)
+        user_rows = await asyncio.to_thread(state_store.load_users)
+    except Exception as e:
+        logger.error(f"❌ Ошибка при чтении состояния из {race.state_db_path}: {e}", exc_info=True)
+        return
+    restored_chats = race.state_manager.restore(chat_rows)
+    restored_users = race.user_state_manager.restore(user_rows)
+    tracking_count = sum(1 for row in user_rows if row[5])
+    logger.info(
+        f"💾 Состояние восстановлено из {race.state_db_path}: чатов {restored_chats} "
+        f"(активных {len(race.active_chats)}), пользователей {restored_users} (отслеживают {tracking_count})"
+    )
+
+
+async def load_race_data(race: Race):
+    """Загружает данные гонки при запуске (ошибка не останавливает бота)."""
+    try:
+        if race.source is not None:
+            logger.info(f"Источник данных гонки {race.race_id}: {race.source.url}")
+            await race.data_store.refresh_from_source()
+        else:
+            # Загрузка вне event loop
+            await race.data_store.refresh(force=True)
+        snapshot = race.data_store.get_snapshot()
+        logger.info(f"Данные гонки {race.race_id} загружены: {len(snapshot)} участников")
+
         # Проверяем сортировку по start_position
-        sorted_by_start = api_client.get_participants_sorted_by_start_position()
-        if sorted_by_start:
-            logger.info(f"Первый участник по стартовой позиции: {sorted_by_start[0]['team_name']} (позиция {sorted_by_start[0]['start_position']})")
+        start_order = snapshot.standings.get_start_order()
+        if start_order:
+            first_id = start_order[0]
+            logger.info(f"Первый участник по стартовой позиции: {snapshot.columns.team_name(first_id)} (позиция {snapshot.columns.start_positions[first_id]})")
     except Exception as e:
-        logger.error(f"Ошибка при загрузке данных гонки: {e}", exc_info=True)
+        logger.error(f"Ошибка при загрузке данных гонки {race.race_id}: {e}", exc_info=True)
         logger.warning("Бот продолжит работу, но данные гонки недоступны")
-    
+
+
+async def run_webhook():
+    """Принимает обновления через webhook до остановки бота."""
+    global webhook_handler
+    runner, webhook_handler = await start_webhook_server(
+        dp,
+        bot,
+        WEBHOOK_PATH,
+        WEBHOOK_HOST,
+        WEBHOOK_PORT,
+        secret_token=WEBHOOK_SECRET,
+        max_concurrency=WEBHOOK_MAX_CONCURRENCY,
+        max_pending=WEBHOOK_MAX_PENDING
+    )
+    try:
+        await bot.set_webhook(
+            f"{WEBHOOK_URL}{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET,
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+            allowed_updates=dp.resolve_used_update_types()
+        )
+        logger.info(
+            f"🌐 Webhook {WEBHOOK_URL}{WEBHOOK_PATH} зарегистрирован, сервер слушает {WEBHOOK_HOST}:{WEBHOOK_PORT}. "
+            f"Ожидание обновлений..."
+        )
+        await asyncio.Event().wait()
+    finally:
+        # Дожидаемся обработки уже принятых обновлений
+        await runner.cleanup()
+
+
+async def main():
+    """Главная функция запуска бота."""
+    logger.info("Запуск бота...")
+
+    for race in race_registry:
+        if race.clock.start_time is None:
+            logger.warning(
+                f"Время старта гонки {race.race_id} не задано (RACE_START_TIME в .env или start_time в RACES_FILE). "
+                f"Бот будет работать, но гонка не настроена."
+            )
+        else:
+            logger.info(
+                f"Гонка {race.race_id}: старт {race.clock.start_time}, "
+                f"кругов {race.clock.total_laps} по {race.clock.lap_duration:g} сек"
+            )
+
+    # Проверяем загрузку данных гонок
+    await asyncio.gather(*(load_race_data(race) for race in race_registry))
+
+    # Восстанавливаем состояние до приёма обновлений и запуска планировщика
+    for race in race_registry:
+        await restore_state(race)
+        if race.state_writer is not None:
+            race.state_writer.start()
+
     try:
         # Получаем информацию о боте
         bot_info = await bot.get_me()
@@ -486,7 +954,8 @@ async def main():
         
         # Показываем информацию о чатах
         if CHAT_ID:
-            active_chats.add(CHAT_ID)
+            for race in race_registry:
+                race.state_manager.activate_chat(CHAT_ID)
             logger.info(f"📋 CHAT_ID указан в конфиге: {CHAT_ID} (добавлен в активные чаты)")
         else:
             logger.info("📋 CHAT_ID не указан. Бот будет регистрировать чаты автоматически при получении обновлений.")
@@ -495,24 +964,70 @@ async def main():
             logger.info("💡 Подсказка: отправьте любое сообщение в чат, где находится бот, чтобы он его зарегистрировал")
             logger.info("💡 Или укажите CHAT_ID в .env файле для автоматической отправки")
         
-        # Запускаем задачу логирования статуса гонки
-        log_task = asyncio.create_task(log_race_status())
+        # Запускаем фоновую очередь повторов рассылки
+        broadcast_engine.start()
+
+        # Запускаем процессы-шарды персональных лидерборд
+        if tracker_shard_pool is not None:
+            tracker_shard_pool.start()
+
+        # Запускаем общий планировщик событий всех гонок
+        for race in race_registry:
+            lap_scheduler.add_race(race.race_id, race.clock)
+            broadcast_engine.set_lap_slo(race.race_id, race.clock.lap_duration)
+        lap_scheduler.subscribe(on_race_event)
+        lap_scheduler.start()
         
-        # Запускаем polling
-        logger.info("🔄 Запуск polling... Ожидание обновлений...")
-        await dp.start_polling(bot)
+        # Запускаем задачу логирования статуса гонки
+        background_tasks = [asyncio.create_task(log_race_status())]
+
+        # Для закончившихся гонок события старта не будет: досылаем пропущенные круги сразу
+        for race in race_registry:
+            end_time = race.clock.get_race_end_time()
+            if end_time is not None and end_time <= datetime.now():
+                background_tasks.append(asyncio.create_task(resume_delivery(race)))
+
+        # Запускаем фоновый опрос HTTP-источника данных или слежение за файлом каждой гонки
+        for race in race_registry:
+            if race.source is not None:
+                background_tasks.append(
+                    asyncio.create_task(race.data_store.run_source_polling(RACE_DATA_POLL_INTERVAL))
+                )
+            else:
+                background_tasks.append(
+                    asyncio.create_task(race.data_store.run_file_watcher(RACE_DATA_WATCH_INTERVAL))
+                )
+
+        if WEBHOOK_URL:
+            # Обновления приходят на webhook и обрабатываются конкурентно
+            await run_webhook()
+        else:
+            # Снимаем webhook, если он был зарегистрирован раньше: с ним getUpdates не работает
+            await bot.delete_webhook()
+            # Запускаем polling
+            logger.info("🔄 Запуск polling... Ожидание обновлений...")
+            await dp.start_polling(bot)
         
-        # Отменяем задачу логирования при остановке
-        log_task.cancel()
-        try:
-            await log_task
-        except asyncio.CancelledError:
-            pass
+        # Отменяем фоновые задачи при остановке
+        for task in background_tasks:
+            task.cancel()
+        await asyncio.gather(*background_tasks, return_exceptions=True)
             
     except Exception as e:
         logger.error(f"Ошибка при запуске бота: {e}", exc_info=True)
         sys.exit(1)
     finally:
+        await lap_scheduler.stop()
+        await broadcast_engine.stop()
+        if tracker_shard_pool is not None:
+            await tracker_shard_pool.stop()
+        for race in race_registry:
+            if race.state_writer is not None:
+                # Сохраняем изменения, накопленные с последней записи
+                await race.state_writer.stop()
+                race.state_store.close()
+            if race.source is not None:
+                await race.source.close()
         await bot.session.close()
         logger.info("Бот остановлен")
 
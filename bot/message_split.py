@@ -0,0 +1,115 @@
+"""Разбиение длинных текстов на сообщения в пределах лимита Telegram."""
+import re
+from functools import lru_cache
+from typing import Iterator, List, Tuple
+
+from bot.settings import TELEGRAM_MESSAGE_LIMIT
+
+# Сколько различных текстов хранить разбитыми: один текст рассылается во все
+# чаты, поэтому разбиение выполняется один раз на текст, а не на получателя
+SPLIT_CACHE_SIZE = 1024
+
+# Неделимые части строки при резке: тег, HTML-сущность или один символ
+_HTML_TOKEN = re.compile(r"<[^<>]*>|&#?\w+;|.", re.DOTALL)
+_TAG = re.compile(r"<(/?)\s*([A-Za-z][\w-]*)[^<>]*>")
+
+
+def _text_length(text: str) -> int:
+    """Длина текста так, как её считает Telegram (в кодовых единицах UTF-16)."""
+    if text.isascii():
+        return len(text)
+    return len(text.encode("utf-16-le")) // 2
+
+
+def _split_long_line(line: str, limit: int) -> Iterator[str]:
+    """
+    Режет строку длиннее лимита на куски по границам HTML-разметки.
+
+    Теги и сущности (&amp; и т. п.) не разрезаются. Теги, открытые к концу
+    куска, закрываются в нём и открываются заново в начале следующего,
+    поэтому каждый кусок - корректный HTML для parse_mode.
+    """
+    if _text_length(line) <= limit:
+        yield line
+        return
+    # Открытые теги: (имя, открывающий тег)
+    open_tags: List[Tuple[str, str]] = []
+    piece: List[str] = []
+    size = 0
+    has_text = False
+    for token in _HTML_TOKEN.findall(line):
+        tags_after = open_tags
+        tag = _TAG.fullmatch(token)
+        if tag is not None:
+            closing, name = tag.groups()
+            name = name.lower()
+            if not closing:
+                tags_after = open_tags + [(name, token)]
+            else:
+                # Закрывается последний открытый тег с этим именем
+                for index in range(len(open_tags) - 1, -1, -1):
+                    if open_tags[index][0] == name:
+                        tags_after = open_tags[:index] + open_tags[index + 1:]
+                        break
+        token_size = _text_length(token)
+        if has_text and size + token_size + _closing_length(tags_after) > limit:
+            yield "".join(piece) + _closing_tags(open_tags)
+            piece = [open_tag for _, open_tag in open_tags]
+            size = sum(_text_length(open_tag) for open_tag in piece)
+            has_text = False
+        piece.append(token)
+        size += token_size
+        has_text = has_text or tag is None
+        open_tags = tags_after
+    if has_text:
+        yield "".join(piece) + _closing_tags(open_tags)
+
+
+def _closing_tags(open_tags: List[Tuple[str, str]]) -> str:
+    """Закрывающие теги для открытых тегов (в обратном порядке)."""
+    return "".join(f"</{name}>" for name, _ in reversed(open_tags))
+
+
+def _closing_length(open_tags: List[Tuple[str, str]]) -> int:
+    """Длина закрывающих тегов для открытых тегов."""
+    return sum(len(name) + 3 for name, _ in open_tags)
+
+
+@lru_cache(maxsize=SPLIT_CACHE_SIZE)
+def split_message(text: str, limit: int = TELEGRAM_MESSAGE_LIMIT) -> Tuple[str, ...]:
+    """
+    Делит текст на минимальное число частей не длиннее limit по границам строк.
+
+    Строки набираются в часть жадно, пока она помещается в лимит: при
+    сохранении порядка строк это даёт минимальное число сообщений. Строка
+    длиннее лимита (на практике не встречается) режется вне HTML-тегов
+    и сущностей, с закрытием и повторным открытием тегов на границе кусков.
+    Части только из пробельных символов отбрасываются - Telegram их не принимает.
+
+    Args:
+        text: Текст сообщения (HTML-теги не переносятся между строками)
+        limit: Максимальная длина части
+
+    Returns:
+        Части текста по порядку (сам текст, если он помещается целиком)
+    """
+    if _text_length(text) <= limit:
+        return (text,)
+
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for line in text.split("\n"):
+        for piece in _split_long_line(line, limit):
+            piece_size = _text_length(piece)
+            if current and size + 1 + piece_size > limit:
+                chunks.append("\n".join(current))
+                current, size = [piece], piece_size
+            elif current:
+                current.append(piece)
+                size += 1 + piece_size
+            else:
+                current, size = [piece], piece_size
+    if current:
+        chunks.append("\n".join(current))
+    return tuple(chunk for chunk in chunks if chunk.strip())
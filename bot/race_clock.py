@@ -1,82 +1,180 @@
 """Модуль для работы с временем гонки и расчета текущего круга."""
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Optional
 
 from bot.settings import RACE_START_TIME, LAP_DURATION, TOTAL_LAPS
 
 
-def get_current_lap(now: Optional[datetime] = None) -> Optional[int]:
-    """
-    Вычисляет текущий круг гонки на основе времени.
+class RaceClock:
+    """Расписание одной гонки: время старта, длительность и количество кругов."""
     
-    Args:
-        now: Текущее время (по умолчанию используется datetime.now())
+    def __init__(
+        self,
+        start_time: Optional[datetime],
+        lap_duration: float = LAP_DURATION,
+        total_laps: int = TOTAL_LAPS,
+    ):
+        """
+        Инициализация расписания.
+        
+        Args:
+            start_time: Время старта гонки (None - гонка не настроена)
+            lap_duration: Длительность одного круга в секундах
+            total_laps: Общее количество кругов
+        """
+        self.start_time = start_time
+        self.lap_duration = lap_duration
+        self.total_laps = total_laps
     
-    Returns:
-        Номер текущего круга (1-12) или None, если гонка ещё не началась или уже закончилась
-    """
-    if RACE_START_TIME is None:
-        return None
+    def get_current_lap(self, now: Optional[datetime] = None) -> Optional[int]:
+        """
+        Вычисляет текущий круг гонки на основе времени.
+        
+        Args:
+            now: Текущее время (по умолчанию используется datetime.now())
+        
+        Returns:
+            Номер текущего круга (1-total_laps) или None, если гонка ещё не началась или уже закончилась
+        """
+        if self.start_time is None:
+            return None
+        
+        if now is None:
+            now = datetime.now()
+        
+        # Если гонка ещё не началась
+        if now < self.start_time:
+            return None
+        
+        # Вычисляем время, прошедшее с начала гонки
+        elapsed_seconds = (now - self.start_time).total_seconds()
+        
+        # Вычисляем текущий круг (круг начинается с 1)
+        current_lap = int(elapsed_seconds / self.lap_duration) + 1
+        
+        # Если гонка уже закончилась
+        if current_lap > self.total_laps:
+            return None
+        
+        return current_lap
     
-    if now is None:
-        now = datetime.now()
+    def get_lap_end_time(self, lap_number: int) -> Optional[datetime]:
+        """
+        Вычисляет момент окончания круга.
+        
+        Args:
+            lap_number: Номер круга
+        
+        Returns:
+            Время окончания круга или None, если гонка не настроена
+        """
+        if self.start_time is None:
+            return None
+        
+        return self.start_time + timedelta(seconds=lap_number * self.lap_duration)
     
-    # Если гонка ещё не началась
-    if now < RACE_START_TIME:
-        return None
+    def get_last_completed_lap(self, now: Optional[datetime] = None) -> int:
+        """
+        Возвращает номер последнего завершённого круга.
+        
+        Args:
+            now: Текущее время (по умолчанию используется datetime.now())
+        
+        Returns:
+            0, если гонка не настроена или ни один круг не завершён; total_laps после окончания гонки
+        """
+        if self.start_time is None:
+            return 0
+        
+        if now is None:
+            now = datetime.now()
+        
+        elapsed_seconds = (now - self.start_time).total_seconds()
+        return max(0, min(self.total_laps, int(elapsed_seconds / self.lap_duration)))
     
-    # Вычисляем время, прошедшее с начала гонки
-    elapsed_seconds = (now - RACE_START_TIME).total_seconds()
+    @property
+    def generation(self) -> str:
+        """Поколение гонки для постоянного хранилища: время старта (пустая строка - не задано)."""
+        return self.start_time.strftime("%Y-%m-%d %H:%M:%S") if self.start_time is not None else ""
     
-    # Вычисляем текущий круг (круг начинается с 1)
-    current_lap = int(elapsed_seconds / LAP_DURATION) + 1
+    def get_race_end_time(self) -> Optional[datetime]:
+        """
+        Вычисляет момент окончания гонки (конец последнего круга).
+        
+        Returns:
+            Время окончания гонки или None, если гонка не настроена
+        """
+        return self.get_lap_end_time(self.total_laps)
     
-    # Если гонка уже закончилась
-    if current_lap > TOTAL_LAPS:
-        return None
+    def is_race_active(self, now: Optional[datetime] = None) -> bool:
+        """
+        Проверяет, активна ли гонка в данный момент.
+        
+        Args:
+            now: Текущее время (по умолчанию используется datetime.now())
+        
+        Returns:
+            True, если гонка активна, False в противном случае
+        """
+        return self.get_current_lap(now) is not None
     
-    return current_lap
+    def get_race_status(self, now: Optional[datetime] = None) -> str:
+        """
+        Возвращает текстовый статус гонки.
+        
+        Args:
+            now: Текущее время (по умолчанию используется datetime.now())
+        
+        Returns:
+            Строка со статусом гонки
+        """
+        if self.start_time is None:
+            return "Гонка не настроена (RACE_START_TIME не задан)"
+        
+        if now is None:
+            now = datetime.now()
+        
+        current_lap = self.get_current_lap(now)
+        
+        if current_lap is None:
+            if now < self.start_time:
+                time_until_start = (self.start_time - now).total_seconds()
+                return f"Гонка ещё не началась. До старта: {int(time_until_start)} сек"
+            else:
+                return "Гонка завершена"
+        else:
+            elapsed_seconds = (now - self.start_time).total_seconds()
+            seconds_in_lap = elapsed_seconds % self.lap_duration
+            return (
+                f"Круг {current_lap}/{self.total_laps} | "
+                f"Время в круге: {int(seconds_in_lap)}/{self.lap_duration:g} сек"
+            )
+
+
+# Расписание гонки из настроек (.env / settings.py)
+default_clock = RaceClock(RACE_START_TIME, LAP_DURATION, TOTAL_LAPS)
+
+
+def get_current_lap(now: Optional[datetime] = None) -> Optional[int]:
+    """Текущий круг гонки из настроек (см. RaceClock.get_current_lap)."""
+    return default_clock.get_current_lap(now)
+
+
+def get_lap_end_time(lap_number: int) -> Optional[datetime]:
+    """Момент окончания круга гонки из настроек (см. RaceClock.get_lap_end_time)."""
+    return default_clock.get_lap_end_time(lap_number)
+
+
+def get_race_end_time() -> Optional[datetime]:
+    """Момент окончания гонки из настроек (см. RaceClock.get_race_end_time)."""
+    return default_clock.get_race_end_time()
 
 
 def is_race_active(now: Optional[datetime] = None) -> bool:
-    """
-    Проверяет, активна ли гонка в данный момент.
-    
-    Args:
-        now: Текущее время (по умолчанию используется datetime.now())
-    
-    Returns:
-        True, если гонка активна, False в противном случае
-    """
-    return get_current_lap(now) is not None
+    """Активна ли гонка из настроек (см. RaceClock.is_race_active)."""
+    return default_clock.is_race_active(now)
 
 
 def get_race_status(now: Optional[datetime] = None) -> str:
-    """
-    Возвращает текстовый статус гонки.
-    
-    Args:
-        now: Текущее время (по умолчанию используется datetime.now())
-    
-    Returns:
-        Строка со статусом гонки
-    """
-    if RACE_START_TIME is None:
-        return "Гонка не настроена (RACE_START_TIME не задан)"
-    
-    if now is None:
-        now = datetime.now()
-    
-    current_lap = get_current_lap(now)
-    
-    if current_lap is None:
-        if now < RACE_START_TIME:
-            time_until_start = (RACE_START_TIME - now).total_seconds()
-            return f"Гонка ещё не началась. До старта: {int(time_until_start)} сек"
-        else:
-            return "Гонка завершена"
-    else:
-        elapsed_seconds = (now - RACE_START_TIME).total_seconds()
-        seconds_in_lap = elapsed_seconds % LAP_DURATION
-        return f"Круг {current_lap}/{TOTAL_LAPS} | Время в круге: {int(seconds_in_lap)}/{LAP_DURATION} сек"
-
+    """Текстовый статус гонки из настроек (см. RaceClock.get_race_status)."""
+    return default_clock.get_race_status(now)
@@ -0,0 +1,380 @@
+"""Общее хранилище данных гонки для всех обработчиков и публикаторов."""
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Hashable, Optional, Tuple
+
+from bot.api_client import RaceDataClient
+from bot.columnar import ParticipantColumns
+from bot.http_source import HttpRaceDataSource
+from bot.logger import setup_logger
+from bot.settings import TOTAL_LAPS, RACE_DATA_SNAPSHOT
+from bot.snapshot_diff import SnapshotDiff, compute_snapshot_diff
+from bot.snapshot_file import compile_snapshot, read_snapshot
+from bot.standings import StandingsIndex
+
+logger = setup_logger()
+
+# Размер файла, начиная с которого JSON разбирается в отдельном процессе
+PROCESS_LOAD_MIN_BYTES = 20 * 1024 * 1024
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    """Возвращает пул из одного процесса для разбора больших файлов."""
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=1)
+    return _process_pool
+
+
+def _load_columns(json_file_path: str, total_laps: int = TOTAL_LAPS) -> ParticipantColumns:
+    """Потоково читает и валидирует файл с данными (выполняется в отдельном процессе)."""
+    return RaceDataClient(json_file_path, total_laps).load_columns()
+
+
+class RaceSnapshot:
+    """
+    Снимок загруженных данных гонки, общий для всех потребителей.
+
+    Участники хранятся в колоночном виде (ParticipantColumns); лидерборды
+    формируются прямо из колонок, словари участников создаются только для
+    отдельных записей (standings.get_records, standings.find_participant).
+    """
+
+    def __init__(
+        self,
+        columns: ParticipantColumns,
+        version: int,
+        etag: Hashable,
+        standings: Optional[StandingsIndex] = None,
+    ):
+        """
+        Инициализация снимка.
+
+        Args:
+            columns: Колоночное хранилище участников
+            version: Порядковый номер снимка (растёт при каждой перезагрузке)
+            etag: Ключ ревалидации: (st_mtime_ns, st_size, st_ino) для файла,
+                  ETag/Last-Modified для HTTP-источника
+            standings: Готовый индекс по этим колонкам (например, из бинарного снимка)
+        """
+        self.columns = columns
+        self.version = version
+        self.etag = etag
+        self.loaded_at = time.time()
+        self.standings = standings if standings is not None else StandingsIndex(columns)
+        # Изменения относительно предыдущей версии (None - неизвестны, всё считается изменённым)
+        self.diff: Optional[SnapshotDiff] = None
+
+    @classmethod
+    def from_records(
+        cls,
+        participants: List[Dict[str, Any]],
+        version: int,
+        etag: Hashable,
+        total_laps: int = TOTAL_LAPS,
+    ) -> "RaceSnapshot":
+        """
+        Строит снимок из списка словарей в формате race_2_results.json.
+
+        Args:
+            participants: Список словарей с данными участников
+            version: Порядковый номер снимка
+            etag: Ключ ревалидации данных
+            total_laps: Общее количество кругов
+        """
+        return cls(ParticipantColumns.from_records(participants, total_laps), version, etag)
+
+    def __len__(self) -> int:
+        """Количество участников."""
+        return len(self.columns)
+
+
+class RaceDataStore:
+    """
+    Процессное хранилище данных гонки.
+
+    Загружает файл один раз и раздаёт всем вызывающим один и тот же снимок.
+    Актуальность проверяется дешёвым os.stat (не чаще revalidate_interval секунд),
+    файл перечитывается только при изменении mtime/размера/inode.
+
+    С HTTP-источником снимок обновляется фоновым опросом (run_source_polling),
+    а get_snapshot() никогда не ждёт сеть и отдаёт последний полученный снимок.
+    """
+
+    def __init__(
+        self,
+        client: Optional[RaceDataClient] = None,
+        revalidate_interval: float = 1.0,
+        source: Optional[HttpRaceDataSource] = None,
+        total_laps: int = TOTAL_LAPS,
+    ):
+        """
+        Инициализация хранилища.
+
+        Args:
+            client: Клиент для чтения файла (по умолчанию RaceDataClient() с total_laps)
+            revalidate_interval: Минимальный интервал между проверками файла в секундах
+            source: HTTP-источник данных; если указан, файл не используется
+            total_laps: Общее количество кругов гонки
+        """
+        self._client = client or RaceDataClient(total_laps=total_laps)
+        self._source = source
+        self.total_laps = total_laps
+        self._revalidate_interval = revalidate_interval
+        self._snapshot: Optional[RaceSnapshot] = None
+        self._last_check = 0.0
+        self._version = 0
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._refresh_lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def json_file_path(self):
+        """Путь к файлу с данными гонки."""
+        return self._client.json_file_path
+
+    def _stat_etag(self) -> Tuple[int, int, int]:
+        """Возвращает ключ ревалидации файла по os.stat."""
+        try:
+            st = os.stat(self._client.json_file_path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Файл с данными не найден: {self._client.json_file_path}")
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def get_snapshot(self, reload: bool = False) -> RaceSnapshot:
+        """
+        Возвращает актуальный снимок данных, перечитывая файл только при изменении.
+
+        Внутри работающего event loop файл перечитывается в фоне (refresh()),
+        а до завершения перезагрузки отдаётся прежний снимок. Синхронная загрузка
+        выполняется только если снимка ещё нет или event loop не запущен.
+
+        Args:
+            reload: Если True, принудительно перечитывает файл
+
+        Returns:
+            Снимок данных гонки
+        """
+        if self._source is not None:
+            # Данные обновляются фоновым опросом, здесь только текущий снимок
+            if self._snapshot is None:
+                raise RuntimeError(f"Данные гонки ещё не получены из {self._source.url}")
+            self.hits += 1
+            return self._snapshot
+
+        now = time.monotonic()
+        snapshot = self._snapshot
+        if (
+            snapshot is not None
+            and not reload
+            and now - self._last_check < self._revalidate_interval
+        ):
+            self.hits += 1
+            return snapshot
+
+        etag = self._stat_etag()
+        self._last_check = now
+        if snapshot is not None and not reload and snapshot.etag == etag:
+            self.hits += 1
+            return snapshot
+
+        if snapshot is not None and self._schedule_refresh(force=reload):
+            # Перезагрузка идёт в фоне, пока отдаём прежний снимок
+            self.hits += 1
+            return snapshot
+
+        self.misses += 1
+        standings = self._load_standings()
+        self._version += 1
+        return self._swap(RaceSnapshot(standings.columns, self._version, etag, standings))
+
+    def _schedule_refresh(self, force: bool = False) -> bool:
+        """
+        Запускает фоновую перезагрузку, если есть работающий event loop.
+
+        Returns:
+            True, если перезагрузка запущена или уже выполняется
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = loop.create_task(self.refresh(force=force))
+        return True
+
+    def _load_standings(self) -> StandingsIndex:
+        """
+        Загружает участников и индекс из файла (синхронно, вызывается в потоке).
+
+        Если включён RACE_DATA_SNAPSHOT, данные берутся из бинарного снимка
+        рядом с JSON (снимок пересобирается при изменении содержимого файла).
+        """
+        path = str(self._client.json_file_path)
+        if RACE_DATA_SNAPSHOT:
+            snapshot_path = compile_snapshot(path, self.total_laps)
+            standings = read_snapshot(snapshot_path) if snapshot_path is not None else None
+            if standings is not None:
+                return standings
+        return StandingsIndex(self._client.load_columns(self.total_laps))
+
+    def install(self, participants: List[Dict[str, Any]], etag: Hashable) -> RaceSnapshot:
+        """
+        Строит снимок из уже загруженных данных и делает его текущим.
+
+        Args:
+            participants: Список словарей с данными участников
+            etag: Ключ ревалидации данных
+
+        Returns:
+            Новый снимок данных гонки
+        """
+        self._version += 1
+        return self._swap(RaceSnapshot.from_records(participants, self._version, etag, self.total_laps))
+
+    def _swap(self, snapshot: RaceSnapshot) -> RaceSnapshot:
+        """Делает готовый снимок текущим (одно присваивание в потоке event loop)."""
+        self._version = snapshot.version
+        self._snapshot = snapshot
+        logger.info(f"Снимок данных гонки обновлён: версия {snapshot.version}, {len(snapshot)} участников")
+        diff = snapshot.diff
+        if diff is not None:
+            if diff.full:
+                logger.info("🔄 Изменился состав участников, все лидерборды будут сформированы заново")
+            elif diff.is_empty:
+                logger.info("🔄 Содержимое данных не изменилось")
+            else:
+                laps = diff.affected_laps(snapshot.standings.total_laps)
+                logger.info(
+                    f"🔄 Изменились позиции {len(diff.changed_participants)} участников, "
+                    f"затронуты круги: {', '.join(map(str, laps)) or 'нет'}"
+                )
+        return snapshot
+
+    async def _attach_diff(self, snapshot: RaceSnapshot) -> RaceSnapshot:
+        """Считает изменения относительно текущего снимка вне event loop."""
+        previous = self._snapshot
+        if previous is not None:
+            snapshot.diff = await asyncio.to_thread(
+                compute_snapshot_diff, previous.standings, snapshot.standings, previous.version
+            )
+        return snapshot
+
+    async def refresh(self, force: bool = False) -> bool:
+        """
+        Перечитывает файл вне event loop, если он изменился.
+
+        Потоковое чтение JSON в колонки, валидация и построение индексов
+        выполняются в потоке; для файлов от PROCESS_LOAD_MIN_BYTES разбор
+        выполняется в отдельном процессе, чтобы не конкурировать с event loop за GIL.
+        Если содержимое файла не изменилось с прошлой сборки бинарного снимка,
+        колонки и индексы отображаются из него через mmap без разбора JSON.
+        В event loop только подменяется готовый снимок.
+
+        Args:
+            force: Если True, перечитывает файл даже без изменений
+
+        Returns:
+            True, если снимок обновлён
+        """
+        async with self._refresh_lock:
+            etag = await asyncio.to_thread(self._stat_etag)
+            self._last_check = time.monotonic()
+            if not force and self._snapshot is not None and self._snapshot.etag == etag:
+                return False
+
+            self.misses += 1
+            path = str(self._client.json_file_path)
+            loop = asyncio.get_running_loop()
+            if etag[1] >= PROCESS_LOAD_MIN_BYTES:
+                standings = None
+                if RACE_DATA_SNAPSHOT:
+                    # Процесс только пишет снимок на диск, здесь он отображается через mmap
+                    snapshot_path = await loop.run_in_executor(_get_process_pool(), compile_snapshot, path, self.total_laps)
+                    if snapshot_path is not None:
+                        standings = await asyncio.to_thread(read_snapshot, snapshot_path)
+                if standings is None:
+                    columns = await loop.run_in_executor(_get_process_pool(), _load_columns, path, self.total_laps)
+                    standings = await asyncio.to_thread(StandingsIndex, columns)
+            else:
+                standings = await asyncio.to_thread(self._load_standings)
+            snapshot = RaceSnapshot(standings.columns, self._version + 1, etag, standings)
+            self._swap(await self._attach_diff(snapshot))
+            return True
+
+    async def refresh_from_source(self) -> bool:
+        """
+        Выполняет условный запрос к HTTP-источнику и обновляет снимок при изменении.
+
+        Returns:
+            True, если снимок обновлён
+        """
+        if self._source is None or not await self._source.fetch():
+            return False
+        self.misses += 1
+        # Индексы строятся в потоке, event loop только подменяет снимок
+        snapshot = await asyncio.to_thread(
+            RaceSnapshot.from_records,
+            self._source.get_cached(),
+            self._version + 1,
+            self._source.version_tag,
+            self.total_laps
+        )
+        self._swap(await self._attach_diff(snapshot))
+        return True
+
+    async def run_file_watcher(self, interval: float) -> None:
+        """
+        Следит за файлом с результатами и подменяет снимок при изменении (фоновая задача).
+
+        Изменения определяются опросом os.stat (mtime/размер/inode); при
+        изменении файл перечитывается в фоне через refresh(). Если файл
+        записан не до конца и не разбирается, остаётся прежний снимок,
+        а загрузка повторяется на следующей проверке.
+
+        Args:
+            interval: Интервал проверки в секундах
+        """
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Ошибка при перезагрузке данных гонки: {e}", exc_info=True)
+            await asyncio.sleep(interval)
+
+    async def run_source_polling(self, interval: float) -> None:
+        """
+        Периодически опрашивает HTTP-источник (фоновая задача).
+
+        Args:
+            interval: Интервал опроса в секундах
+        """
+        while True:
+            try:
+                await self.refresh_from_source()
+            except Exception as e:
+                logger.error(f"Ошибка при обновлении данных гонки: {e}", exc_info=True)
+            await asyncio.sleep(interval)
+
+    def get_data(self, reload: bool = False) -> List[Dict[str, Any]]:
+        """
+        Возвращает список участников из актуального снимка (в исходном порядке).
+
+        Args:
+            reload: Если True, принудительно перечитывает файл
+        """
+        snapshot = self.get_snapshot(reload=reload)
+        return snapshot.standings.get_records(range(len(snapshot)))
+
+    def get_stats(self) -> Dict[str, int]:
+        """Возвращает счётчики попаданий/промахов кэша."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "version": self._version,
+        }
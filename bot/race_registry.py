@@ -0,0 +1,202 @@
+"""Реестр гонок: несколько гонок в одном процессе."""
+import json
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from bot.api_client import RaceDataClient
+from bot.http_source import HttpRaceDataSource
+from bot.logger import setup_logger
+from bot.race_clock import RaceClock, default_clock
+from bot.race_data import RaceDataStore
+from bot.render_cache import RenderCache
+from bot.settings import (
+    DEFAULT_RACE_ID, LAP_DURATION, TOTAL_LAPS, RACE_DATA_URL,
+    STATE_DB_PATH, STATE_FLUSH_INTERVAL, STATE_FLUSH_BATCH,
+)
+from bot.state import StateManager
+from bot.state_store import SQLiteStateStore, StateWriter
+from bot.user_state import UserStateManager
+
+logger = setup_logger()
+
+
+@dataclass
+class RaceConfig:
+    """Параметры одной гонки."""
+    race_id: str
+    clock: RaceClock
+    data_file: Optional[str] = None  # JSON-файл с результатами (None - race_2_results.json)
+    data_url: Optional[str] = None  # HTTP-источник данных (если указан, файл не используется)
+
+
+def _parse_race_config(item: dict, base_dir: Path) -> RaceConfig:
+    """
+    Разбирает описание гонки из файла RACES_FILE.
+
+    Raises:
+        ValueError: Если описание некорректно
+    """
+    race_id = str(item.get("id") or "").strip()
+    if not race_id:
+        raise ValueError(f"У гонки не указан id: {item}")
+    start_time_str = item.get("start_time") or ""
+    try:
+        start_time = datetime.strptime(start_time_str, "%Y-%m-%d %H:%M:%S") if start_time_str else None
+    except ValueError:
+        raise ValueError(
+            f"Неверный формат start_time гонки {race_id}: '{start_time_str}'. "
+            f"Используйте формат: 'YYYY-MM-DD HH:MM:SS'"
+        )
+    data_file = item.get("data_file")
+    if data_file:
+        # Относительные пути считаются от расположения RACES_FILE
+        data_file = str(base_dir / data_file)
+    return RaceConfig(
+        race_id=race_id,
+        clock=RaceClock(start_time, float(item.get("lap_duration", LAP_DURATION)), int(item.get("total_laps", TOTAL_LAPS))),
+        data_file=data_file,
+        data_url=(item.get("data_url") or "").strip() or None,
+    )
+
+
+def load_race_configs(races_file: Optional[str] = None) -> List[RaceConfig]:
+    """
+    Загружает список гонок.
+
+    Args:
+        races_file: JSON-файл со списком гонок; если не указан, возвращается
+                    одна гонка из настроек (RACE_START_TIME, RACE_DATA_URL)
+
+    Raises:
+        ValueError: Если файл некорректен или ID гонок повторяются
+    """
+    if races_file is None:
+        return [RaceConfig(DEFAULT_RACE_ID, default_clock, data_url=RACE_DATA_URL)]
+
+    with open(races_file, "r", encoding="utf-8") as f:
+        items = json.load(f)
+    if not isinstance(items, list) or not items:
+        raise ValueError(f"{races_file}: ожидался непустой список гонок")
+    base_dir = Path(races_file).resolve().parent
+    configs = [_parse_race_config(item, base_dir) for item in items]
+    race_ids = [config.race_id for config in configs]
+    if len(set(race_ids)) != len(race_ids):
+        raise ValueError(f"{races_file}: ID гонок повторяются: {race_ids}")
+    return configs
+
+
+def state_db_path_for(race_id: str, single: bool) -> Optional[str]:
+    """
+    Возвращает путь к хранилищу состояния гонки.
+
+    Единственная гонка использует STATE_DB_PATH как есть, при нескольких
+    гонках к имени файла добавляется ID гонки (bot_state.heat1.db).
+    """
+    if STATE_DB_PATH is None or single:
+        return STATE_DB_PATH
+    root, ext = os.path.splitext(STATE_DB_PATH)
+    return f"{root}.{race_id}{ext}"
+
+
+class Race:
+    """
+    Гонка со своими расписанием, источником данных, снимком, кэшами и
+    подписчиками (состояния чатов и отслеживающие пользователи).
+    """
+
+    def __init__(self, config: RaceConfig, state_db_path: Optional[str] = None):
+        """
+        Инициализация гонки.
+
+        Args:
+            config: Параметры гонки
+            state_db_path: Путь к хранилищу состояния (None - только в памяти)
+        """
+        self.config = config
+        self.race_id = config.race_id
+        self.clock = config.clock
+        # HTTP-источник данных гонки (если data_url задан), иначе локальный файл
+        self.source = HttpRaceDataSource(
+            config.data_url, total_laps=self.clock.total_laps
+        ) if config.data_url else None
+        # Хранилище данных гонки (один снимок на гонку)
+        self.data_store = RaceDataStore(
+            client=RaceDataClient(config.data_file, self.clock.total_laps), source=self.source, total_laps=self.clock.total_laps
+        )
+        # Менеджер состояний для чатов
+        self.state_manager = StateManager()
+        # Менеджер состояний для пользователей (user-mode)
+        self.user_state_manager = UserStateManager()
+        # Кэш отрисованных лидерборд; LRU персональных лидерборд ограничен числом активных отслеживаний
+        self.render_cache = RenderCache(user_capacity=lambda: self.user_state_manager.tracker_count)
+        # Запас времени прогрева по кругам: секунд до границы (отрицательное - опоздание)
+        self.prewarm_leads: Dict[int, float] = {}
+
+        # Постоянное хранилище состояния с отложенной записью
+        self.state_db_path = state_db_path
+        self.state_store = SQLiteStateStore(
+            state_db_path, self.race_id, self.clock.generation
+        ) if state_db_path else None
+        self.state_writer = StateWriter(
+            self.state_store,
+            user_row=self.user_state_manager.get_row,
+            chat_row=self.state_manager.get_row,
+            interval=STATE_FLUSH_INTERVAL,
+            batch_size=STATE_FLUSH_BATCH
+        ) if self.state_store is not None else None
+        if self.state_writer is not None:
+            self.user_state_manager.on_change = self.state_writer.mark_user
+            self.state_manager.on_change = self.state_writer.mark_chat
+
+    @property
+    def active_chats(self) -> set:
+        """Активные чаты гонки."""
+        return self.state_manager.active_chats
+
+    def is_active(self, now: Optional[datetime] = None) -> bool:
+        """Проверяет, идёт ли гонка."""
+        return self.clock.is_race_active(now)
+
+
+class RaceRegistry:
+    """Реестр гонок процесса (порядок - как в конфигурации)."""
+
+    def __init__(self, configs: List[RaceConfig]):
+        """
+        Создаёт гонки по конфигурации.
+
+        Args:
+            configs: Параметры гонок
+        """
+        single = len(configs) == 1
+        self._races: Dict[str, Race] = {
+            config.race_id: Race(config, state_db_path_for(config.race_id, single))
+            for config in configs
+        }
+
+    def __iter__(self) -> Iterator[Race]:
+        return iter(self._races.values())
+
+    def __len__(self) -> int:
+        return len(self._races)
+
+    def get(self, race_id: str) -> Race:
+        """
+        Возвращает гонку по ID.
+
+        Raises:
+            KeyError: Если гонки нет в реестре
+        """
+        return self._races[race_id]
+
+    @property
+    def default(self) -> Race:
+        """Первая гонка в реестре (для языка и общих настроек пользователя)."""
+        return next(iter(self._races.values()))
+
+    def get_active(self, now: Optional[datetime] = None) -> List[Race]:
+        """Возвращает гонки, которые идут в данный момент."""
+        return [race for race in self if race.is_active(now)]
@@ -0,0 +1,270 @@
+"""Кэш отрисованных лидерборд для рассылки во все чаты."""
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Tuple, Callable, Optional, Any
+
+from bot.config.language_config import DEFAULT_LANGUAGE
+from bot.leaderboard import (
+    render_start_leaderboard,
+    render_lap_leaderboard,
+    render_final_leaderboard,
+    render_user_leaderboard,
+)
+from bot.race_data import RaceSnapshot
+
+# Минимальный размер LRU персональных лидерборд (пока отслеживающих мало)
+USER_ENTRIES_MIN = 128
+
+
+class RenderCache:
+    """
+    Кэш текстов лидерборд с ключом (версия снимка, вид, круг, язык).
+
+    Текст для каждого ключа формируется один раз и затем раздаётся всем чатам.
+    Персональные лидерборды дополнительно ключуются отслеживаемой сущностью,
+    поэтому могут быть сформированы заранее (прогрев) до границы круга.
+    При появлении новой версии снимка переносятся только тексты, которые не
+    затронуты изменениями (snapshot.diff), остальные удаляются.
+
+    Персональные лидерборды хранятся отдельно в LRU: их число растёт с числом
+    отслеживающих, поэтому размер ограничен числом активных отслеживаний
+    (user_capacity), но не меньше USER_ENTRIES_MIN.
+    """
+
+    def __init__(self, user_capacity: Optional[Callable[[], int]] = None):
+        """
+        Инициализация кэша.
+
+        Args:
+            user_capacity: Возвращает текущий размер LRU персональных лидерборд
+                           (обычно число активных отслеживаний); None - USER_ENTRIES_MIN
+        """
+        self._entries: Dict[Tuple, str] = {}
+        self._user_entries: "OrderedDict[Tuple, str]" = OrderedDict()
+        self._user_capacity = user_capacity
+        self._version: Optional[int] = None
+        # Попадания и промахи персональных лидерборд по кругам: круг -> [попадания, промахи]
+        self._lap_counters: Dict[int, List[int]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self.carried_over = 0
+        self.invalidated = 0
+
+    def _rebase(self, snapshot: RaceSnapshot) -> None:
+        """
+        Переходит на новую версию снимка.
+
+        Если изменения посчитаны относительно версии, для которой сформированы
+        тексты, незатронутые записи переносятся на новую версию; иначе кэш очищается.
+        """
+        diff = snapshot.diff
+        total_laps = snapshot.standings.total_laps
+        reusable = diff is not None and diff.base_version == self._version and not diff.full
+
+        def carry(entries: Dict[Tuple, str]) -> List[Tuple[Tuple, str]]:
+            if not reusable:
+                return []
+            return [
+                ((snapshot.version,) + key[1:], text)
+                for key, text in entries.items()
+                if not diff.affects(key[1], key[2], total_laps)
+            ]
+
+        kept = dict(carry(self._entries))
+        # Порядок LRU сохраняется
+        kept_user = OrderedDict(carry(self._user_entries))
+        total = len(self._entries) + len(self._user_entries)
+        self.carried_over += len(kept) + len(kept_user)
+        self.invalidated += total - len(kept) - len(kept_user)
+        self._entries = kept
+        self._user_entries = kept_user
+        self._version = snapshot.version
+
+    def _get_or_render(self, snapshot: RaceSnapshot, key: Tuple, render: Callable[[], str]) -> str:
+        """
+        Возвращает текст из кэша или формирует его.
+
+        Args:
+            snapshot: Снимок данных гонки
+            key: Ключ (версия снимка, вид, круг, язык, ...)
+            render: Функция формирования текста
+        """
+        if snapshot.version != self._version:
+            self._rebase(snapshot)
+
+        text = self._entries.get(key)
+        if text is not None:
+            self.hits += 1
+            return text
+
+        self.misses += 1
+        text = render()
+        self._entries[key] = text
+        return text
+
+    def get_start_leaderboard(self, snapshot: RaceSnapshot, language: str = DEFAULT_LANGUAGE) -> str:
+        """
+        Возвращает текст стартовой лидерборды.
+
+        Args:
+            snapshot: Снимок данных гонки
+            language: Язык для переводов
+        """
+        return self._get_or_render(
+            snapshot,
+            (snapshot.version, "start", 0, language),
+            lambda: render_start_leaderboard(snapshot.standings, language)
+        )
+
+    def get_lap_leaderboard(self, snapshot: RaceSnapshot, lap_number: int, language: str = DEFAULT_LANGUAGE) -> str:
+        """
+        Возвращает текст лидерборды круга.
+
+        Args:
+            snapshot: Снимок данных гонки
+            lap_number: Номер круга
+            language: Язык для переводов
+        """
+        return self._get_or_render(
+            snapshot,
+            (snapshot.version, "lap", lap_number, language),
+            lambda: render_lap_leaderboard(snapshot.standings, lap_number, language)
+        )
+
+    def get_final_leaderboard(self, snapshot: RaceSnapshot, language: str = DEFAULT_LANGUAGE) -> str:
+        """
+        Возвращает текст финальной лидерборды.
+
+        Args:
+            snapshot: Снимок данных гонки
+            language: Язык для переводов
+        """
+        final_lap = snapshot.standings.total_laps
+        return self._get_or_render(
+            snapshot,
+            (snapshot.version, "final", final_lap, language),
+            lambda: render_final_leaderboard(snapshot.standings, language)
+        )
+
+    def get_user_leaderboard(
+        self,
+        snapshot: RaceSnapshot,
+        lap_number: int,
+        entity_type: str,
+        entity_value: str,
+        language: str = DEFAULT_LANGUAGE
+    ) -> str:
+        """
+        Возвращает текст персональной лидерборды для отслеживаемой сущности.
+
+        Args:
+            snapshot: Снимок данных гонки
+            lap_number: Номер круга
+            entity_type: Тип сущности ("account" или "team")
+            entity_value: Значение (кошелёк или название команды)
+            language: Язык для переводов
+        """
+        key = self._user_key(snapshot, lap_number, entity_type, entity_value, language)
+        counters = self._lap_counters.setdefault(lap_number, [0, 0])
+        entries = self._user_entries
+        text = entries.get(key)
+        if text is not None:
+            entries.move_to_end(key)
+            self.hits += 1
+            counters[0] += 1
+            return text
+
+        text = render_user_leaderboard(snapshot.standings, lap_number, entity_type, entity_value, language)
+        self._store_user(key, text)
+        return text
+
+    def _user_key(
+        self, snapshot: RaceSnapshot, lap_number: int, entity_type: str, entity_value: str, language: str
+    ) -> Tuple:
+        """Возвращает ключ персональной лидерборды, при необходимости переходя на версию снимка."""
+        if snapshot.version != self._version:
+            self._rebase(snapshot)
+        # Значение нормализуется так же, как при поиске в индексе снимка
+        return (snapshot.version, "user", lap_number, language, entity_type, entity_value.lower())
+
+    def _store_user(self, key: Tuple, text: str) -> None:
+        """Сохраняет сформированную персональную лидерборду (промах) и вытесняет старые записи LRU."""
+        self.misses += 1
+        self._lap_counters.setdefault(key[2], [0, 0])[1] += 1
+        entries = self._user_entries
+        entries[key] = text
+        capacity = max(self._user_capacity() if self._user_capacity else 0, USER_ENTRIES_MIN)
+        while len(entries) > capacity:
+            entries.popitem(last=False)
+            self.evicted += 1
+
+    def get_missing_user_leaderboards(
+        self, snapshot: RaceSnapshot, lap_number: int, keys: Iterable[Tuple[str, str, str]]
+    ) -> List[Tuple[str, str, str]]:
+        """
+        Возвращает ключи персональных лидерборд, которых нет в кэше (без учёта в счётчиках).
+
+        Args:
+            snapshot: Снимок данных гонки
+            lap_number: Номер круга
+            keys: Ключи (тип сущности, значение, язык)
+        """
+        if snapshot.version != self._version:
+            self._rebase(snapshot)
+        entries = self._user_entries
+        return [
+            key for key in keys
+            if self._user_key(snapshot, lap_number, *key) not in entries
+        ]
+
+    def put_user_leaderboard(
+        self,
+        snapshot: RaceSnapshot,
+        lap_number: int,
+        entity_type: str,
+        entity_value: str,
+        language: str,
+        text: str
+    ) -> None:
+        """
+        Сохраняет персональную лидерборду, сформированную вне кэша (в процессе-шарде).
+
+        Тексты для версии снимка старше текущей не сохраняются.
+
+        Args:
+            snapshot: Снимок данных, по которому сформирован текст
+            lap_number: Номер круга
+            entity_type: Тип сущности ("account" или "team")
+            entity_value: Значение (кошелёк или название команды)
+            language: Язык
+            text: Текст лидерборды
+        """
+        if self._version is not None and snapshot.version < self._version:
+            return
+        self._store_user(self._user_key(snapshot, lap_number, entity_type, entity_value, language), text)
+
+    def get_lap_hit_ratio(self, lap_number: int) -> Tuple[int, int, float]:
+        """
+        Возвращает статистику кэша персональных лидерборд за круг.
+
+        Args:
+            lap_number: Номер круга
+
+        Returns:
+            (попадания, промахи, доля попаданий от 0 до 1)
+        """
+        hits, misses = self._lap_counters.get(lap_number, (0, 0))
+        total = hits + misses
+        return hits, misses, hits / total if total else 0.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает счётчики попаданий/промахов кэша."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries) + len(self._user_entries),
+            "user_entries": len(self._user_entries),
+            "evicted": self.evicted,
+            "carried_over": self.carried_over,
+            "invalidated": self.invalidated,
+        }
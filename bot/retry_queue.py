@@ -0,0 +1,188 @@
+"""Фоновая очередь повторной отправки сообщений."""
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set
+
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+
+from bot.logger import setup_logger
+
+logger = setup_logger()
+
+
+@dataclass(order=True)
+class RetryItem:
+    """Запись очереди повторов, упорядоченная по времени следующей попытки."""
+    due: float
+    seq: int
+    message: Any = field(compare=False)
+    attempt: int = field(compare=False, default=1)
+
+
+@dataclass
+class DeadLetter:
+    """Сообщение, которое не удалось доставить."""
+    chat_id: int
+    reason: str
+    attempts: int
+    failed_at: float
+
+
+class RetryQueue:
+    """
+    Очередь повторной отправки с экспоненциальной задержкой и джиттером.
+
+    Неудачные отправки не задерживают основную рассылку: они планируются здесь
+    и повторяются фоновой задачей. TelegramForbiddenError (бот заблокирован или
+    удалён из чата) сразу отправляет сообщение в dead-letter список и вызывает
+    on_forbidden. Устаревшие сообщения (message.is_stale()) отбрасываются.
+    """
+
+    def __init__(
+        self,
+        attempt_send: Callable[[Any], Awaitable[None]],
+        max_attempts: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        on_forbidden: Optional[Callable[[int], None]] = None,
+        dead_letter_limit: int = 1000,
+    ):
+        """
+        Инициализация очереди.
+
+        Args:
+            attempt_send: Корутина одной попытки отправки (бросает исключение при ошибке)
+            max_attempts: Максимальное количество попыток, включая первую
+            base_delay: Базовая задержка перед повтором в секундах
+            max_delay: Максимальная задержка перед повтором в секундах
+            on_forbidden: Вызывается с chat_id, если бот заблокирован в чате
+            dead_letter_limit: Сколько последних недоставленных сообщений хранить
+        """
+        self._attempt_send = attempt_send
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.on_forbidden = on_forbidden
+        self._heap: List[RetryItem] = []
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._worker: Optional[asyncio.Task] = None
+        self._in_flight: Set[asyncio.Task] = set()
+        self.dead_letters: Deque[DeadLetter] = deque(maxlen=dead_letter_limit)
+        self.scheduled = 0
+        self.recovered = 0
+        self.dropped_stale = 0
+        self.dead_lettered = 0
+
+    def _backoff(self, attempt: int) -> float:
+        """Возвращает задержку перед попыткой: экспонента с джиттером в [d/2, d]."""
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def _dead_letter(self, message: Any, reason: str, attempts: int) -> None:
+        """Переносит сообщение в dead-letter список."""
+        self.dead_letters.append(DeadLetter(message.chat_id, reason, attempts, time.time()))
+        self.dead_lettered += 1
+
+    def submit(self, message: Any, error: Exception, attempt: int = 1) -> None:
+        """
+        Планирует повтор после неудачной попытки.
+
+        Args:
+            message: Сообщение (OutgoingMessage)
+            error: Ошибка неудачной попытки
+            attempt: Номер неудачной попытки (1 - первая отправка)
+        """
+        if isinstance(error, TelegramForbiddenError):
+            logger.warning(f"🚫 Чат {message.chat_id} недоступен для бота: {error}")
+            self._dead_letter(message, "forbidden", attempt)
+            if self.on_forbidden is not None:
+                self.on_forbidden(message.chat_id)
+            return
+
+        if attempt >= self.max_attempts:
+            logger.error(f"❌ Не удалось отправить сообщение в чат {message.chat_id} после {attempt} попыток: {error}")
+            self._dead_letter(message, str(error), attempt)
+            return
+
+        if isinstance(error, TelegramRetryAfter):
+            delay = error.retry_after
+        else:
+            delay = self._backoff(attempt)
+        logger.warning(
+            f"⚠️ Ошибка при отправке в чат {message.chat_id} "
+            f"(попытка {attempt}/{self.max_attempts}), повтор через {delay:.1f} сек: {error}"
+        )
+        heapq.heappush(self._heap, RetryItem(time.monotonic() + delay, next(self._seq), message, attempt + 1))
+        self.scheduled += 1
+        self._wakeup.set()
+
+    async def _retry(self, item: RetryItem) -> None:
+        """Выполняет одну повторную попытку."""
+        if item.message.is_stale is not None and item.message.is_stale():
+            self.dropped_stale += 1
+            return
+        try:
+            await self._attempt_send(item.message)
+        except Exception as e:
+            self.submit(item.message, e, item.attempt)
+        else:
+            self.recovered += 1
+
+    async def _run(self) -> None:
+        """Фоновая задача: запускает повторы по мере наступления их времени."""
+        while True:
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            delay = self._heap[0].due - time.monotonic()
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            item = heapq.heappop(self._heap)
+            # Повторы выполняются независимо, медленный получатель не держит очередь
+            task = asyncio.create_task(self._retry(item))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    def start(self) -> None:
+        """Запускает фоновую задачу очереди."""
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает фоновую задачу очереди и отменяет уже начатые повторы."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        # Повторы не должны продолжать отправку после закрытия сессии бота
+        in_flight = list(self._in_flight)
+        for task in in_flight:
+            task.cancel()
+        await asyncio.gather(*in_flight, return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Возвращает метрики очереди."""
+        return {
+            "depth": len(self._heap) + len(self._in_flight),
+            "scheduled": self.scheduled,
+            "recovered": self.recovered,
+            "dropped_stale": self.dropped_stale,
+            "dead_letters": self.dead_lettered,
+        }
@@ -0,0 +1,168 @@
+"""Планировщик событий гонки по точным границам кругов."""
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from bot.logger import setup_logger
+from bot.race_clock import RaceClock
+from bot.settings import PREWARM_LEAD, DEFAULT_RACE_ID
+
+logger = setup_logger()
+
+
+@dataclass
+class RaceEvent:
+    """Событие гонки."""
+    kind: str  # "prewarm", "start", "lap" или "final"
+    lap_number: int  # Номер завершённого круга (0 для старта)
+    scheduled_at: datetime  # Расчётный момент события
+    boundary_at: Optional[datetime] = None  # Для "prewarm": граница, к которой готовятся тексты
+    race_id: str = DEFAULT_RACE_ID  # Гонка, к которой относится событие
+
+
+RaceEventHandler = Callable[[RaceEvent], Awaitable[None]]
+
+
+class LapScheduler:
+    """
+    Планировщик событий старта, окончания кругов и финиша.
+
+    Моменты событий вычисляются из расписания каждой зарегистрированной гонки
+    (время старта, длительность и количество кругов). Один планировщик ведёт
+    все гонки: события сливаются в общую ленту по времени, планировщик спит
+    ровно до следующей границы по монотонным часам event loop и раздаёт
+    событие подписчикам. Между событиями лишних пробуждений нет.
+    """
+
+    def __init__(self):
+        """Инициализация планировщика."""
+        self._races: Dict[str, RaceClock] = {}
+        self._subscribers: List[RaceEventHandler] = []
+        self._task: Optional[asyncio.Task] = None
+        self._handler_tasks: Set[asyncio.Task] = set()
+        self.last_lag: Optional[float] = None  # Опоздание последнего события в секундах
+
+    def add_race(self, race_id: str, clock: RaceClock) -> None:
+        """
+        Регистрирует расписание гонки (до запуска планировщика).
+
+        Args:
+            race_id: ID гонки (передаётся в RaceEvent.race_id)
+            clock: Расписание гонки
+        """
+        self._races[race_id] = clock
+
+    def subscribe(self, handler: RaceEventHandler) -> None:
+        """
+        Подписывает обработчик на события гонки.
+
+        Args:
+            handler: Корутина, принимающая RaceEvent
+        """
+        self._subscribers.append(handler)
+
+    def get_schedule(self, now: Optional[datetime] = None) -> List[RaceEvent]:
+        """
+        Возвращает предстоящие события всех гонок в порядке времени.
+
+        Если гонка уже идёт, старт включается в расписание немедленно (чтобы
+        опубликовать стартовую лидерборду), а уже прошедшие круги пропускаются.
+        Перед каждой границей (старт и окончание круга) за PREWARM_LEAD секунд
+        ставится событие "prewarm" для заблаговременного формирования текстов.
+
+        Args:
+            now: Текущее время (по умолчанию используется datetime.now())
+        """
+        if now is None:
+            now = datetime.now()
+
+        events: List[RaceEvent] = []
+        for race_id, clock in self._races.items():
+            events.extend(self._get_race_schedule(race_id, clock, now))
+        # Сортировка устойчива: при равном времени сохраняется порядок добавления
+        events.sort(key=lambda event: event.scheduled_at)
+        return events
+
+    @staticmethod
+    def _get_race_schedule(race_id: str, clock: RaceClock, now: datetime) -> List[RaceEvent]:
+        """Возвращает предстоящие события одной гонки."""
+        start_time = clock.start_time
+        if start_time is None:
+            return []
+
+        # Прогрев не раньше середины круга, даже если круги гонки короче LAP_DURATION
+        lead = timedelta(seconds=min(PREWARM_LEAD, clock.lap_duration / 2))
+        events: List[RaceEvent] = []
+        if now < start_time:
+            events.append(RaceEvent("prewarm", 0, max(now, start_time - lead), start_time, race_id))
+            events.append(RaceEvent("start", 0, start_time, race_id=race_id))
+        elif clock.is_race_active(now):
+            events.append(RaceEvent("start", 0, now, race_id=race_id))
+
+        for lap_number in range(1, clock.total_laps + 1):
+            lap_end = clock.get_lap_end_time(lap_number)
+            if lap_end > now:
+                events.append(RaceEvent("prewarm", lap_number, max(now, lap_end - lead), lap_end, race_id))
+                events.append(RaceEvent("lap", lap_number, lap_end, race_id=race_id))
+
+        race_end = clock.get_race_end_time()
+        if race_end > now:
+            events.append(RaceEvent("final", clock.total_laps, race_end, race_id=race_id))
+        return events
+
+    async def _sleep_until(self, when: datetime) -> None:
+        """Спит до указанного момента по монотонным часам event loop."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (when - datetime.now()).total_seconds()
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(remaining)
+
+    async def _run_handler(self, handler: RaceEventHandler, event: RaceEvent) -> None:
+        """Выполняет обработчик, не давая его ошибке остановить планировщик."""
+        try:
+            await handler(event)
+        except Exception as e:
+            logger.error(f"❌ Ошибка в обработчике события {event.kind} (круг {event.lap_number}): {e}", exc_info=True)
+
+    def _emit(self, event: RaceEvent) -> None:
+        """Раздаёт событие подписчикам, не дожидаясь их завершения."""
+        self.last_lag = max(0.0, (datetime.now() - event.scheduled_at).total_seconds())
+        logger.info(
+            f"⏱️ Событие {event.kind} (гонка {event.race_id}, круг {event.lap_number}), "
+            f"опоздание {self.last_lag * 1000:.1f} мс"
+        )
+        for handler in self._subscribers:
+            task = asyncio.create_task(self._run_handler(handler, event))
+            self._handler_tasks.add(task)
+            task.add_done_callback(self._handler_tasks.discard)
+
+    async def _run(self) -> None:
+        """Основной цикл: ожидание и выпуск событий по расписанию."""
+        schedule = self.get_schedule()
+        if not schedule:
+            logger.info("Планировщик: предстоящих событий гонки нет")
+            return
+
+        logger.info(f"Планировщик: запланировано событий {len(schedule)}, первое в {schedule[0].scheduled_at}")
+        for event in schedule:
+            await self._sleep_until(event.scheduled_at)
+            self._emit(event)
+
+    def start(self) -> None:
+        """Запускает планировщик."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает планировщик и выполняющиеся обработчики."""
+        tasks = list(self._handler_tasks)
+        if self._task is not None:
+            tasks.append(self._task)
+            self._task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -1,6 +1,7 @@
 """Конфигурация бота."""
 import os
 from datetime import datetime
+from pathlib import Path
 from dotenv import load_dotenv
 
 # Загружаем переменные окружения из .env
@@ -23,6 +24,27 @@ LAP_DURATION = 20
 # Общее количество кругов
 TOTAL_LAPS = 12
 
+# За сколько секунд до границы круга заранее формировать тексты лидерборд
+PREWARM_LEAD = LAP_DURATION / 2
+
+# Параметры рассылки (лимиты Telegram Bot API)
+# Максимум одновременных запросов send_message
+BROADCAST_MAX_CONCURRENCY = 25
+# Глобальный лимит сообщений в секунду для бота
+BROADCAST_GLOBAL_RATE = 30
+# Лимит сообщений в секунду в один личный чат
+BROADCAST_PRIVATE_CHAT_RATE = 1
+# Лимит сообщений в секунду в одну группу (20 сообщений в минуту)
+BROADCAST_GROUP_CHAT_RATE = 20 / 60
+
+# Целевая задержка доставки (SLO) ответов в диалоге в секундах; SLO рассылки
+# кругов - длительность круга гонки (круг должен дойти до начала следующего)
+REPLY_DELIVERY_SLO = 2
+
+# Максимальная длина текста одного сообщения Telegram (в UTF-16 символах);
+# более длинные лидерборды делятся на несколько сообщений по границам строк
+TELEGRAM_MESSAGE_LIMIT = 4096
+
 # Преобразуем строку времени старта в datetime
 RACE_START_TIME = None
 if RACE_START_TIME_STR:
@@ -34,6 +56,79 @@ if RACE_START_TIME_STR:
             f"Используйте формат: 'YYYY-MM-DD HH:MM:SS'"
         )
 
+# Источник данных гонки по HTTP (опционально, можно указать в .env)
+# Если не указан, данные читаются из локального файла race_2_results.json
+RACE_DATA_URL = os.getenv("RACE_DATA_URL", "").strip() or None
+
+# Интервал опроса HTTP-источника в секундах (условные GET с ETag/If-Modified-Since)
+RACE_DATA_POLL_INTERVAL = 2
+
+# Таймаут запроса к HTTP-источнику в секундах
+RACE_DATA_TIMEOUT = 5
+
+# Интервал проверки файла с результатами на изменения в секундах (горячая перезагрузка)
+RACE_DATA_WATCH_INTERVAL = 1
+
+# Бинарный снимок данных рядом с JSON (<файл>.snapshot) для быстрого перезапуска:
+# при неизменном содержимом файла участники и индексы отображаются через mmap
+# без разбора JSON. Отключается переменной окружения RACE_DATA_SNAPSHOT=0
+RACE_DATA_SNAPSHOT = os.getenv("RACE_DATA_SNAPSHOT", "1").strip() != "0"
+
+# Количество процессов-шардов, формирующих персональные лидерборды (отслеживающие
+# распределяются по хешу user_id). 0 или 1 - тексты формируются в event loop
+TRACKER_SHARDS = int(os.getenv("TRACKER_SHARDS", "0") or 0)
+# Минимум текстов за круг, начиная с которого они формируются в процессах-шардах
+# (меньшие пакеты быстрее сформировать на месте, чем передавать между процессами)
+TRACKER_SHARD_MIN_GROUPS = 200
+
+# Несколько гонок в одном процессе (опционально): путь к JSON-файлу со списком гонок
+# [{"id": "heat1", "start_time": "YYYY-MM-DD HH:MM:SS", "lap_duration": 20, "total_laps": 12,
+#   "data_file": "heat1.json", "data_url": null}, ...]
+# Если не указан, используется одна гонка из параметров выше (RACE_START_TIME, RACE_DATA_URL)
+RACES_FILE = os.getenv("RACES_FILE", "").strip() or None
+
+# ID гонки из параметров выше (когда RACES_FILE не указан)
+DEFAULT_RACE_ID = "main"
+
+# Постоянное хранилище состояния чатов и пользователей (SQLite в режиме WAL).
+# По умолчанию bot_state.db в корне проекта; пустое значение STATE_DB_PATH -
+# состояние только в памяти (теряется при перезапуске)
+STATE_DB_PATH = os.getenv("STATE_DB_PATH", str(Path(__file__).parent.parent / "bot_state.db")).strip() or None
+
+# Максимальная задержка отложенной записи состояния в секундах
+STATE_FLUSH_INTERVAL = 0.5
+
+# Количество изменённых записей, при котором запись начинается досрочно
+STATE_FLUSH_BATCH = 1000
+
+# Контроль допуска ввода пользователей в личных сообщениях (всплеск при старте гонки)
+# Максимум принятых, но не обработанных запросов; сверх него пользователь получает
+# ответ «попробуйте позже», а запрос не обрабатывается
+DM_MAX_PENDING = 500
+# Максимум запросов, которые проверяются одновременно
+DM_MAX_CONCURRENCY = 8
+# Не чаще скольких секунд пользователь получает ответ «попробуйте позже»
+# (повтор текста, ещё ожидающего обработки, игнорируется без ответа)
+DM_BUSY_REPLY_WINDOW = 5
+
+# Webhook вместо long polling (опционально): публичный HTTPS-адрес бота,
+# например https://bot.example.com. Если не указан, используется polling
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "").strip().rstrip("/") or None
+# Путь, на который Telegram отправляет обновления
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook").strip() or "/webhook"
+# Адрес и порт локального aiohttp-сервера (за обратным прокси с TLS)
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0").strip() or "0.0.0.0"
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080") or 8080)
+# Секрет, который Telegram передаёт в заголовке X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "").strip() or None
+# Максимум одновременных соединений Telegram с webhook (1-100)
+WEBHOOK_MAX_CONNECTIONS = 40
+# Максимум обновлений, которые обрабатываются одновременно
+WEBHOOK_MAX_CONCURRENCY = 64
+# Максимум принятых, но ещё не обработанных обновлений; сверх него сервер
+# отвечает 503 и Telegram повторит доставку позже (обновления не теряются)
+WEBHOOK_MAX_PENDING = 1000
+
 # ID чата для отправки сообщений (опционально, можно указать в .env)
 # Если не указан, бот будет отправлять в чаты, где он добавлен
 # CHAT_ID может быть отрицательным для групп
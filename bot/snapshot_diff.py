@@ -0,0 +1,106 @@
+"""Сравнение двух снимков данных гонки для точечной инвалидации кэшей."""
+from dataclasses import dataclass, field
+from itertools import compress
+from operator import ne
+from typing import List, Sequence, Set
+
+from bot.standings import StandingsIndex
+
+# Номер "круга" для стартовых позиций в наборе изменённых колонок
+START_COLUMN = 0
+
+
+@dataclass
+class SnapshotDiff:
+    """
+    Изменения между двумя версиями снимка.
+
+    Attributes:
+        base_version: Версия снимка, относительно которой посчитаны изменения
+        changed_columns: Изменённые колонки позиций (START_COLUMN - старт, 1..N - круги)
+        changed_participants: id участников, у которых изменились позиции или команда
+        names_changed: Изменились названия команд (затрагивает все тексты)
+        full: Изменился состав участников - сравнение по id невозможно
+    """
+    base_version: int
+    changed_columns: Set[int] = field(default_factory=set)
+    changed_participants: List[int] = field(default_factory=list)
+    names_changed: bool = False
+    full: bool = False
+
+    @property
+    def is_empty(self) -> bool:
+        """True, если данные не изменились."""
+        return not (self.full or self.names_changed or self.changed_columns)
+
+    def affects(self, kind: str, lap_number: int, total_laps: int) -> bool:
+        """
+        Проверяет, изменился ли текст лидерборды.
+
+        Лидерборда круга и персональная лидерборда зависят от позиций на этом
+        и предыдущем круге (для первого круга - от старта), финальная -
+        от последнего круга и старта, стартовая - только от старта.
+
+        Args:
+            kind: Вид лидерборды ("start", "lap", "final", "user")
+            lap_number: Номер круга
+            total_laps: Общее количество кругов
+        """
+        if self.full or self.names_changed:
+            return True
+        if kind == "start":
+            return START_COLUMN in self.changed_columns
+        if kind == "final":
+            return bool({START_COLUMN, total_laps} & self.changed_columns)
+        return bool({lap_number - 1, lap_number} & self.changed_columns)
+
+    def affected_laps(self, total_laps: int) -> List[int]:
+        """Возвращает круги, лидерборды которых изменились."""
+        return [lap for lap in range(1, total_laps + 1) if self.affects("lap", lap, total_laps)]
+
+
+def _changed_ids(before: Sequence[int], after: Sequence[int]) -> List[int]:
+    """Возвращает id участников, у которых значение в колонке изменилось."""
+    if memoryview(before) == memoryview(after):
+        return []
+    return list(compress(range(len(after)), map(ne, before, after)))
+
+
+def compute_snapshot_diff(old: StandingsIndex, new: StandingsIndex, base_version: int) -> SnapshotDiff:
+    """
+    Сравнивает колонки двух снимков (выполняется вне event loop).
+
+    Участники сопоставляются по id, поэтому если изменился их состав или
+    порядок в файле, возвращается полное изменение.
+
+    Args:
+        old: Индекс прежнего снимка
+        new: Индекс нового снимка
+        base_version: Версия прежнего снимка
+    """
+    diff = SnapshotDiff(base_version=base_version)
+    old_columns, new_columns = old.columns, new.columns
+    if old.total_laps != new.total_laps or old_columns.users != new_columns.users:
+        diff.full = True
+        return diff
+
+    changed: Set[int] = set()
+    old_names = list(map(old_columns.team_table.__getitem__, old_columns.team_ids))
+    new_names = list(map(new_columns.team_table.__getitem__, new_columns.team_ids))
+    if old_names != new_names:
+        diff.names_changed = True
+        changed.update(compress(range(len(new_names)), map(ne, old_names, new_names)))
+
+    column_pairs = [(START_COLUMN, old_columns.start_positions, new_columns.start_positions)]
+    column_pairs += [
+        (lap_number, old_columns.lap_column(lap_number), new_columns.lap_column(lap_number))
+        for lap_number in range(1, new.total_laps + 1)
+    ]
+    for column, before, after in column_pairs:
+        ids = _changed_ids(before, after)
+        if ids:
+            diff.changed_columns.add(column)
+            changed.update(ids)
+
+    diff.changed_participants = sorted(changed)
+    return diff
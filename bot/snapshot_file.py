@@ -0,0 +1,265 @@
+"""Бинарный снимок данных гонки с индексами для быстрого перезапуска."""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from bot.api_client import RaceDataClient
+from bot.columnar import ParticipantColumns
+from bot.logger import setup_logger
+from bot.standings import StandingsIndex
+
+logger = setup_logger()
+
+# Версия формата: при изменении раскладки старые снимки пересобираются
+SNAPSHOT_FORMAT_VERSION = 1
+SNAPSHOT_SUFFIX = ".snapshot"
+
+# Заголовок: сигнатура, версия формата, длина метаданных (JSON)
+_HEADER = struct.Struct("<8sII")
+_MAGIC = b"RACESNAP"
+# Выравнивание начала каждой секции в байтах
+_ALIGNMENT = 8
+# Разделитель строк в таблицах кошельков и команд
+_SEPARATOR = "\0"
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def content_hash(path: str) -> str:
+    """
+    Считает хеш содержимого файла (BLAKE2b), читая его блоками.
+
+    Args:
+        path: Путь к файлу
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def snapshot_path_for(json_file_path: str) -> str:
+    """Возвращает путь к бинарному снимку рядом с JSON-файлом."""
+    return str(json_file_path) + SNAPSHOT_SUFFIX
+
+
+def _read_metadata(mapped: mmap.mmap) -> Optional[Dict[str, Any]]:
+    """Читает метаданные снимка или возвращает None, если формат не подходит."""
+    if len(mapped) < _HEADER.size:
+        return None
+    magic, version, metadata_size = _HEADER.unpack_from(mapped, 0)
+    if magic != _MAGIC or version != SNAPSHOT_FORMAT_VERSION:
+        return None
+    metadata = json.loads(mapped[_HEADER.size:_HEADER.size + metadata_size])
+    if metadata.get("byteorder") != sys.byteorder or metadata.get("itemsize") != array('i').itemsize:
+        return None
+    return metadata
+
+
+def _pack_strings(values: List[str]) -> Optional[bytes]:
+    """Упаковывает строки в один блок UTF-8 (None, если строку нельзя упаковать)."""
+    if any(not isinstance(value, str) or _SEPARATOR in value for value in values):
+        return None
+    return _SEPARATOR.join(values).encode("utf-8")
+
+
+def _unpack_strings(data: memoryview, count: int) -> List[str]:
+    """Распаковывает строки из блока UTF-8 (с интернированием)."""
+    if not count:
+        return []
+    return list(map(sys.intern, str(data, "utf-8").split(_SEPARATOR)))
+
+
+def _pack_movers(movers: Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]) -> List[List[List[int]]]:
+    """Приводит лидеров роста/падения к виду для JSON."""
+    return [[list(pair) for pair in side] for side in movers]
+
+
+def _unpack_movers(data: List[List[List[int]]]) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]:
+    """Восстанавливает лидеров роста/падения из JSON."""
+    gainers, losers = data
+    return [tuple(pair) for pair in gainers], [tuple(pair) for pair in losers]
+
+
+def write_snapshot(standings: StandingsIndex, path: str, source_hash: str) -> bool:
+    """
+    Записывает колонки и индексы в бинарный снимок.
+
+    Запись идёт во временный файл, который затем атомарно заменяет прежний
+    снимок, поэтому читатель никогда не видит частично записанный файл.
+
+    Args:
+        standings: Индекс снимка данных (вместе с колонками)
+        path: Путь к файлу снимка
+        source_hash: Хеш содержимого исходного JSON
+
+    Returns:
+        False, если данные нельзя сохранить в бинарном виде
+    """
+    columns = standings.columns
+    users = _pack_strings(columns.users)
+    teams = _pack_strings(columns.team_table)
+    if users is None or teams is None:
+        return False
+
+    sections: List[Tuple[str, Any]] = [
+        ("users", users),
+        ("teams", teams),
+        ("team_ids", columns.team_ids),
+        ("start_positions", columns.start_positions),
+        ("start_order", standings.start_order),
+        ("final_deltas", standings.final_deltas),
+    ]
+    for lap_number in range(1, standings.total_laps + 1):
+        sections += [
+            (f"lap{lap_number}", columns.lap_column(lap_number)),
+            (f"order{lap_number}", standings.lap_orders[lap_number]),
+            (f"ranks{lap_number}", standings.lap_ranks[lap_number]),
+            (f"deltas{lap_number}", standings.lap_deltas[lap_number]),
+        ]
+
+    # Смещения секций считаются от начала файла; сначала оцениваем длину
+    # метаданных с запасом под числа смещений
+    layout: Dict[str, List[int]] = {}
+    metadata: Dict[str, Any] = {
+        "source_hash": source_hash,
+        "byteorder": sys.byteorder,
+        "itemsize": array('i').itemsize,
+        "total_laps": standings.total_laps,
+        "count": len(columns),
+        "team_count": len(columns.team_table),
+        "lap_movers": {str(lap): _pack_movers(movers) for lap, movers in standings.lap_movers.items()},
+        "final_movers": _pack_movers(standings.final_movers),
+        "sections": layout,
+    }
+    sizes = [(name, memoryview(data).nbytes) for name, data in sections]
+    for name, size in sizes:
+        layout[name] = [sys.maxsize, size]
+    data_start = _align(_HEADER.size + len(json.dumps(metadata).encode("utf-8")))
+    offset = data_start
+    for name, size in sizes:
+        layout[name] = [offset, size]
+        offset = _align(offset + size)
+    metadata_bytes = json.dumps(metadata).encode("utf-8")
+
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, SNAPSHOT_FORMAT_VERSION, len(metadata_bytes)))
+            f.write(metadata_bytes)
+            for name, data in sections:
+                f.seek(layout[name][0])
+                f.write(data)
+            f.truncate(offset)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return True
+
+
+def _align(offset: int) -> int:
+    """Округляет смещение вверх до границы выравнивания секций."""
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def read_snapshot(path: str, source_hash: Optional[str] = None) -> Optional[StandingsIndex]:
+    """
+    Отображает бинарный снимок в память и собирает из него индекс.
+
+    Числовые колонки не копируются: это memoryview('i') поверх mmap,
+    страницы подгружаются ОС по мере обращения. Заново строятся только
+    таблицы строк и хеш-индексы кошелёк/команда.
+
+    Args:
+        path: Путь к файлу снимка
+        source_hash: Ожидаемый хеш исходного JSON (None - не проверять)
+
+    Returns:
+        Индекс снимка или None, если снимка нет, формат устарел или хеш не совпал
+    """
+    try:
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (FileNotFoundError, ValueError):
+        # ValueError - пустой файл
+        return None
+
+    metadata = _read_metadata(mapped)
+    if metadata is None or (source_hash is not None and metadata["source_hash"] != source_hash):
+        mapped.close()
+        return None
+
+    view = memoryview(mapped)
+    layout = metadata["sections"]
+
+    def section(name: str) -> memoryview:
+        offset, size = layout[name]
+        return view[offset:offset + size]
+
+    def ints(name: str) -> Sequence[int]:
+        return section(name).cast("i")
+
+    total_laps = metadata["total_laps"]
+    laps = range(1, total_laps + 1)
+    columns = ParticipantColumns.from_arrays(
+        users=_unpack_strings(section("users"), metadata["count"]),
+        team_table=_unpack_strings(section("teams"), metadata["team_count"]),
+        team_ids=ints("team_ids"),
+        start_positions=ints("start_positions"),
+        laps=[ints(f"lap{lap_number}") for lap_number in laps],
+    )
+    return StandingsIndex.from_parts(
+        columns,
+        start_order=ints("start_order"),
+        lap_orders={lap_number: ints(f"order{lap_number}") for lap_number in laps},
+        lap_ranks={lap_number: ints(f"ranks{lap_number}") for lap_number in laps},
+        lap_deltas={lap_number: ints(f"deltas{lap_number}") for lap_number in laps},
+        final_deltas=ints("final_deltas"),
+        lap_movers={int(lap): _unpack_movers(movers) for lap, movers in metadata["lap_movers"].items()},
+        final_movers=_unpack_movers(metadata["final_movers"]),
+    )
+
+
+def compile_snapshot(json_file_path: str, total_laps: int) -> Optional[str]:
+    """
+    Готовит бинарный снимок для JSON-файла, если актуального снимка ещё нет.
+
+    Выполняется в потоке или отдельном процессе: если хеш содержимого JSON
+    не совпал с записанным в снимке, файл потоково загружается в колонки,
+    строится индекс и снимок перезаписывается.
+
+    Args:
+        json_file_path: Путь к JSON-файлу с данными
+        total_laps: Общее количество кругов
+
+    Returns:
+        Путь к актуальному снимку или None, если снимок записать не удалось
+    """
+    path = snapshot_path_for(json_file_path)
+    source_hash = content_hash(json_file_path)
+    try:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            metadata = _read_metadata(mapped)
+        if metadata is not None and metadata["source_hash"] == source_hash and metadata["total_laps"] == total_laps:
+            return path
+    except (FileNotFoundError, ValueError):
+        # ValueError - пустой файл снимка
+        pass
+
+    standings = StandingsIndex(RaceDataClient(json_file_path, total_laps).load_columns())
+    try:
+        written = write_snapshot(standings, path, source_hash)
+    except OSError as e:
+        logger.warning(f"⚠️ Не удалось записать бинарный снимок {path}: {e}")
+        return None
+    if not written:
+        logger.warning("⚠️ Строки участников нельзя сохранить в бинарном снимке, используется JSON")
+        return None
+    logger.info(f"📦 Бинарный снимок данных записан: {path}")
+    return path
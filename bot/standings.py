@@ -0,0 +1,314 @@
+"""Предрассчитанный индекс позиций участников по кругам."""
+from array import array
+from itertools import compress
+from operator import sub
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+
+from bot.columnar import ParticipantColumns, MISSING
+
+# Сколько лучших/худших по изменению позиции участников хранить на круг
+MOVERS_LIMIT = 3
+
+
+def _column_deltas(before: array, after: array) -> array:
+    """
+    Считает изменения позиций before - after сразу для всех участников.
+
+    Вычитание колонок выполняется через map(operator.sub) на уровне C,
+    без обращения к словарям и создания ключей на каждого участника.
+
+    Args:
+        before: Колонка позиций до (старт или предыдущий круг)
+        after: Колонка позиций после
+
+    Returns:
+        array('i') изменений по id участника; если нет позиции до или после, изменение нулевое
+    """
+    deltas = array('i', map(sub, before, after))
+    if MISSING in before or MISSING in after:
+        for participant_id, (value_before, value_after) in enumerate(zip(before, after)):
+            if value_before == MISSING or value_after == MISSING:
+                deltas[participant_id] = 0
+    return deltas
+
+
+def _movers(deltas: array, limit: int) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]:
+    """
+    Находит участников с наибольшим ростом и падением позиции.
+
+    Пороги берутся из отсортированной колонки изменений, а участники,
+    прошедшие порог, отбираются через itertools.compress без цикла на Python.
+
+    Args:
+        deltas: Изменения позиций по id участника
+        limit: Сколько участников вернуть в каждую сторону
+
+    Returns:
+        Кортеж (поднявшиеся, опустившиеся): списки (id участника, изменение)
+    """
+    if not deltas:
+        return [], []
+    ranked = sorted(deltas)
+    participant_ids = range(len(deltas))
+
+    # Только реальные изменения: рост от +1, падение от -1
+    top = max(ranked[-min(limit, len(ranked))], 1)
+    gainers = sorted(compress(participant_ids, map(top.__le__, deltas)), key=deltas.__getitem__, reverse=True)
+    bottom = min(ranked[min(limit, len(ranked)) - 1], -1)
+    losers = sorted(compress(participant_ids, map(bottom.__ge__, deltas)), key=deltas.__getitem__)
+    return (
+        [(pid, deltas[pid]) for pid in gainers[:limit]],
+        [(pid, deltas[pid]) for pid in losers[:limit]],
+    )
+
+
+def _hash_index(keys: List[str]) -> Tuple[Dict[str, int], Dict[str, List[int]]]:
+    """
+    Строит хеш-индекс ключ -> id первого участника с таким ключом.
+
+    Returns:
+        Кортеж (индекс, дубликаты): дубликаты - ключи, которым соответствует
+        больше одного участника, с id всех таких участников
+    """
+    # При построении из обратного порядка первое вхождение перезаписывает последующие
+    first_ids = dict(zip(reversed(keys), range(len(keys) - 1, -1, -1)))
+    members: Dict[str, List[int]] = {}
+    if len(first_ids) != len(keys):
+        for participant_id, key in enumerate(keys):
+            first_id = first_ids[key]
+            if first_id != participant_id:
+                members.setdefault(key, [first_id]).append(participant_id)
+    return first_ids, members
+
+
+class StandingsIndex:
+    """
+    Индекс позиций, строится один раз на снимок данных.
+
+    Работает поверх ParticipantColumns и хранит в array('i'): порядок id
+    участников на старте и на каждом круге, изменения позиций относительно
+    предыдущего круга (для первого круга - относительно старта) и итоговые
+    изменения от старта до финиша по id участника, место каждого участника
+    на круге и лидеров роста/падения по каждому кругу.
+    Дополнительно хранит хеш-индексы кошелёк/команда (в нижнем регистре) -> id.
+    """
+
+    def __init__(self, columns: ParticipantColumns):
+        """
+        Строит индекс по колонкам участников.
+
+        Args:
+            columns: Колоночное хранилище участников
+        """
+        self.columns = columns
+        self.total_laps = columns.total_laps
+        participant_ids = range(len(columns))
+
+        # Сортировка устойчива: при равных позициях сохраняется исходный порядок
+        self.start_order = array('i', sorted(participant_ids, key=columns.start_positions.__getitem__))
+        self.lap_orders: Dict[int, array] = {}
+        self.lap_deltas: Dict[int, array] = {}
+        # Круг -> (поднявшиеся, опустившиеся) по изменению позиции на круге
+        self.lap_movers: Dict[int, Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]] = {}
+        # Круг -> индекс участника в порядке круга по id участника (MISSING, если нет данных)
+        self.lap_ranks: Dict[int, array] = {}
+
+        previous = columns.start_positions
+        for lap_number in range(1, self.total_laps + 1):
+            current = columns.lap_column(lap_number)
+            if MISSING in current:
+                participant_ids_on_lap = [pid for pid in participant_ids if current[pid] != MISSING]
+            else:
+                participant_ids_on_lap = participant_ids
+            order = array('i', sorted(participant_ids_on_lap, key=current.__getitem__))
+            self.lap_orders[lap_number] = order
+
+            ranks = array('i', [MISSING]) * len(columns)
+            for idx, participant_id in enumerate(order):
+                ranks[participant_id] = idx
+            self.lap_ranks[lap_number] = ranks
+
+            # Изменение позиции: для первого круга - от старта, иначе - от предыдущего круга
+            deltas = _column_deltas(previous, current)
+            self.lap_deltas[lap_number] = deltas
+            self.lap_movers[lap_number] = _movers(deltas, MOVERS_LIMIT)
+            previous = current
+
+        # Итоговое изменение от старта до финиша для финальной лидерборды
+        self.final_deltas = _column_deltas(columns.start_positions, previous)
+        self.final_movers = _movers(self.final_deltas, MOVERS_LIMIT)
+        self._build_lookups()
+
+    @classmethod
+    def from_parts(
+        cls,
+        columns: ParticipantColumns,
+        start_order: Sequence[int],
+        lap_orders: Dict[int, Sequence[int]],
+        lap_ranks: Dict[int, Sequence[int]],
+        lap_deltas: Dict[int, Sequence[int]],
+        final_deltas: Sequence[int],
+        lap_movers: Dict[int, Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]],
+        final_movers: Tuple[List[Tuple[int, int]], List[Tuple[int, int]]],
+    ) -> "StandingsIndex":
+        """
+        Собирает индекс из готовых колонок (например, отображённых из бинарного снимка).
+
+        Порядки, места и изменения позиций не пересчитываются,
+        заново строятся только хеш-индексы кошелёк/команда.
+        """
+        index = cls.__new__(cls)
+        index.columns = columns
+        index.total_laps = columns.total_laps
+        index.start_order = start_order
+        index.lap_orders = lap_orders
+        index.lap_ranks = lap_ranks
+        index.lap_deltas = lap_deltas
+        index.final_deltas = final_deltas
+        index.lap_movers = lap_movers
+        index.final_movers = final_movers
+        index._build_lookups()
+        return index
+
+    def _build_lookups(self) -> None:
+        """Строит хеш-индексы кошелёк/команда (в нижнем регистре) -> id участника."""
+        columns = self.columns
+        account_keys = [str(user).lower() for user in columns.users]
+        team_keys_by_id = [str(team_name).lower() for team_name in columns.team_table]
+        team_keys = list(map(team_keys_by_id.__getitem__, columns.team_ids))
+
+        # Ключ -> id первого такого участника; ключи, которым соответствует
+        # больше одного участника -> все их id
+        self.account_ids, self._account_members = _hash_index(account_keys)
+        self.team_ids, self._team_members = _hash_index(team_keys)
+
+    def __len__(self) -> int:
+        """Количество участников."""
+        return len(self.columns)
+
+    def _check_lap(self, lap_number: int) -> None:
+        """Проверяет, что номер круга находится в допустимом диапазоне."""
+        if lap_number < 1 or lap_number > self.total_laps:
+            raise ValueError(f"Номер круга должен быть от 1 до {self.total_laps}")
+
+    def get_start_order(self) -> array:
+        """Возвращает id участников в порядке стартовых позиций (без копирования)."""
+        return self.start_order
+
+    def get_lap_order(self, lap_number: int) -> array:
+        """
+        Возвращает id участников в порядке позиций на круге (без копирования).
+
+        Args:
+            lap_number: Номер круга
+        """
+        self._check_lap(lap_number)
+        return self.lap_orders[lap_number]
+
+    def get_lap_deltas(self, lap_number: int) -> array:
+        """
+        Возвращает изменения позиций на круге по id участника.
+
+        Args:
+            lap_number: Номер круга
+        """
+        self._check_lap(lap_number)
+        return self.lap_deltas[lap_number]
+
+    def get_final_deltas(self) -> array:
+        """Возвращает изменения позиций от старта до финиша по id участника."""
+        return self.final_deltas
+
+    def get_lap_movers(self, lap_number: int) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]:
+        """
+        Возвращает участников с наибольшим ростом и падением позиции на круге.
+
+        Args:
+            lap_number: Номер круга
+
+        Returns:
+            Кортеж (поднявшиеся, опустившиеся): до MOVERS_LIMIT пар (id участника, изменение)
+        """
+        self._check_lap(lap_number)
+        return self.lap_movers[lap_number]
+
+    def get_final_movers(self) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]:
+        """Возвращает участников с наибольшим ростом и падением позиции за всю гонку."""
+        return self.final_movers
+
+    def get_records(self, order: array) -> List[Dict[str, Any]]:
+        """
+        Материализует участников в виде словарей исходного формата.
+
+        Args:
+            order: id участников в нужном порядке
+        """
+        return [self.columns.record(participant_id) for participant_id in order]
+
+    def find_participant_id(self, entity_type: str, entity_value: str) -> Optional[int]:
+        """
+        Находит id первого участника по кошельку или названию команды без учёта регистра.
+
+        Args:
+            entity_type: Тип сущности ("account" или "team")
+            entity_value: Значение (кошелёк или название команды)
+        """
+        ids = self.account_ids if entity_type == "account" else self.team_ids
+        return ids.get(entity_value.lower())
+
+    def find_participant(self, entity_type: str, entity_value: str) -> Optional[Dict[str, Any]]:
+        """
+        Находит участника по кошельку или названию команды без учёта регистра.
+
+        Args:
+            entity_type: Тип сущности ("account" или "team")
+            entity_value: Значение (кошелёк или название команды)
+
+        Returns:
+            Данные участника или None, если не найдено
+        """
+        participant_id = self.find_participant_id(entity_type, entity_value)
+        if participant_id is None:
+            return None
+        return self.columns.record(participant_id)
+
+    def get_entity_ids(self, entity_type: str, entity_value: str) -> List[int]:
+        """
+        Возвращает id всех участников, соответствующих сущности.
+
+        Args:
+            entity_type: Тип сущности ("account" или "team")
+            entity_value: Значение (кошелёк или название команды)
+        """
+        key = entity_value.lower()
+        ids, members = (
+            (self.account_ids, self._account_members) if entity_type == "account"
+            else (self.team_ids, self._team_members)
+        )
+        first_id = ids.get(key)
+        if first_id is None:
+            return []
+        return members.get(key, [first_id])
+
+    def find_position(self, lap_number: int, entity_type: str, entity_value: str) -> Optional[Tuple[int, int]]:
+        """
+        Находит позицию сущности на круге за O(1).
+
+        Если сущности соответствует несколько участников (например, команда),
+        берётся лучший из них - как первый найденный при линейном поиске.
+
+        Args:
+            lap_number: Номер круга
+            entity_type: Тип сущности ("account" или "team")
+            entity_value: Значение (кошелёк или название команды)
+
+        Returns:
+            Кортеж (позиция 1-based, индекс 0-based) или None, если не найдено
+        """
+        self._check_lap(lap_number)
+        ranks = self.lap_ranks[lap_number]
+        found = [ranks[pid] for pid in self.get_entity_ids(entity_type, entity_value) if ranks[pid] != MISSING]
+        if not found:
+            return None
+        idx = min(found)
+        return (idx + 1, idx)
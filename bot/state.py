@@ -1,37 +1,63 @@
 """Управление состоянием бота для каждого чата."""
-from typing import Dict, Set, Optional
+from typing import Callable, Dict, Iterable, Set, Optional, Tuple
+
+# Обработчик изменения состояния чата (получает ID чата)
+ChangeHandler = Callable[[int], None]
 
 
 class ChatState:
-    """Состояние бота для конкретного чата."""
+    """
+    Состояние бота для конкретного чата.
+    
+    Объект без __dict__ (__slots__), опубликованные круги хранятся битовой
+    маской в одном int (бит N - круг N) вместо множества.
+    """
+    
+    __slots__ = (
+        "chat_id",
+        "start_leaderboard_published",
+        "published_laps",
+        "final_leaderboard_published",
+        "_on_change",
+    )
     
-    def __init__(self, chat_id: int):
+    def __init__(self, chat_id: int, on_change: Optional[ChangeHandler] = None):
         """
         Инициализация состояния чата.
         
         Args:
             chat_id: ID чата
+            on_change: Вызывается после каждого изменения (для отложенной записи)
         """
         self.chat_id = chat_id
         self.start_leaderboard_published = False
-        self.published_laps: Set[int] = set()  # Множество опубликованных кругов
+        self.published_laps = 0  # Битовая маска опубликованных кругов
         self.final_leaderboard_published = False
+        self._on_change = on_change
+    
+    def _changed(self):
+        """Сообщает об изменении состояния."""
+        if self._on_change is not None:
+            self._on_change(self.chat_id)
     
     def mark_start_leaderboard_published(self):
         """Отмечает, что стартовая лидерборда опубликована."""
         self.start_leaderboard_published = True
+        self._changed()
     
     def mark_lap_published(self, lap_number: int):
         """Отмечает, что лидерборда для круга опубликована."""
-        self.published_laps.add(lap_number)
+        self.published_laps |= 1 << lap_number
+        self._changed()
     
     def is_lap_published(self, lap_number: int) -> bool:
         """Проверяет, опубликована ли лидерборда для круга."""
-        return lap_number in self.published_laps
+        return bool(self.published_laps >> lap_number & 1)
     
     def mark_final_leaderboard_published(self):
         """Отмечает, что финальная лидерборда опубликована."""
         self.final_leaderboard_published = True
+        self._changed()
 
 
 class StateManager:
@@ -40,6 +66,15 @@ class StateManager:
     def __init__(self):
         """Инициализация менеджера состояний."""
         self._states: Dict[int, ChatState] = {}
+        # Список активных чатов (где бот добавлен)
+        self.active_chats: Set[int] = set()
+        # Обработчик изменений (подключается хранилищем состояния)
+        self.on_change: Optional[ChangeHandler] = None
+    
+    def _changed(self, chat_id: int):
+        """Сообщает об изменении состояния чата."""
+        if self.on_change is not None:
+            self.on_change(chat_id)
     
     def get_state(self, chat_id: int) -> ChatState:
         """
@@ -52,7 +87,7 @@ class StateManager:
             Состояние чата
         """
         if chat_id not in self._states:
-            self._states[chat_id] = ChatState(chat_id)
+            self._states[chat_id] = ChatState(chat_id, on_change=self._changed)
         return self._states[chat_id]
     
     def reset_state(self, chat_id: int):
@@ -64,4 +99,76 @@ class StateManager:
         """
         if chat_id in self._states:
             del self._states[chat_id]
-
+            self._changed(chat_id)
+    
+    def activate_chat(self, chat_id: int) -> bool:
+        """
+        Добавляет чат в активные.
+        
+        Args:
+            chat_id: ID чата
+        
+        Returns:
+            True, если чат не был активен
+        """
+        if chat_id in self.active_chats:
+            return False
+        self.active_chats.add(chat_id)
+        self._changed(chat_id)
+        return True
+    
+    def deactivate_chat(self, chat_id: int):
+        """
+        Удаляет чат из активных.
+        
+        Args:
+            chat_id: ID чата
+        """
+        if chat_id in self.active_chats:
+            self.active_chats.discard(chat_id)
+            self._changed(chat_id)
+    
+    def get_row(self, chat_id: int) -> Optional[Tuple[int, bool, bool, int, bool]]:
+        """
+        Возвращает состояние чата в виде строки для постоянного хранилища.
+        
+        Args:
+            chat_id: ID чата
+        
+        Returns:
+            (chat_id, активен, старт опубликован, маска кругов, финал опубликован)
+            или None, если о чате нечего хранить
+        """
+        state = self._states.get(chat_id)
+        is_active = chat_id in self.active_chats
+        if state is None:
+            return (chat_id, True, False, 0, False) if is_active else None
+        return (
+            chat_id,
+            is_active,
+            state.start_leaderboard_published,
+            state.published_laps,
+            state.final_leaderboard_published,
+        )
+    
+    def restore(self, rows: Iterable[Tuple[int, bool, bool, int, bool]]) -> int:
+        """
+        Восстанавливает состояния чатов из постоянного хранилища.
+        
+        Args:
+            rows: Строки в формате get_row
+        
+        Returns:
+            Количество восстановленных чатов
+        """
+        count = 0
+        for chat_id, is_active, start_published, laps_mask, final_published in rows:
+            state = ChatState(chat_id, on_change=self._changed)
+            state.start_leaderboard_published = start_published
+            state.published_laps = laps_mask
+            state.final_leaderboard_published = final_published
+            self._states[chat_id] = state
+            if is_active:
+                self.active_chats.add(chat_id)
+            count += 1
+        return count
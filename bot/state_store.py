@@ -0,0 +1,353 @@
+"""Постоянное хранилище состояния чатов и пользователей с отложенной записью."""
+import asyncio
+import sqlite3
+import threading
+from typing import Callable, Iterable, List, Optional, Set, Tuple
+
+from bot.logger import setup_logger
+
+logger = setup_logger()
+
+# Строка пользователя: (user_id, language, entity_type, entity_value, last_sent_lap, is_tracking)
+UserRow = Tuple[int, str, Optional[str], Optional[str], int, bool]
+# Строка чата: (chat_id, is_active, start_published, published_laps (битовая маска), final_published)
+ChatRow = Tuple[int, bool, bool, int, bool]
+
+
+def _encode_laps(mask: int) -> bytes:
+    """
+    Кодирует битовую маску опубликованных кругов для записи в базу.
+
+    INTEGER в SQLite - знаковое 64-битное число, а маска с кругом 63 и дальше
+    в него не помещается, поэтому маска хранится как BLOB (big-endian).
+    """
+    return mask.to_bytes((mask.bit_length() + 7) // 8, "big")
+
+
+def _decode_laps(value) -> int:
+    """Декодирует маску опубликованных кругов (BLOB или число в строках, записанных по умолчанию)."""
+    if isinstance(value, bytes):
+        return int.from_bytes(value, "big")
+    return value or 0
+
+
+class StateStore:
+    """
+    Интерфейс постоянного хранилища состояния.
+
+    Методы вызываются вне event loop (в потоке) и не чаще одного одновременно.
+    """
+
+    def load_users(self) -> List[UserRow]:
+        """Возвращает сохранённые состояния пользователей."""
+        raise NotImplementedError
+
+    def load_chats(self) -> List[ChatRow]:
+        """Возвращает сохранённые состояния чатов."""
+        raise NotImplementedError
+
+    def save(
+        self,
+        users: List[UserRow],
+        deleted_users: List[int],
+        chats: List[ChatRow],
+        deleted_chats: List[int],
+    ) -> None:
+        """
+        Сохраняет изменения одной транзакцией.
+
+        Args:
+            users: Изменённые или новые пользователи
+            deleted_users: ID удалённых пользователей
+            chats: Изменённые или новые чаты
+            deleted_chats: ID удалённых чатов
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Закрывает хранилище."""
+
+
+class SQLiteStateStore(StateStore):
+    """
+    Хранилище состояния в SQLite в режиме WAL.
+
+    Строки привязаны к гонке и её поколению (времени старта): отметки об
+    опубликованных кругах и last_sent_lap прошлой гонки не должны блокировать
+    рассылку новой. При открытии с новым поколением из прошлого переносятся
+    только активные чаты и язык пользователей, остальные строки удаляются.
+    """
+
+    def __init__(self, path: str, race_id: str, generation: str):
+        """
+        Открывает (и при необходимости создаёт) базу.
+
+        Args:
+            path: Путь к файлу базы
+            race_id: ID гонки
+            generation: Поколение гонки (время старта; пустая строка - не задано)
+        """
+        self.path = path
+        self.race_id = race_id
+        self.generation = generation
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # В режиме WAL NORMAL не теряет целостность, а fsync выполняется только при checkpoint
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._drop_legacy_tables()
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS users (
+                race_id TEXT NOT NULL,
+                generation TEXT NOT NULL,
+                user_id INTEGER NOT NULL,
+                language TEXT NOT NULL,
+                entity_type TEXT,
+                entity_value TEXT,
+                last_sent_lap INTEGER NOT NULL DEFAULT 0,
+                is_tracking INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (race_id, generation, user_id)
+            );
+            CREATE TABLE IF NOT EXISTS chats (
+                race_id TEXT NOT NULL,
+                generation TEXT NOT NULL,
+                chat_id INTEGER NOT NULL,
+                is_active INTEGER NOT NULL DEFAULT 0,
+                start_published INTEGER NOT NULL DEFAULT 0,
+                published_laps BLOB NOT NULL DEFAULT 0,
+                final_published INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (race_id, generation, chat_id)
+            );
+            """
+        )
+        self._conn.commit()
+        self._start_generation()
+
+    def _drop_legacy_tables(self) -> None:
+        """Удаляет таблицы прежнего формата без гонки и поколения (их строки нельзя отнести к гонке)."""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(users)")}
+        if columns and "generation" not in columns:
+            logger.warning(f"⚠️ {self.path}: состояние в прежнем формате без поколения гонки, оно будет сброшено")
+            with self._conn:
+                self._conn.execute("DROP TABLE IF EXISTS users")
+                self._conn.execute("DROP TABLE IF EXISTS chats")
+
+    def _start_generation(self) -> None:
+        """
+        Переносит из прошлых поколений гонки активные чаты и язык пользователей
+        (без отметок о доставке и отслеживания) и удаляет прошлые строки.
+        """
+        key = (self.generation, self.race_id, self.generation)
+        with self._lock, self._conn:
+            carried_chats = self._conn.execute(
+                "INSERT OR IGNORE INTO chats (race_id, generation, chat_id, is_active) "
+                "SELECT race_id, ?, chat_id, is_active FROM chats "
+                "WHERE race_id = ? AND generation != ? AND is_active",
+                key
+            ).rowcount
+            carried_users = self._conn.execute(
+                "INSERT OR IGNORE INTO users (race_id, generation, user_id, language) "
+                "SELECT race_id, ?, user_id, language FROM users WHERE race_id = ? AND generation != ?",
+                key
+            ).rowcount
+            for table in ("users", "chats"):
+                self._conn.execute(f"DELETE FROM {table} WHERE race_id = ? AND generation != ?", key[1:])
+        if carried_chats or carried_users:
+            logger.info(
+                f"💾 Новая гонка {self.race_id} (старт {self.generation or 'не задан'}): перенесено чатов "
+                f"{carried_chats}, языков пользователей {carried_users}, отметки о доставке сброшены"
+            )
+
+    def load_users(self) -> List[UserRow]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT user_id, language, entity_type, entity_value, last_sent_lap, is_tracking FROM users "
+                "WHERE race_id = ? AND generation = ?",
+                (self.race_id, self.generation)
+            ).fetchall()
+        return [(user_id, language, et, ev, last_sent_lap, bool(is_tracking))
+                for user_id, language, et, ev, last_sent_lap, is_tracking in rows]
+
+    def load_chats(self) -> List[ChatRow]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chat_id, is_active, start_published, published_laps, final_published FROM chats "
+                "WHERE race_id = ? AND generation = ?",
+                (self.race_id, self.generation)
+            ).fetchall()
+        return [
+            (chat_id, bool(is_active), bool(start_published), _decode_laps(published_laps), bool(final_published))
+            for chat_id, is_active, start_published, published_laps, final_published in rows
+        ]
+
+    def save(
+        self,
+        users: List[UserRow],
+        deleted_users: List[int],
+        chats: List[ChatRow],
+        deleted_chats: List[int],
+    ) -> None:
+        key = (self.race_id, self.generation)
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO users "
+                "(race_id, generation, user_id, language, entity_type, entity_value, last_sent_lap, is_tracking) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [key + tuple(row) for row in users]
+            )
+            self._conn.executemany(
+                "DELETE FROM users WHERE race_id = ? AND generation = ? AND user_id = ?",
+                [key + (user_id,) for user_id in deleted_users]
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chats "
+                "(race_id, generation, chat_id, is_active, start_published, published_laps, final_published) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    key + (chat_id, is_active, start_published, _encode_laps(published_laps), final_published)
+                    for chat_id, is_active, start_published, published_laps, final_published in chats
+                ]
+            )
+            self._conn.executemany(
+                "DELETE FROM chats WHERE race_id = ? AND generation = ? AND chat_id = ?",
+                [key + (chat_id,) for chat_id in deleted_chats]
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class StateWriter:
+    """
+    Отложенная (write-behind) запись состояния.
+
+    Менеджеры состояний только отмечают изменённые ID (без ввода-вывода),
+    а фоновая задача раз в interval секунд (или при накоплении batch_size
+    изменений) собирает актуальные строки и сохраняет их одной транзакцией
+    в потоке. Повторные изменения одного пользователя между сбросами
+    схлопываются в одну запись. При остановке выполняется последний сброс.
+    """
+
+    def __init__(
+        self,
+        store: StateStore,
+        user_row: Callable[[int], Optional[UserRow]],
+        chat_row: Callable[[int], Optional[ChatRow]],
+        interval: float,
+        batch_size: int,
+    ):
+        """
+        Инициализация записи.
+
+        Args:
+            store: Постоянное хранилище
+            user_row: Возвращает текущую строку пользователя (None - пользователь удалён)
+            chat_row: Возвращает текущую строку чата (None - чат удалён)
+            interval: Максимальная задержка записи в секундах
+            batch_size: Количество изменений, при котором запись начинается досрочно
+        """
+        self._store = store
+        self._user_row = user_row
+        self._chat_row = chat_row
+        self._interval = interval
+        self._batch_size = batch_size
+        self._dirty_users: Set[int] = set()
+        self._dirty_chats: Set[int] = set()
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.rows_written = 0
+        self.errors = 0
+
+    def mark_user(self, user_id: int) -> None:
+        """Отмечает, что состояние пользователя изменилось."""
+        self._dirty_users.add(user_id)
+        self._maybe_wake()
+
+    def mark_chat(self, chat_id: int) -> None:
+        """Отмечает, что состояние чата изменилось."""
+        self._dirty_chats.add(chat_id)
+        self._maybe_wake()
+
+    def _maybe_wake(self) -> None:
+        """Будит фоновую задачу, если накопилось достаточно изменений."""
+        if len(self._dirty_users) + len(self._dirty_chats) >= self._batch_size:
+            self._wakeup.set()
+
+    @property
+    def pending(self) -> int:
+        """Количество изменений, ожидающих записи."""
+        return len(self._dirty_users) + len(self._dirty_chats)
+
+    async def flush(self) -> None:
+        """Записывает накопленные изменения."""
+        async with self._flush_lock:
+            if not self._dirty_users and not self._dirty_chats:
+                return
+            user_ids, self._dirty_users = self._dirty_users, set()
+            chat_ids, self._dirty_chats = self._dirty_chats, set()
+
+            # Строки собираются в event loop: это снимок состояния на момент сброса
+            users, deleted_users = self._collect(user_ids, self._user_row)
+            chats, deleted_chats = self._collect(chat_ids, self._chat_row)
+            try:
+                await asyncio.to_thread(self._store.save, users, deleted_users, chats, deleted_chats)
+            except Exception as e:
+                # Изменения вернутся в очередь и будут записаны при следующем сбросе
+                self.errors += 1
+                self._dirty_users |= user_ids
+                self._dirty_chats |= chat_ids
+                logger.error(f"❌ Ошибка записи состояния: {e}", exc_info=True)
+                return
+            self.flushes += 1
+            self.rows_written += len(user_ids) + len(chat_ids)
+
+    @staticmethod
+    def _collect(ids: Iterable[int], get_row: Callable[[int], Optional[tuple]]) -> Tuple[List[tuple], List[int]]:
+        """Разделяет изменённые ID на актуальные строки и удалённые ID."""
+        rows, deleted = [], []
+        for item_id in ids:
+            row = get_row(item_id)
+            if row is None:
+                deleted.append(item_id)
+            else:
+                rows.append(row)
+        return rows, deleted
+
+    async def _run(self) -> None:
+        """Фоновый цикл сброса изменений."""
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self) -> None:
+        """Запускает фоновую запись."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает фоновую запись и сохраняет оставшиеся изменения."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def get_stats(self) -> dict:
+        """Возвращает счётчики записи."""
+        return {
+            "pending": self.pending,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "errors": self.errors,
+        }
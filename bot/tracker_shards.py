@@ -0,0 +1,349 @@
+"""Формирование персональных лидерборд в процессах-шардах."""
+import asyncio
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from bot.leaderboard import render_user_leaderboard
+from bot.logger import setup_logger
+from bot.race_data import RaceSnapshot
+from bot.snapshot_file import read_snapshot, write_snapshot
+
+logger = setup_logger()
+
+# Ключ текста персональной лидерборды: (тип сущности, значение, язык)
+GroupKey = Tuple[str, str, str]
+
+# Сколько отображённых снимков держит каждый процесс (по одному на гонку с запасом)
+WORKER_SNAPSHOTS = 4
+
+# Как часто (в секундах) при ожидании текстов проверяется, что процессы живы
+WORKER_CHECK_INTERVAL = 0.5
+
+
+def _worker_main(jobs: Any, results: Any) -> None:
+    """
+    Цикл процесса-шарда: берёт задания из своей очереди и возвращает тексты.
+
+    Задание: (id, путь к бинарному снимку, круг, ключи групп). Снимок
+    отображается через mmap один раз на версию, поэтому между процессами
+    передаются только ключи и готовые тексты.
+    """
+    snapshots: "OrderedDict[str, Any]" = OrderedDict()
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        job_id, snapshot_path, lap_number, keys = job
+        try:
+            standings = snapshots.get(snapshot_path)
+            if standings is None:
+                standings = read_snapshot(snapshot_path)
+                if standings is None:
+                    raise RuntimeError(f"Снимок {snapshot_path} недоступен")
+                snapshots[snapshot_path] = standings
+                while len(snapshots) > WORKER_SNAPSHOTS:
+                    snapshots.popitem(last=False)
+            texts = [
+                render_user_leaderboard(standings, lap_number, entity_type, entity_value, language)
+                for entity_type, entity_value, language in keys
+            ]
+        except Exception as e:
+            results.put((job_id, None, f"{type(e).__name__}: {e}"))
+        else:
+            results.put((job_id, texts, None))
+
+
+class TrackerShardPool:
+    """
+    Пул процессов, формирующих персональные лидерборды.
+
+    Отслеживающие пользователи распределяются по шардам по хешу user_id;
+    каждый шард формирует тексты для групп (сущность, язык) своих
+    пользователей, текст группы, нужной нескольким шардам, формирует один
+    из них. Процессы получают задания через локальные очереди
+    multiprocessing, а снимок данных - через бинарный файл (mmap), который
+    пишется один раз на версию снимка.
+
+    Отправка остаётся в общем BroadcastEngine: лимит Telegram на сообщения
+    в секунду общий для бота, поэтому шарды разгружают только отрисовку.
+
+    Если процесс завершился (OOM, kill) или не уложился в таймаут, его
+    задания завершаются ошибкой, а процесс перезапускается; вызывающий
+    формирует тексты в event loop.
+    """
+
+    def __init__(self, workers: int):
+        """
+        Инициализация пула (процессы запускаются в start()).
+
+        Args:
+            workers: Количество процессов-шардов
+        """
+        self.workers = workers
+        self._processes: List[Any] = []
+        self._job_queues: List[Any] = []
+        self._results: Any = None
+        self._collector: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        # Шард, выполняющий задание: id задания -> номер шарда
+        self._job_shards: Dict[int, int] = {}
+        self._next_job_id = 0
+        self._snapshot_dir: Optional[str] = None
+        # Выгруженные для процессов снимки: гонка -> (версия, путь)
+        self._exported: Dict[str, Tuple[int, str]] = {}
+        self._export_lock = asyncio.Lock()
+        self.jobs = 0
+        self.rendered = 0
+        self.errors = 0
+        self.restarts = 0
+
+    def shard_of(self, user_id: int) -> int:
+        """Возвращает номер шарда пользователя."""
+        return hash(user_id) % self.workers
+
+    def start(self) -> None:
+        """Запускает процессы-шарды и сборщик результатов."""
+        if self._processes:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._snapshot_dir = tempfile.mkdtemp(prefix="race_shards_")
+        self._results = multiprocessing.Queue()
+        for shard in range(self.workers):
+            jobs, process = self._spawn_worker(shard)
+            self._job_queues.append(jobs)
+            self._processes.append(process)
+        self._collector = threading.Thread(target=self._collect, name="tracker-shard-results", daemon=True)
+        self._collector.start()
+        logger.info(f"🧩 Запущено процессов-шардов персональных лидерборд: {self.workers}")
+
+    def _spawn_worker(self, shard: int) -> Tuple[Any, Any]:
+        """Запускает процесс шарда со своей очередью заданий."""
+        jobs = multiprocessing.Queue()
+        process = multiprocessing.Process(
+            target=_worker_main, args=(jobs, self._results), name=f"tracker-shard-{shard}", daemon=True
+        )
+        process.start()
+        return jobs, process
+
+    async def _restart_worker(self, shard: int, reason: str) -> None:
+        """
+        Перезапускает процесс шарда; его незавершённые задания завершаются ошибкой.
+
+        Args:
+            shard: Номер шарда
+            reason: Причина (для лога и ошибки заданий)
+        """
+        process = self._processes[shard]
+        if process.is_alive():
+            process.kill()
+        await asyncio.to_thread(process.join, 5)
+        self._fail_jobs([job_id for job_id, job_shard in self._job_shards.items() if job_shard == shard], reason)
+        self._job_queues[shard], self._processes[shard] = self._spawn_worker(shard)
+        self.restarts += 1
+        logger.error(f"❌ Процесс-шард {shard}: {reason}, процесс перезапущен")
+
+    def _fail_jobs(self, job_ids: Sequence[int], reason: str) -> None:
+        """Завершает ожидание заданий ошибкой (их результаты, если придут, игнорируются)."""
+        for job_id in job_ids:
+            self._job_shards.pop(job_id, None)
+            future = self._pending.pop(job_id, None)
+            if future is not None and not future.done():
+                future.set_exception(RuntimeError(reason))
+
+    def _abandon_jobs(self, job_ids: Sequence[int]) -> None:
+        """Отменяет ожидание заданий, результат которых больше не нужен."""
+        for job_id in job_ids:
+            self._job_shards.pop(job_id, None)
+            future = self._pending.pop(job_id, None)
+            if future is not None:
+                future.cancel()
+
+    async def stop(self) -> None:
+        """Останавливает процессы-шарды и удаляет выгруженные снимки."""
+        if not self._processes:
+            return
+        for jobs in self._job_queues:
+            jobs.put(None)
+        for process in self._processes:
+            await asyncio.to_thread(process.join, 5)
+            if process.is_alive():
+                process.terminate()
+        # Останавливаем сборщик результатов
+        self._results.put(None)
+        await asyncio.to_thread(self._collector.join, 5)
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(RuntimeError("Пул процессов-шардов остановлен"))
+        self._pending.clear()
+        self._job_shards.clear()
+        self._processes.clear()
+        self._job_queues.clear()
+        self._exported.clear()
+        shutil.rmtree(self._snapshot_dir, ignore_errors=True)
+
+    def _collect(self) -> None:
+        """Поток, передающий результаты процессов в event loop."""
+        while True:
+            item = self._results.get()
+            if item is None:
+                break
+            self._loop.call_soon_threadsafe(self._resolve, *item)
+
+    def _resolve(self, job_id: int, texts: Optional[List[str]], error: Optional[str]) -> None:
+        """Завершает ожидание задания (в event loop)."""
+        self._job_shards.pop(job_id, None)
+        future = self._pending.pop(job_id, None)
+        if future is None or future.done():
+            return
+        if error is not None:
+            future.set_exception(RuntimeError(error))
+        else:
+            future.set_result(texts)
+
+    async def _export_snapshot(self, race_id: str, snapshot: RaceSnapshot) -> str:
+        """
+        Возвращает путь к бинарному снимку версии для процессов, записывая его при первом обращении.
+
+        Прежний файл гонки удаляется: процессы, уже отобразившие его, продолжают
+        читать свои страницы до перехода на новую версию.
+        """
+        async with self._export_lock:
+            exported = self._exported.get(race_id)
+            if exported is not None and exported[0] == snapshot.version:
+                return exported[1]
+            path = os.path.join(self._snapshot_dir, f"{race_id}.{snapshot.version}.snapshot")
+            written = await asyncio.to_thread(
+                write_snapshot, snapshot.standings, path, f"{race_id}:{snapshot.version}"
+            )
+            if not written:
+                raise RuntimeError("Данные снимка нельзя сохранить в бинарном виде")
+            self._exported[race_id] = (snapshot.version, path)
+            if exported is not None:
+                try:
+                    os.remove(exported[1])
+                except OSError:
+                    pass
+            return path
+
+    def partition(self, groups: Mapping[GroupKey, Sequence[Any]]) -> List[List[GroupKey]]:
+        """
+        Распределяет группы по шардам.
+
+        Группа достаётся шарду её первого пользователя (по хешу user_id),
+        поэтому каждый текст формируется ровно одним процессом.
+
+        Args:
+            groups: Группы (сущность, язык) -> состояния пользователей
+
+        Returns:
+            Ключи групп для каждого шарда
+        """
+        shards: List[List[GroupKey]] = [[] for _ in range(self.workers)]
+        for key, user_states in groups.items():
+            shard = self.shard_of(user_states[0].user_id) if user_states else 0
+            shards[shard].append(key)
+        return shards
+
+    async def render(
+        self,
+        race_id: str,
+        snapshot: RaceSnapshot,
+        lap_number: int,
+        groups: Mapping[GroupKey, Sequence[Any]],
+        timeout: float,
+    ) -> Dict[GroupKey, str]:
+        """
+        Формирует персональные лидерборды групп в процессах-шардах.
+
+        Args:
+            race_id: ID гонки
+            snapshot: Снимок данных гонки
+            lap_number: Номер круга
+            groups: Группы (сущность, язык) -> состояния пользователей
+            timeout: Сколько секунд ждать тексты
+
+        Returns:
+            Тексты по ключам групп
+
+        Raises:
+            RuntimeError: Если пул не запущен или процесс не смог сформировать тексты (в том числе завершился)
+            asyncio.TimeoutError: Если процессы не уложились в timeout (зависшие процессы перезапускаются)
+        """
+        if not self._processes:
+            raise RuntimeError("Пул процессов-шардов не запущен")
+        for shard, process in enumerate(self._processes):
+            if not process.is_alive():
+                await self._restart_worker(shard, f"процесс завершился (код {process.exitcode})")
+        snapshot_path = await self._export_snapshot(race_id, snapshot)
+
+        shard_keys, futures, job_ids = [], [], []
+        for shard, keys in enumerate(self.partition(groups)):
+            if not keys:
+                continue
+            shard_keys.append(keys)
+            job_id = self._next_job_id
+            self._next_job_id += 1
+            future = self._loop.create_future()
+            self._pending[job_id] = future
+            self._job_shards[job_id] = shard
+            self._job_queues[shard].put((job_id, snapshot_path, lap_number, keys))
+            futures.append(future)
+            job_ids.append(job_id)
+        self.jobs += len(futures)
+
+        try:
+            await self._wait_jobs(futures, job_ids, timeout)
+        except Exception:
+            self.errors += 1
+            # Остальные задания этого вызова больше не нужны
+            self._abandon_jobs(job_ids)
+            raise
+        texts: Dict[GroupKey, str] = {}
+        for keys, future in zip(shard_keys, futures):
+            texts.update(zip(keys, future.result()))
+        self.rendered += len(texts)
+        return texts
+
+    async def _wait_jobs(self, futures: List[asyncio.Future], job_ids: List[int], timeout: float) -> None:
+        """
+        Ждёт завершения заданий, проверяя, что их процессы живы.
+
+        Raises:
+            RuntimeError: Если задание завершилось ошибкой или его процесс завершился
+            asyncio.TimeoutError: Если задания не завершились за timeout
+        """
+        deadline = self._loop.time() + timeout
+        waiting = set(futures)
+        while waiting:
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                # Процессы с незавершёнными заданиями зависли: перезапускаем их
+                stuck = {self._job_shards[job_id] for job_id in job_ids if job_id in self._job_shards}
+                self._abandon_jobs(job_ids)
+                for shard in stuck:
+                    await self._restart_worker(shard, f"не уложился в {timeout:g} сек")
+                raise asyncio.TimeoutError(f"Процессы-шарды {sorted(stuck)} не уложились в {timeout:g} сек")
+            done, waiting = await asyncio.wait(waiting, timeout=min(remaining, WORKER_CHECK_INTERVAL))
+            errors = [future.exception() for future in done if future.exception() is not None]
+            if errors:
+                raise errors[0]
+            for shard in {self._job_shards[job_id] for job_id in job_ids if job_id in self._job_shards}:
+                process = self._processes[shard]
+                if not process.is_alive():
+                    await self._restart_worker(shard, f"процесс завершился (код {process.exitcode})")
+
+    def get_stats(self) -> Dict[str, int]:
+        """Возвращает счётчики пула."""
+        return {
+            "workers": self.workers,
+            "jobs": self.jobs,
+            "rendered": self.rendered,
+            "errors": self.errors,
+            "restarts": self.restarts,
+        }
@@ -2,17 +2,21 @@
 from typing import Optional, Dict, Any, Tuple
 from bot.api_client import RaceDataClient
 from bot.logger import setup_logger
+from bot.standings import StandingsIndex
 
 logger = setup_logger()
 
 
-def validate_user_identifier(data: list[Dict[str, Any]], user_input: str) -> Optional[Tuple[str, str, Dict[str, Any]]]:
+def validate_user_identifier(
+    user_input: str,
+    standings: StandingsIndex
+) -> Optional[Tuple[str, str, Dict[str, Any]]]:
     """
     Валидирует ввод пользователя и находит соответствующую сущность.
     
     Args:
-        data: Список всех участников гонки
         user_input: Ввод пользователя (кошелёк или название команды)
+        standings: Индекс снимка данных (поиск идёт по хеш-индексу за O(1))
     
     Returns:
         Кортеж (entity_type, entity_value, participant_data) или None, если не найдено
@@ -35,43 +39,14 @@ def validate_user_identifier(data: list[Dict[str, Any]], user_input: str) -> Opt
     
     if is_account:
         # Ищем по полю "user" (кошелёк) - только точное совпадение
-        for participant in data:
-            user_field = participant.get('user', '')
-            if user_field.lower() == user_input.lower():
-                return ("account", user_field, participant)
+        participant = standings.find_participant("account", user_input)
+        if participant is not None:
+            return ("account", participant.get('user', ''), participant)
     
     # Ищем по названию команды - только точное совпадение
-    for participant in data:
-        team_name = participant.get('team_name', '')
-        if team_name.lower() == user_input.lower():
-            return ("team", team_name, participant)
-    
-    return None
-
-
-def find_user_position(leaderboard: list[Dict[str, Any]], entity_type: str, entity_value: str) -> Optional[Tuple[int, int]]:
-    """
-    Находит позицию пользователя в лидерборде.
-    
-    Args:
-        leaderboard: Список участников, отсортированных по позиции
-        entity_type: Тип сущности ("account" или "team")
-        entity_value: Значение (кошелёк или название команды)
-    
-    Returns:
-        Кортеж (позиция, индекс) или None, если не найдено
-        позиция: позиция в лидерборде (1-based)
-        индекс: индекс в массиве (0-based)
-    """
-    for idx, participant in enumerate(leaderboard):
-        if entity_type == "account":
-            # Ищем по кошельку
-            if participant.get('user', '').lower() == entity_value.lower():
-                return (idx + 1, idx)
-        elif entity_type == "team":
-            # Ищем по названию команды
-            if participant.get('team_name', '').lower() == entity_value.lower():
-                return (idx + 1, idx)
+    participant = standings.find_participant("team", user_input)
+    if participant is not None:
+        return ("team", participant.get('team_name', ''), participant)
     
     return None
 
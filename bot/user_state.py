@@ -1,25 +1,101 @@
 """Управление состоянием пользователей (user-mode)."""
-from typing import Dict, Optional
-from dataclasses import dataclass, field
+import sys
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+# Ключ отслеживаемой сущности: (тип, значение)
+EntityKey = Tuple[str, str]
 
 
-@dataclass
 class UserState:
-    """Состояние пользователя для отслеживания."""
-    user_id: int
-    language: str = "ru"  # Язык интерфейса
-    entity_type: Optional[str] = None  # "account" или "team"
-    entity_value: Optional[str] = None  # Значение (кошелёк или название команды)
-    last_sent_lap: int = 0  # Последний отправленный круг
-    is_tracking: bool = False  # Активно ли отслеживание
+    """
+    Состояние пользователя для отслеживания.
+    
+    Объект без __dict__ (__slots__): при сотнях тысяч пользователей это
+    заметно сокращает память на каждого.
+    """
+    
+    __slots__ = ("user_id", "language", "entity_type", "entity_value", "last_sent_lap", "is_tracking")
+    
+    def __init__(
+        self,
+        user_id: int,
+        language: str = "ru",
+        entity_type: Optional[str] = None,
+        entity_value: Optional[str] = None,
+        last_sent_lap: int = 0,
+        is_tracking: bool = False,
+    ):
+        """
+        Инициализация состояния пользователя.
+        
+        Args:
+            user_id: ID пользователя
+            language: Язык интерфейса
+            entity_type: "account" или "team"
+            entity_value: Значение (кошелёк или название команды)
+            last_sent_lap: Последний отправленный круг
+            is_tracking: Активно ли отслеживание
+        """
+        self.user_id = user_id
+        self.language = language
+        self.entity_type = entity_type
+        self.entity_value = entity_value
+        self.last_sent_lap = last_sent_lap
+        self.is_tracking = is_tracking
+    
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"UserState({fields})"
 
 
 class UserStateManager:
-    """Менеджер состояний пользователей."""
+    """
+    Менеджер состояний пользователей.
+    
+    Кроме словаря всех состояний поддерживает вторичные индексы активных
+    отслеживаний: по сущности (кошелёк/команда) и по последнему отправленному
+    кругу. Рассылка круга обходит только отслеживающих пользователей, которым
+    этот круг ещё не отправлен, а не всех пользователей, когда-либо писавших боту.
+    Поэтому все изменения полей состояния должны идти через методы менеджера.
+    """
     
     def __init__(self):
         """Инициализация менеджера состояний."""
         self._states: Dict[int, UserState] = {}
+        # Активные отслеживания: user_id -> состояние
+        self._trackers: Dict[int, UserState] = {}
+        # Отслеживающие по сущности: (тип, значение) -> user_id
+        self._by_entity: Dict[EntityKey, Set[int]] = {}
+        # Отслеживающие по последнему отправленному кругу: круг -> user_id
+        self._by_last_sent_lap: Dict[int, Set[int]] = {}
+        # Обработчик изменений (подключается хранилищем состояния)
+        self.on_change: Optional[Callable[[int], None]] = None
+    
+    def _changed(self, user_id: int):
+        """Сообщает об изменении состояния пользователя."""
+        if self.on_change is not None:
+            self.on_change(user_id)
+    
+    def _index(self, state: UserState):
+        """Добавляет состояние во вторичные индексы, если отслеживание активно."""
+        if not (state.is_tracking and state.entity_type and state.entity_value):
+            return
+        self._trackers[state.user_id] = state
+        self._by_entity.setdefault((state.entity_type, state.entity_value), set()).add(state.user_id)
+        self._by_last_sent_lap.setdefault(state.last_sent_lap, set()).add(state.user_id)
+    
+    def _unindex(self, state: UserState):
+        """Удаляет состояние из вторичных индексов."""
+        if self._trackers.pop(state.user_id, None) is None:
+            return
+        for index, key in (
+            (self._by_entity, (state.entity_type, state.entity_value)),
+            (self._by_last_sent_lap, state.last_sent_lap),
+        ):
+            user_ids = index[key]
+            user_ids.discard(state.user_id)
+            if not user_ids:
+                del index[key]
     
     def get_state(self, user_id: int) -> UserState:
         """
@@ -45,6 +121,7 @@ class UserStateManager:
         """
         state = self.get_state(user_id)
         state.language = language
+        self._changed(user_id)
     
     def set_tracked_entity(self, user_id: int, entity_type: str, entity_value: str):
         """
@@ -56,8 +133,63 @@ class UserStateManager:
             entity_value: Значение (кошелёк или название команды)
         """
         state = self.get_state(user_id)
+        self._unindex(state)
         state.entity_type = entity_type
         state.entity_value = entity_value
+        self._index(state)
+        self._changed(user_id)
+    
+    def start_tracking(self, user_id: int, entity_type: str, entity_value: str):
+        """
+        Включает отслеживание сущности с первого круга.
+        
+        Args:
+            user_id: ID пользователя
+            entity_type: Тип сущности ("account" или "team")
+            entity_value: Значение (кошелёк или название команды)
+        """
+        state = self.get_state(user_id)
+        self._unindex(state)
+        state.entity_type = entity_type
+        state.entity_value = entity_value
+        state.is_tracking = True
+        state.last_sent_lap = 0  # Сбрасываем счётчик отправленных кругов
+        self._index(state)
+        self._changed(user_id)
+    
+    def mark_lap_sent(self, user_id: int, lap_number: int):
+        """
+        Отмечает, что пользователю отправлено обновление за круг.
+        
+        Args:
+            user_id: ID пользователя
+            lap_number: Номер круга
+        """
+        state = self._states.get(user_id)
+        # Повтор старого круга не должен откатывать счётчик назад
+        if state is not None and lap_number > state.last_sent_lap:
+            self._unindex(state)
+            state.last_sent_lap = lap_number
+            self._index(state)
+            self._changed(user_id)
+    
+    def stop_tracking(self, user_id: int) -> bool:
+        """
+        Останавливает отслеживание для пользователя.
+        
+        Args:
+            user_id: ID пользователя
+        
+        Returns:
+            True, если отслеживание было активно
+        """
+        state = self._states.get(user_id)
+        if state is None or not state.is_tracking:
+            return False
+        self._unindex(state)
+        state.is_tracking = False
+        self._changed(user_id)
+        return True
     
     def reset_state(self, user_id: int):
         """
@@ -67,5 +199,119 @@ class UserStateManager:
             user_id: ID пользователя
         """
         if user_id in self._states:
-            del self._states[user_id]
-
+            self._unindex(self._states.pop(user_id))
+            self._changed(user_id)
+    
+    def get_row(self, user_id: int) -> Optional[Tuple[int, str, Optional[str], Optional[str], int, bool]]:
+        """
+        Возвращает состояние пользователя в виде строки для постоянного хранилища.
+        
+        Args:
+            user_id: ID пользователя
+        
+        Returns:
+            (user_id, язык, тип сущности, значение, последний круг, отслеживание)
+            или None, если состояние удалено
+        """
+        state = self._states.get(user_id)
+        if state is None:
+            return None
+        return (
+            user_id,
+            state.language,
+            state.entity_type,
+            state.entity_value,
+            state.last_sent_lap,
+            state.is_tracking,
+        )
+    
+    def restore(self, rows: Iterable[Tuple[int, str, Optional[str], Optional[str], int, bool]]) -> int:
+        """
+        Восстанавливает состояния пользователей из постоянного хранилища.
+        
+        Args:
+            rows: Строки в формате get_row
+        
+        Returns:
+            Количество восстановленных пользователей
+        """
+        count = 0
+        for user_id, language, entity_type, entity_value, last_sent_lap, is_tracking in rows:
+            if user_id in self._states:
+                self._unindex(self._states[user_id])
+            # Строки из хранилища - отдельные объекты на каждую строку; интернируем,
+            # чтобы пользователи с одинаковой сущностью делили одну строку
+            state = UserState(
+                user_id=user_id,
+                language=sys.intern(language),
+                entity_type=entity_type and sys.intern(entity_type),
+                entity_value=entity_value and sys.intern(entity_value),
+                last_sent_lap=last_sent_lap,
+                is_tracking=is_tracking,
+            )
+            self._states[user_id] = state
+            self._index(state)
+            count += 1
+        return count
+    
+    @property
+    def tracker_count(self) -> int:
+        """Количество пользователей с активным отслеживанием."""
+        return len(self._trackers)
+    
+    def get_trackers(self) -> List[UserState]:
+        """Возвращает состояния пользователей с активным отслеживанием."""
+        return list(self._trackers.values())
+    
+    def get_entity_trackers(self, entity_type: str, entity_value: str) -> Set[int]:
+        """
+        Возвращает ID пользователей, отслеживающих сущность.
+        
+        Args:
+            entity_type: Тип сущности ("account" или "team")
+            entity_value: Значение (кошелёк или название команды)
+        """
+        return set(self._by_entity.get((entity_type, entity_value), ()))
+    
+    def get_pending_trackers(self, lap_number: int) -> List[UserState]:
+        """
+        Возвращает отслеживающих пользователей, которым ещё не отправлен круг.
+        
+        Обходятся только группы индекса с last_sent_lap < lap_number
+        (групп не больше, чем кругов в гонке).
+        
+        Args:
+            lap_number: Номер круга
+        
+        Returns:
+            Состояния пользователей
+        """
+        trackers = self._trackers
+        return [
+            trackers[user_id]
+            for last_sent_lap, user_ids in self._by_last_sent_lap.items() if last_sent_lap < lap_number
+            for user_id in user_ids
+        ]
+    
+    def get_pending_groups(self, lap_number: int) -> Dict[Tuple[str, str, str], List[UserState]]:
+        """
+        Группирует ожидающих круг пользователей по одинаковому тексту обновления.
+        
+        Персональная лидерборда зависит только от сущности и языка, поэтому
+        все пользователи группы получают один и тот же отрисованный текст.
+        
+        Args:
+            lap_number: Номер круга
+        
+        Returns:
+            Словарь (тип сущности, значение, язык) -> состояния пользователей
+        """
+        groups: Dict[Tuple[str, str, str], List[UserState]] = {}
+        for state in self.get_pending_trackers(lap_number):
+            key = (state.entity_type, state.entity_value, state.language)
+            group = groups.get(key)
+            if group is None:
+                groups[key] = [state]
+            else:
+                group.append(state)
+        return groups
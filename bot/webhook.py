@@ -0,0 +1,161 @@
+"""Приём обновлений через webhook (aiohttp) вместо long polling."""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from bot.logger import setup_logger
+
+logger = setup_logger()
+
+# Сколько последних задержек обработки хранится для перцентилей
+LATENCY_WINDOW = 10000
+
+# Через сколько секунд Telegram стоит повторить доставку отклонённого обновления
+RETRY_AFTER_SECONDS = 1
+
+
+class WebhookRequestHandler(SimpleRequestHandler):
+    """
+    Обработчик webhook с ограничением нагрузки.
+
+    Telegram получает ответ сразу, обновление обрабатывается в фоне.
+    Одновременно обрабатывается не больше max_concurrency обновлений,
+    остальные принятые ждут своей очереди. Если принятых, но не
+    обработанных обновлений уже max_pending, запрос отклоняется с 503:
+    Telegram повторит доставку позже, поэтому всплеск не теряет обновления
+    и не растит очередь в памяти без ограничения.
+    """
+
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        bot: Bot,
+        secret_token: Optional[str] = None,
+        max_concurrency: int = 64,
+        max_pending: int = 1000,
+        **data: Any
+    ):
+        """
+        Инициализация обработчика.
+
+        Args:
+            dispatcher: Диспетчер aiogram
+            bot: Бот
+            secret_token: Секрет из заголовка X-Telegram-Bot-Api-Secret-Token (None - не проверять)
+            max_concurrency: Максимум одновременно обрабатываемых обновлений
+            max_pending: Максимум принятых, но не обработанных обновлений
+        """
+        super().__init__(dispatcher, bot, handle_in_background=True, secret_token=secret_token, **data)
+        self.max_pending = max_pending
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.accepted = 0
+        self.rejected = 0
+        self.handled = 0
+        self.errors = 0
+        self.max_depth = 0
+        # Время от приёма до завершения обработки последних обновлений, в секундах
+        self.latencies: "deque[float]" = deque(maxlen=LATENCY_WINDOW)
+
+    @property
+    def depth(self) -> int:
+        """Количество принятых, но ещё не обработанных обновлений."""
+        return len(self._background_feed_update_tasks)
+
+    async def _handle_request_background(self, bot: Bot, request: web.Request) -> web.Response:
+        if self.depth >= self.max_pending:
+            self.rejected += 1
+            return web.Response(
+                status=503, text="Overloaded", headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+            )
+        self.accepted += 1
+        response = await super()._handle_request_background(bot, request)
+        self.max_depth = max(self.max_depth, self.depth)
+        return response
+
+    async def _background_feed_update(self, bot: Bot, update: Dict[str, Any]) -> None:
+        started = time.monotonic()
+        async with self._semaphore:
+            try:
+                await super()._background_feed_update(bot, update)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"❌ Ошибка при обработке обновления {update.get('update_id')}: {e}", exc_info=True)
+                return
+        self.handled += 1
+        self.latencies.append(time.monotonic() - started)
+
+    async def close(self) -> None:
+        """Дожидается обработки принятых обновлений (сессию бота закрывает main)."""
+        if self._background_feed_update_tasks:
+            await asyncio.gather(*self._background_feed_update_tasks, return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает счётчики приёма и обработки и задержку p50/p99 в секундах."""
+        latencies = sorted(self.latencies)
+
+        def percentile(percent: float) -> float:
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(len(latencies) * percent / 100))]
+
+        return {
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "handled": self.handled,
+            "errors": self.errors,
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "p50": percentile(50),
+            "p99": percentile(99),
+        }
+
+
+async def start_webhook_server(
+    dispatcher: Dispatcher,
+    bot: Bot,
+    path: str,
+    host: str,
+    port: int,
+    secret_token: Optional[str] = None,
+    max_concurrency: int = 64,
+    max_pending: int = 1000,
+    **data: Any
+) -> Tuple[web.AppRunner, "WebhookRequestHandler"]:
+    """
+    Запускает aiohttp-сервер, принимающий обновления на path.
+
+    Регистрация webhook в Telegram (set_webhook) выполняется отдельно.
+
+    Args:
+        dispatcher: Диспетчер aiogram
+        bot: Бот
+        path: Путь webhook
+        host: Адрес, на котором слушает сервер
+        port: Порт
+        secret_token: Секрет webhook (None - не проверять)
+        max_concurrency: Максимум одновременно обрабатываемых обновлений
+        max_pending: Максимум принятых, но не обработанных обновлений
+
+    Returns:
+        (runner для остановки через runner.cleanup(), обработчик со статистикой)
+    """
+    app = web.Application()
+    handler = WebhookRequestHandler(
+        dispatcher,
+        bot,
+        secret_token=secret_token,
+        max_concurrency=max_concurrency,
+        max_pending=max_pending,
+        **data
+    )
+    handler.register(app, path=path)
+    setup_application(app, dispatcher, bot=bot, **data)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner, handler
@@ -0,0 +1,6 @@
+"""Общие настройки тестов."""
+import os
+
+# Настройки бота требуют BOT_TOKEN; состояние в тестах не пишется в bot_state.db
+os.environ.setdefault("BOT_TOKEN", "0:test")
+os.environ["STATE_DB_PATH"] = ""
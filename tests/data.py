@@ -0,0 +1,50 @@
+"""Синтетические данные гонки для тестов."""
+from typing import List, Dict, Any
+
+TOTAL_LAPS = 12
+
+
+def make_participants(count: int, total_laps: int = TOTAL_LAPS, shift: int = 0) -> List[Dict[str, Any]]:
+    """
+    Строит участников в формате race_2_results.json с детерминированными позициями.
+
+    На каждом круге порядок сдвигается по кругу на единицу (плюс shift на
+    последнем круге), так что позиции меняются на каждом круге.
+
+    Args:
+        count: Количество участников
+        total_laps: Количество кругов
+        shift: Дополнительный сдвиг позиций на последнем круге
+    """
+    participants = []
+    for idx in range(count):
+        participant = {"user": f"user{idx}.near", "team_name": f"Team {idx}", "start_position": idx + 1}
+        for lap_number in range(1, total_laps + 1):
+            offset = lap_number + (shift if lap_number == total_laps else 0)
+            participant[f"lap{lap_number}"] = (idx + offset) % count + 1
+        participants.append(participant)
+    return participants
+
+
+# Небольшая гонка с известным результатом: повторяющееся название команды (Red),
+# кошелёк в смешанном регистре и пропущенный круг (у dave.near нет lap2)
+SAMPLE_RACE = {
+    # кошелёк: (команда, старт, позиции на кругах 1..12, None - нет позиции)
+    "Alice.near": ("Red", 1, [2, 1, 3, 3, 2, 1, 1, 2, 3, 1, 2, 3]),
+    "bob.near": ("Blue", 2, [1, 3, 1, 1, 1, 2, 3, 1, 1, 2, 1, 1]),
+    "carol.near": ("Red", 3, [3, 2, 2, 2, 3, 3, 2, 3, 2, 3, 3, 2]),
+    "dave.near": ("Green", 4, [4, None, 4, 5, 4, 4, 5, 4, 5, 4, 4, 5]),
+    "eve.near": ("Black", 5, [5, 4, 5, 4, 5, 5, 4, 5, 4, 5, 5, 4]),
+}
+
+
+def sample_participants() -> List[Dict[str, Any]]:
+    """Участники SAMPLE_RACE в формате race_2_results.json (id - порядок в словаре)."""
+    participants = []
+    for user, (team_name, start_position, laps) in SAMPLE_RACE.items():
+        participant = {"user": user, "team_name": team_name, "start_position": start_position}
+        for lap_number, position in enumerate(laps, 1):
+            if position is not None:
+                participant[f"lap{lap_number}"] = position
+        participants.append(participant)
+    return participants
@@ -0,0 +1,81 @@
+"""Тесты допуска запросов в личных сообщениях."""
+import asyncio
+
+import pytest
+
+from bot.admission import AdmissionController, ADMITTED, DUPLICATE, SHED, SHED_QUIET
+
+
+async def process(controller: AdmissionController, user_id: int, sequence: int, done: list, tag: str) -> None:
+    """Обрабатывает принятый запрос и отмечает, если он не вытеснен."""
+    async with controller.processing(user_id, sequence) as current:
+        if current:
+            await asyncio.sleep(0.01)
+            done.append(tag)
+
+
+def test_repeated_text_is_duplicate_while_pending():
+    controller = AdmissionController(max_pending=10, max_concurrency=1, busy_reply_window=5)
+
+    assert controller.admit(1, "Team A")[0] == ADMITTED
+    assert controller.admit(1, "  team a ") == (DUPLICATE, 0)
+    # Другой пользователь с тем же текстом - не дубликат
+    assert controller.admit(2, "Team A")[0] == ADMITTED
+    assert controller.get_stats()["duplicates"] == 1
+
+
+def test_return_to_earlier_text_is_admitted():
+    controller = AdmissionController(max_pending=10, max_concurrency=1, busy_reply_window=5)
+
+    assert controller.admit(1, "A")[0] == ADMITTED
+    assert controller.admit(1, "B")[0] == ADMITTED
+    # A -> B -> A: последний ожидающий запрос - B, поэтому A принимается снова
+    assert controller.admit(1, "A")[0] == ADMITTED
+
+
+@pytest.mark.asyncio
+async def test_only_latest_request_is_processed():
+    controller = AdmissionController(max_pending=10, max_concurrency=1, busy_reply_window=5)
+    _, first = controller.admit(1, "A")
+    _, second = controller.admit(1, "B")
+    _, third = controller.admit(1, "A")
+    _, other = controller.admit(2, "X")
+    done = []
+
+    await asyncio.gather(
+        process(controller, 1, first, done, "A1"),
+        process(controller, 1, second, done, "B"),
+        process(controller, 1, third, done, "A2"),
+        process(controller, 2, other, done, "X"),
+    )
+
+    assert done == ["A2", "X"]
+    stats = controller.get_stats()
+    assert stats["superseded"] == 2
+    assert stats["depth"] == 0 and stats["active"] == 0
+
+
+@pytest.mark.asyncio
+async def test_retry_after_processing_is_admitted():
+    controller = AdmissionController(max_pending=10, max_concurrency=1, busy_reply_window=5)
+    _, sequence = controller.admit(1, "A")
+    await process(controller, 1, sequence, [], "A")
+
+    # Повтор после ответа - новый запрос, а не дубликат
+    assert controller.admit(1, "A")[0] == ADMITTED
+
+
+@pytest.mark.asyncio
+async def test_shed_when_queue_is_full():
+    controller = AdmissionController(max_pending=2, max_concurrency=1, busy_reply_window=5)
+    admitted = [controller.admit(user_id, "A")[1] for user_id in (1, 2)]
+
+    assert controller.admit(3, "A") == (SHED, 0)
+    # Второй отказ тому же пользователю в окне - без ответа
+    assert controller.admit(3, "B") == (SHED_QUIET, 0)
+    controller.shed_replied()
+
+    for user_id, sequence in zip((1, 2), admitted):
+        await process(controller, user_id, sequence, [], "A")
+    assert controller.admit(3, "A")[0] == ADMITTED
+    assert controller.get_stats()["shed"] == 2
@@ -0,0 +1,38 @@
+"""Тесты загрузки и валидации файла с данными гонки."""
+import json
+
+import pytest
+
+from bot.api_client import RaceDataClient, validate_race_data
+
+from tests.data import make_participants
+
+
+def write_results(tmp_path, participants) -> str:
+    path = tmp_path / "race.json"
+    path.write_text(json.dumps(participants), encoding="utf-8")
+    return str(path)
+
+
+def test_client_uses_race_total_laps(tmp_path):
+    path = write_results(tmp_path, make_participants(5, total_laps=20))
+
+    columns = RaceDataClient(path, total_laps=20).load_columns()
+    assert columns.total_laps == 20
+    assert sorted(columns.lap_column(20)) == [1, 2, 3, 4, 5]
+    assert len(RaceDataClient(path, total_laps=20).load_data()) == 5
+
+
+def test_validation_checks_laps_of_the_race():
+    participants = make_participants(3, total_laps=20)
+    del participants[0]["lap20"]
+
+    assert validate_race_data(participants, total_laps=20).missing_fields == {"lap20": 1}
+    assert validate_race_data(make_participants(3, total_laps=12), total_laps=20).missing_fields == {
+        f"lap{lap_number}": 3 for lap_number in range(13, 21)
+    }
+
+
+def test_participant_without_required_field_is_rejected():
+    with pytest.raises(ValueError):
+        validate_race_data([{"user": "user0.near", "start_position": 1}])
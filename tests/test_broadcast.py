@@ -0,0 +1,180 @@
+"""Тесты диспетчера рассылки: лимиты, приоритеты и паузы RetryAfter."""
+import asyncio
+import time
+
+import pytest
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from bot.broadcast import (
+    PRIORITY_LAP,
+    PRIORITY_REPLY,
+    BroadcastEngine,
+    OutgoingMessage,
+    PrioritySemaphore,
+    TokenBucket,
+)
+
+
+class FakeBot:
+    """Бот, записывающий отправленные сообщения; может один раз ответить RetryAfter."""
+
+    def __init__(self, retry_after: int = 0):
+        self.sent = []
+        self.retry_after = retry_after
+
+    async def send_message(self, chat_id, text, reply_markup=None):
+        if self.retry_after:
+            retry_after, self.retry_after = self.retry_after, 0
+            raise TelegramRetryAfter(SendMessage(chat_id=chat_id, text=text), "flood", retry_after)
+        self.sent.append((chat_id, text, reply_markup, time.monotonic()))
+
+
+def make_engine(bot: FakeBot, **kwargs) -> BroadcastEngine:
+    options = dict(max_concurrency=4, global_rate=1000, private_chat_rate=1000, group_chat_rate=1000)
+    options.update(kwargs)
+    return BroadcastEngine(bot, **options)
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=20, capacity=1)
+    started = time.monotonic()
+
+    for _ in range(5):
+        await bucket.acquire()
+
+    # Первый токен - сразу, остальные четыре - по одному за 50 мс
+    assert 0.18 <= time.monotonic() - started < 0.5
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_serves_higher_priority_first():
+    bucket = TokenBucket(rate=20, capacity=1)
+    await bucket.acquire()
+    order = []
+
+    async def take(name, priority):
+        await bucket.acquire(priority)
+        order.append(name)
+
+    replies = [asyncio.create_task(take(f"reply{i}", PRIORITY_REPLY)) for i in range(3)]
+    await asyncio.sleep(0.01)
+    lap = asyncio.create_task(take("lap", PRIORITY_LAP))
+    await asyncio.gather(*replies, lap)
+
+    assert order == ["lap", "reply0", "reply1", "reply2"]
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_cancelled_waiter_does_not_block_queue():
+    bucket = TokenBucket(rate=20, capacity=1)
+    await bucket.acquire()
+    first = asyncio.create_task(bucket.acquire(PRIORITY_LAP))
+    second = asyncio.create_task(bucket.acquire(PRIORITY_REPLY))
+    await asyncio.sleep(0.01)
+
+    first.cancel()
+    await asyncio.wait_for(second, timeout=1)
+    assert first.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_priority_semaphore_order():
+    semaphore = PrioritySemaphore(1)
+    order = []
+    release = asyncio.Event()
+
+    async def hold():
+        async with semaphore.acquire(PRIORITY_REPLY):
+            await release.wait()
+
+    async def use(name, priority):
+        async with semaphore.acquire(priority):
+            order.append(name)
+
+    holder = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    waiters = [
+        asyncio.create_task(use("reply1", PRIORITY_REPLY)),
+        asyncio.create_task(use("reply2", PRIORITY_REPLY)),
+        asyncio.create_task(use("lap", PRIORITY_LAP)),
+    ]
+    await asyncio.sleep(0)
+    assert semaphore.waiting == {PRIORITY_REPLY: 2, PRIORITY_LAP: 1}
+
+    release.set()
+    await asyncio.gather(holder, *waiters)
+    assert order == ["lap", "reply1", "reply2"]
+
+
+@pytest.mark.asyncio
+async def test_queued_lap_send_overtakes_queued_replies():
+    bot = FakeBot()
+    # Ёмкость глобального лимита - 5 сообщений, дальше по одному в 200 мс
+    engine = make_engine(bot, max_concurrency=4, global_rate=5)
+
+    async def reply(chat_id):
+        await engine.reply(chat_id, lambda: bot.send_message(chat_id, "reply"))
+
+    replies = [asyncio.create_task(reply(chat_id)) for chat_id in range(1, 13)]
+    await asyncio.sleep(0.02)
+    # Пять ответов ушли сразу, четыре держат слоты и ждут токен, три ждут слот
+    assert len(bot.sent) == 5
+
+    lap = asyncio.create_task(engine.send(OutgoingMessage(chat_id=-100, text="lap")))
+    await asyncio.gather(lap, *replies)
+
+    order = [chat_id for chat_id, *_ in bot.sent]
+    # Все слоты заняты ответами: рассылка получает слот первого доставленного
+    # ответа и следующий токен раньше трёх ответов, которые уже держат слоты
+    assert order.index(-100) == 6
+
+
+@pytest.mark.asyncio
+async def test_per_chat_limit_does_not_delay_other_chats():
+    bot = FakeBot()
+    engine = make_engine(bot, group_chat_rate=5)
+
+    await asyncio.gather(*(
+        engine.send(OutgoingMessage(chat_id=chat_id, text="lap")) for chat_id in (-1, -1, -2, -3)
+    ))
+
+    sent_at = {}
+    for chat_id, _, _, at in bot.sent:
+        sent_at.setdefault(chat_id, []).append(at)
+    first = min(at for times in sent_at.values() for at in times)
+    # Второе сообщение в тот же чат - не раньше чем через 1/5 секунды
+    assert sent_at[-1][1] - sent_at[-1][0] >= 0.18
+    assert sent_at[-2][0] - first < 0.05 and sent_at[-3][0] - first < 0.05
+
+
+@pytest.mark.asyncio
+async def test_retry_after_pauses_all_sends():
+    bot = FakeBot(retry_after=1)
+    engine = make_engine(bot)
+    failed = OutgoingMessage(chat_id=-1, text="lap")
+
+    assert await engine.send(failed) is False
+    started = time.monotonic()
+    assert await engine.send(OutgoingMessage(chat_id=-2, text="lap")) is True
+
+    # Другой чат ждёт окончания общей паузы, неудачное сообщение - в очереди повторов
+    assert time.monotonic() - started >= 0.9
+    assert engine.retry_queue.get_stats()["scheduled"] == 1
+
+
+@pytest.mark.asyncio
+async def test_long_text_is_sent_in_parts_with_markup_on_last():
+    bot = FakeBot()
+    engine = make_engine(bot)
+    delivered = []
+    text = "\n".join(f"{i}. <b>Team {i}</b>" for i in range(1000))
+    message = OutgoingMessage(chat_id=-1, text=text, reply_markup="keyboard", on_sent=lambda: delivered.append(1))
+
+    assert await engine.send(message)
+
+    parts = [part for _, part, _, _ in bot.sent]
+    assert len(parts) > 1 and "\n".join(parts) == text
+    assert [markup for _, _, markup, _ in bot.sent] == [None] * (len(parts) - 1) + ["keyboard"]
+    assert message.sent_parts == len(parts) and delivered == [1]
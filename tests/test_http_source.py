@@ -0,0 +1,119 @@
+"""Тесты HTTP-источника данных гонки на локальном сервере-заглушке."""
+import asyncio
+import json
+
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from bot.http_source import HttpRaceDataSource
+
+from tests.data import TOTAL_LAPS, make_participants
+
+ETAG = '"v1"'
+
+
+class StubRaceServer:
+    """Сервер-заглушка эндпоинта данных гонки с поддержкой ETag."""
+
+    def __init__(self):
+        self.body = json.dumps(make_participants(5)).encode()
+        self.etag = ETAG
+        self.delay = 0.0
+        self.requests = []
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests.append(request.headers.get("If-None-Match"))
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if request.headers.get("If-None-Match") == self.etag:
+            return web.Response(status=304)
+        return web.Response(body=self.body, content_type="application/json", headers={"ETag": self.etag})
+
+
+@pytest_asyncio.fixture
+async def stub():
+    """Запущенный сервер-заглушка и его адрес."""
+    server_state = StubRaceServer()
+    app = web.Application()
+    app.router.add_get("/race", server_state.handle)
+    async with TestServer(app) as server:
+        yield server_state, str(server.make_url("/race"))
+
+
+@pytest_asyncio.fixture
+async def source(stub):
+    """Источник, направленный на сервер-заглушку."""
+    _, url = stub
+    race_source = HttpRaceDataSource(url, timeout=0.5, total_laps=TOTAL_LAPS)
+    yield race_source
+    await race_source.close()
+
+
+@pytest.mark.asyncio
+async def test_fetch_returns_new_data(stub, source):
+    assert await source.fetch() is True
+
+    assert source.get_cached() == make_participants(5)
+    assert source.version_tag == ETAG
+    assert source.get_stats()["errors"] == 0
+
+
+@pytest.mark.asyncio
+async def test_not_modified_keeps_data(stub, source):
+    server_state, _ = stub
+    await source.fetch()
+
+    assert await source.fetch() is False
+    assert server_state.requests == [None, ETAG]
+    assert source.not_modified == 1
+    assert source.get_cached() == make_participants(5)
+
+
+@pytest.mark.asyncio
+async def test_changed_etag_returns_new_data(stub, source):
+    server_state, _ = stub
+    await source.fetch()
+    server_state.body = json.dumps(make_participants(6)).encode()
+    server_state.etag = '"v2"'
+
+    assert await source.fetch() is True
+    assert len(source.get_cached()) == 6
+    assert source.version_tag == '"v2"'
+
+
+@pytest.mark.asyncio
+async def test_timeout_keeps_previous_data(stub, source):
+    server_state, _ = stub
+    await source.fetch()
+    server_state.etag = '"v2"'
+    server_state.delay = 2
+
+    assert await source.fetch() is False
+    assert source.errors == 1
+    assert source.get_cached() == make_participants(5)
+    assert source.version_tag == ETAG
+
+
+@pytest.mark.asyncio
+async def test_invalid_json_keeps_previous_data(stub, source):
+    server_state, _ = stub
+    await source.fetch()
+    server_state.body = b"[{"
+    server_state.etag = '"v2"'
+
+    assert await source.fetch() is False
+    assert source.errors == 1
+    assert source.get_cached() == make_participants(5)
+    assert source.version_tag == ETAG
+
+
+@pytest.mark.asyncio
+async def test_invalid_structure_is_rejected(stub, source):
+    server_state, _ = stub
+    server_state.body = json.dumps([{"user": "user0.near"}]).encode()
+
+    assert await source.fetch() is False
+    assert source.errors == 1
+    assert source.get_cached() is None
@@ -0,0 +1,42 @@
+"""Тесты потокового разбора JSON-массива."""
+import json
+from io import StringIO
+
+import pytest
+
+from bot.json_stream import iter_json_array
+
+from tests.data import make_participants
+
+DOCUMENTS = [
+    "[]",
+    "  [ ]  \n",
+    "[1, -2.5e3, true, false, null, \"a,]b\", [1, [2]], {\"k\": \"]\"}]",
+    json.dumps(make_participants(20)),
+    json.dumps(make_participants(20), indent=2) + "\n\n",
+]
+
+
+@pytest.mark.parametrize("document", DOCUMENTS)
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 64, 1024 * 1024])
+def test_matches_json_loads(document, chunk_size):
+    assert list(iter_json_array(StringIO(document), chunk_size)) == json.loads(document)
+
+
+@pytest.mark.parametrize("document", [
+    "",
+    "   ",
+    "{}",
+    "[1",
+    "[1,]",
+    "[,1]",
+    "[1 2]",
+    "[1]x",
+    "[1] ]",
+    "[1]\n\n[2]",
+    "[1]" + " " * 100 + "0",
+])
+@pytest.mark.parametrize("chunk_size", [1, 3, 1024 * 1024])
+def test_rejects_invalid_documents(document, chunk_size):
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_array(StringIO(document), chunk_size))
@@ -0,0 +1,116 @@
+"""Тесты текстов лидерборд (эталоны совпадают с выводом прежних format_* по спискам словарей)."""
+import pytest
+
+from bot.columnar import ParticipantColumns
+from bot.leaderboard import (
+    render_start_leaderboard,
+    render_lap_leaderboard,
+    render_final_leaderboard,
+    render_user_leaderboard,
+)
+from bot.standings import StandingsIndex
+
+from tests.data import TOTAL_LAPS, make_participants, sample_participants
+
+
+@pytest.fixture
+def standings() -> StandingsIndex:
+    return StandingsIndex(ParticipantColumns.from_records(sample_participants(), TOTAL_LAPS))
+
+
+def test_start_leaderboard(standings):
+    assert render_start_leaderboard(standings) == (
+        "🏁 <b>СТАРТОВАЯ ПОЗИЦИЯ</b>\n\n"
+        "🥇 <b>Red</b>\n"
+        "🥈 <b>Blue</b>\n"
+        "🥉 <b>Red</b>\n"
+        "4. <b>Green</b>\n"
+        "5. <b>Black</b>"
+    )
+
+
+def test_first_lap_leaderboard(standings):
+    assert render_lap_leaderboard(standings, 1) == (
+        "🏁 <b>КРУГ 1</b>\n\n"
+        "🥇 <b>Blue</b> (⬆️ +1)\n"
+        "🥈 <b>Red</b> (⬇️ -1)\n"
+        "🥉 <b>Red</b> (➡️ 0)\n"
+        "4. <b>Green</b> (➡️ 0)\n"
+        "5. <b>Black</b> (➡️ 0)"
+    )
+
+
+def test_lap_leaderboards_around_missing_lap(standings):
+    assert render_lap_leaderboard(standings, 2) == (
+        "🏁 <b>КРУГ 2</b>\n\n"
+        "🥇 <b>Red</b> (⬆️ +1)\n"
+        "🥈 <b>Red</b> (⬆️ +1)\n"
+        "🥉 <b>Blue</b> (⬇️ -2)\n"
+        "4. <b>Black</b> (⬆️ +1)"
+    )
+    assert render_lap_leaderboard(standings, 3) == (
+        "🏁 <b>КРУГ 3</b>\n\n"
+        "🥇 <b>Blue</b> (⬆️ +2)\n"
+        "🥈 <b>Red</b> (➡️ 0)\n"
+        "🥉 <b>Red</b> (⬇️ -2)\n"
+        "4. <b>Green</b> (➡️ 0)\n"
+        "5. <b>Black</b> (⬇️ -1)"
+    )
+
+
+def test_final_leaderboard(standings):
+    assert render_final_leaderboard(standings) == (
+        "🏁 <b>ФИНАЛЬНЫЕ РЕЗУЛЬТАТЫ</b>\n\n"
+        "🥇 <b>Blue</b> (финал: 1, ⬆️ +1)\n"
+        "🥈 <b>Red</b> (финал: 2, ⬆️ +1)\n"
+        "🥉 <b>Red</b> (финал: 3, ⬇️ -2)\n"
+        "4. <b>Black</b> (финал: 4, ⬆️ +1)\n"
+        "5. <b>Green</b> (финал: 5, ⬇️ -1)"
+    )
+
+
+def test_user_leaderboard_highlights_every_team_member(standings):
+    assert render_user_leaderboard(standings, 3, "team", "red", "en") == (
+        "\n🏁 Lap 3 / 12\n\n"
+        "➡️ You: 2 place ⬇️ -1\n\n"
+        "1. Blue\n\n"
+        "2. 🔥 <b>Red</b>\n\n\n"
+        "3. 🔥 <b>Red</b>\n\n"
+        "4. Green\n"
+        "5. Black"
+    )
+
+
+def test_user_leaderboard_after_missing_lap_has_no_change(standings):
+    assert render_user_leaderboard(standings, 3, "account", "DAVE.near") == (
+        "\n🏁 Круг 3 / 12\n\n"
+        "➡️ Вы: 4 место\n\n"
+        "1. Blue\n"
+        "2. Red\n"
+        "3. Red\n\n"
+        "4. 🔥 <b>Green</b>\n\n"
+        "5. Black"
+    )
+
+
+def test_user_leaderboard_for_unknown_entity(standings):
+    assert render_user_leaderboard(standings, 1, "team", "Purple") == "Участник не найден в лидерборде для круга 1"
+
+
+def test_empty_roster():
+    standings = StandingsIndex(ParticipantColumns.from_records([], TOTAL_LAPS))
+
+    assert render_start_leaderboard(standings) == "Нет данных об участниках"
+    assert render_lap_leaderboard(standings, 4, "en") == "No data for lap 4"
+    assert render_final_leaderboard(standings) == "Нет данных о финальных результатах"
+
+
+def test_user_leaderboard_window():
+    standings = StandingsIndex(ParticipantColumns.from_records(make_participants(20), TOTAL_LAPS))
+    position, _ = standings.find_position(2, "team", "Team 10")
+
+    lines = [line for line in render_user_leaderboard(standings, 2, "team", "Team 10").split("\n") if line]
+    places = [int(line.split(".")[0]) for line in lines[2:]]
+    # Окно ±5 позиций вокруг отслеживаемой команды
+    assert places == list(range(position - 5, position + 6))
+    assert lines[2 + 5] == f"{position}. 🔥 <b>Team 10</b>"
@@ -0,0 +1,62 @@
+"""Тесты разбиения длинных сообщений."""
+from bot.message_split import split_message
+
+
+def test_short_text_is_not_split():
+    assert split_message("короткий текст", limit=100) == ("короткий текст",)
+
+
+def test_lines_are_packed_greedily():
+    lines = [f"строка {i:02d}" for i in range(10)]
+    chunks = split_message("\n".join(lines), limit=30)
+
+    assert all(len(chunk) <= 30 for chunk in chunks)
+    # Каждая строка - 9 символов: в часть помещается три строки с переводами
+    assert len(chunks) == 4
+    assert "\n".join(chunks).split("\n") == lines
+
+
+def test_long_line_is_cut():
+    chunks = split_message("x" * 25, limit=10)
+
+    assert all(len(chunk) <= 10 for chunk in chunks)
+    assert "".join(chunks) == "x" * 25
+
+
+def test_limit_counts_utf16_units():
+    # Эмодзи занимает две кодовые единицы UTF-16
+    text = "\n".join(["🏁🏁🏁"] * 4)
+    chunks = split_message(text, limit=13)
+
+    assert all(len(chunk.encode("utf-16-le")) // 2 <= 13 for chunk in chunks)
+    assert len(chunks) == 2
+    assert "\n".join(chunks) == text
+
+
+def test_whitespace_only_chunks_are_dropped():
+    chunks = split_message("a" * 10 + "\n" + " " * 10 + "\n" + "b" * 10, limit=10)
+
+    assert chunks == ("a" * 10, "b" * 10)
+
+
+def test_long_line_is_cut_outside_tags_and_entities():
+    line = "<b>" + "жирный &amp; текст " * 5 + "</b> <a href=\"https://example.com/x\">ссылка</a> &lt;конец&gt;"
+    chunks = split_message(line, limit=40)
+
+    assert all(len(chunk) <= 40 for chunk in chunks)
+    for chunk in chunks:
+        # Теги и сущности целые, каждый открытый тег закрыт в том же куске
+        assert chunk.count("<") == chunk.count(">")
+        assert chunk.count("<b>") == chunk.count("</b>")
+        assert chunk.count("<a ") == chunk.count("</a>")
+        assert "&" not in chunk.replace("&amp;", "").replace("&lt;", "").replace("&gt;", "")
+    # Без служебных закрытий и повторных открытий тегов текст совпадает с исходным
+    joined = "".join(chunks).replace("</b><b>", "").replace('</a><a href="https://example.com/x">', "")
+    assert joined == line
+
+
+def test_cut_reopens_nested_tags():
+    chunks = split_message("<b><i>" + "x" * 20 + "</i></b>", limit=20)
+
+    # Теги занимают 14 символов, на текст в куске остаётся 6
+    assert chunks == ("<b><i>" + "x" * 6 + "</i></b>",) * 3 + ("<b><i>xx</i></b>",)
@@ -0,0 +1,96 @@
+"""Тесты переноса текстов RenderCache между версиями снимка."""
+from bot.race_data import RaceSnapshot
+from bot.render_cache import RenderCache
+from bot.snapshot_diff import compute_snapshot_diff
+
+from tests.data import TOTAL_LAPS, make_participants
+
+KEYS = [("team", "Team 1", "ru"), ("account", "user2.near", "en")]
+
+
+def snapshot_after(previous: RaceSnapshot, participants, diff: bool = True) -> RaceSnapshot:
+    """Следующая версия снимка с изменениями относительно previous (или без них)."""
+    snapshot = RaceSnapshot.from_records(participants, previous.version + 1, None, TOTAL_LAPS)
+    if diff:
+        snapshot.diff = compute_snapshot_diff(previous.standings, snapshot.standings, previous.version)
+    return snapshot
+
+
+def fill(cache: RenderCache, snapshot: RaceSnapshot, lap_number: int) -> None:
+    """Кладёт в кэш персональные лидерборды KEYS, как это делают процессы-шарды."""
+    for entity_type, entity_value, language in KEYS:
+        cache.put_user_leaderboard(snapshot, lap_number, entity_type, entity_value, language, f"v{snapshot.version}")
+
+
+def test_missing_keys_are_reported_until_stored():
+    cache = RenderCache()
+    snapshot = RaceSnapshot.from_records(make_participants(10), 1, None, TOTAL_LAPS)
+
+    assert cache.get_missing_user_leaderboards(snapshot, 3, KEYS) == KEYS
+    fill(cache, snapshot, 3)
+    assert cache.get_missing_user_leaderboards(snapshot, 3, KEYS) == []
+    assert cache.get_user_leaderboard(snapshot, 3, "team", "team 1", "ru") == "v1"
+
+
+def test_rebase_keeps_only_unaffected_laps():
+    cache = RenderCache()
+    first = RaceSnapshot.from_records(make_participants(10), 1, None, TOTAL_LAPS)
+    fill(cache, first, 5)
+    fill(cache, first, TOTAL_LAPS)
+    lap_text = cache.get_lap_leaderboard(first, 5)
+
+    # Изменились только позиции на последнем круге
+    second = snapshot_after(first, make_participants(10, shift=3))
+    assert second.diff.changed_columns == {TOTAL_LAPS}
+
+    assert cache.get_missing_user_leaderboards(second, 5, KEYS) == []
+    assert cache.get_missing_user_leaderboards(second, TOTAL_LAPS, KEYS) == KEYS
+    assert cache.get_user_leaderboard(second, 5, "team", "Team 1", "ru") == "v1"
+    hits = cache.hits
+    assert cache.get_lap_leaderboard(second, 5) == lap_text
+    assert cache.hits == hits + 1
+    assert cache.carried_over == 3
+    assert cache.invalidated == 2
+
+
+def test_rebase_without_diff_clears_cache():
+    cache = RenderCache()
+    first = RaceSnapshot.from_records(make_participants(10), 1, None, TOTAL_LAPS)
+    fill(cache, first, 5)
+
+    second = snapshot_after(first, make_participants(10), diff=False)
+    assert cache.get_missing_user_leaderboards(second, 5, KEYS) == KEYS
+    assert cache.carried_over == 0
+
+
+def test_rebase_with_diff_from_other_version_clears_cache():
+    cache = RenderCache()
+    first = RaceSnapshot.from_records(make_participants(10), 1, None, TOTAL_LAPS)
+    second = snapshot_after(first, make_participants(10))
+    fill(cache, second, 5)
+
+    # Изменения посчитаны относительно версии 1, а тексты сформированы для версии 2
+    third = RaceSnapshot.from_records(make_participants(10), 3, None, TOTAL_LAPS)
+    third.diff = compute_snapshot_diff(first.standings, third.standings, first.version)
+    assert cache.get_missing_user_leaderboards(third, 5, KEYS) == KEYS
+
+
+def test_rebase_after_roster_change_clears_cache():
+    cache = RenderCache()
+    first = RaceSnapshot.from_records(make_participants(10), 1, None, TOTAL_LAPS)
+    fill(cache, first, 5)
+
+    second = snapshot_after(first, make_participants(11))
+    assert second.diff.full
+    assert cache.get_missing_user_leaderboards(second, 5, KEYS) == KEYS
+
+
+def test_texts_for_older_version_are_not_stored():
+    cache = RenderCache()
+    first = RaceSnapshot.from_records(make_participants(10), 1, None, TOTAL_LAPS)
+    second = snapshot_after(first, make_participants(10, shift=3))
+    cache.get_missing_user_leaderboards(second, 5, KEYS)
+
+    # Шард закончил отрисовку по снимку, который уже заменён
+    fill(cache, first, 5)
+    assert cache.get_missing_user_leaderboards(second, 5, KEYS) == KEYS
@@ -0,0 +1,149 @@
+"""Тесты фоновой очереди повторной отправки."""
+import asyncio
+import time
+
+import pytest
+from aiogram.exceptions import TelegramForbiddenError, TelegramNetworkError, TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from bot.broadcast import OutgoingMessage
+from bot.retry_queue import RetryQueue
+
+METHOD = SendMessage(chat_id=1, text="x")
+
+
+class FakeSend:
+    """Попытка отправки, которая падает заданное число раз, затем проходит."""
+
+    def __init__(self, failures: int = 0, error: Exception = None):
+        self.failures = failures
+        self.error = error or TelegramNetworkError(METHOD, "timeout")
+        self.calls = []
+        self.delivered = asyncio.Event()
+
+    async def __call__(self, message):
+        self.calls.append(message.chat_id)
+        if len(self.calls) <= self.failures:
+            raise self.error
+        self.delivered.set()
+
+
+async def wait_for(condition, timeout: float = 2.0) -> None:
+    """Ждёт выполнения условия, опрашивая его."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "условие не выполнилось"
+        await asyncio.sleep(0.005)
+
+
+def test_backoff_is_exponential_with_jitter_and_capped():
+    queue = RetryQueue(FakeSend(), base_delay=1.0, max_delay=8.0)
+
+    for attempt in range(1, 8):
+        delay = min(8.0, 2 ** (attempt - 1))
+        samples = [queue._backoff(attempt) for _ in range(200)]
+        assert all(delay / 2 <= sample <= delay for sample in samples)
+        # Джиттер: задержки разные
+        assert len(set(samples)) > 1
+
+
+@pytest.mark.asyncio
+async def test_failed_send_is_retried_until_delivered():
+    send = FakeSend(failures=2)
+    queue = RetryQueue(send, max_attempts=5, base_delay=0.01, max_delay=0.02)
+    queue.start()
+    try:
+        queue.submit(OutgoingMessage(chat_id=-100, text="lap"), TelegramNetworkError(METHOD, "timeout"))
+        await asyncio.wait_for(send.delivered.wait(), timeout=2)
+    finally:
+        await queue.stop()
+
+    assert send.calls == [-100, -100, -100]
+    stats = queue.get_stats()
+    assert stats["recovered"] == 1 and stats["scheduled"] == 3 and stats["dead_letters"] == 0
+
+
+@pytest.mark.asyncio
+async def test_exhausted_attempts_go_to_dead_letters():
+    send = FakeSend(failures=10)
+    queue = RetryQueue(send, max_attempts=3, base_delay=0.01, max_delay=0.02)
+    queue.start()
+    try:
+        queue.submit(OutgoingMessage(chat_id=-100, text="lap"), TelegramNetworkError(METHOD, "timeout"))
+        await wait_for(lambda: queue.dead_letters)
+    finally:
+        await queue.stop()
+
+    # Первая попытка - вне очереди, затем два повтора
+    assert len(send.calls) == 2
+    dead = queue.dead_letters[0]
+    assert dead.chat_id == -100 and dead.attempts == 3 and "timeout" in dead.reason
+
+
+def test_forbidden_is_dead_lettered_without_retry():
+    forbidden = []
+    queue = RetryQueue(FakeSend(), on_forbidden=forbidden.append)
+
+    queue.submit(OutgoingMessage(chat_id=-100, text="lap"), TelegramForbiddenError(METHOD, "blocked"))
+
+    assert forbidden == [-100]
+    assert queue.dead_letters[0].reason == "forbidden"
+    assert queue.get_stats()["depth"] == 0 and queue.scheduled == 0
+
+
+def test_retry_after_delay_is_used():
+    queue = RetryQueue(FakeSend(), base_delay=0.01, max_delay=0.02)
+
+    queue.submit(OutgoingMessage(chat_id=-100, text="lap"), TelegramRetryAfter(METHOD, "flood", 7))
+
+    assert queue._heap[0].due - time.monotonic() == pytest.approx(7, abs=0.5)
+
+
+def test_dead_letter_list_is_bounded():
+    queue = RetryQueue(FakeSend(), dead_letter_limit=2)
+
+    for chat_id in (-1, -2, -3):
+        queue.submit(OutgoingMessage(chat_id=chat_id, text="lap"), TelegramForbiddenError(METHOD, "blocked"))
+
+    assert [dead.chat_id for dead in queue.dead_letters] == [-2, -3]
+    assert queue.get_stats()["dead_letters"] == 3
+
+
+@pytest.mark.asyncio
+async def test_stale_message_is_dropped():
+    send = FakeSend()
+    queue = RetryQueue(send, base_delay=0.01, max_delay=0.02)
+    queue.start()
+    try:
+        queue.submit(
+            OutgoingMessage(chat_id=-100, text="lap", is_stale=lambda: True), TelegramNetworkError(METHOD, "timeout")
+        )
+        await wait_for(lambda: queue.dropped_stale)
+    finally:
+        await queue.stop()
+
+    assert send.calls == []
+
+
+@pytest.mark.asyncio
+async def test_stop_cancels_in_flight_retries():
+    started = asyncio.Event()
+    cancelled = []
+
+    async def hanging_send(message):
+        started.set()
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.append(message.chat_id)
+            raise
+
+    queue = RetryQueue(hanging_send, base_delay=0.01, max_delay=0.02)
+    queue.start()
+    queue.submit(OutgoingMessage(chat_id=-100, text="lap"), TelegramNetworkError(METHOD, "timeout"))
+    await asyncio.wait_for(started.wait(), timeout=2)
+
+    await asyncio.wait_for(queue.stop(), timeout=2)
+
+    assert cancelled == [-100]
+    assert queue.get_stats()["depth"] == 0
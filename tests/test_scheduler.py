@@ -0,0 +1,135 @@
+"""Тесты планировщика событий гонки."""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from bot.race_clock import RaceClock
+from bot.scheduler import LapScheduler
+
+START = datetime(2026, 1, 1, 10, 0, 0)
+
+
+def at(seconds: float) -> datetime:
+    return START + timedelta(seconds=seconds)
+
+
+def kinds(events):
+    return [(event.kind, event.lap_number) for event in events]
+
+
+def make_scheduler(**races) -> LapScheduler:
+    scheduler = LapScheduler()
+    for race_id, clock in races.items():
+        scheduler.add_race(race_id, clock)
+    return scheduler
+
+
+def test_schedule_before_start():
+    scheduler = make_scheduler(main=RaceClock(START, lap_duration=20, total_laps=3))
+
+    events = scheduler.get_schedule(now=at(-60))
+
+    assert kinds(events) == [
+        ("prewarm", 0), ("start", 0),
+        ("prewarm", 1), ("lap", 1),
+        ("prewarm", 2), ("lap", 2),
+        ("prewarm", 3), ("lap", 3), ("final", 3),
+    ]
+    # Прогрев - за половину круга до границы, к которой он готовит тексты
+    assert [(event.scheduled_at, event.boundary_at) for event in events if event.kind == "prewarm"] == [
+        (at(-10), at(0)), (at(10), at(20)), (at(30), at(40)), (at(50), at(60)),
+    ]
+    assert [event.scheduled_at for event in events if event.kind != "prewarm"] == [
+        at(0), at(20), at(40), at(60), at(60)
+    ]
+    assert {event.race_id for event in events} == {"main"}
+
+
+def test_schedule_mid_race_skips_completed_laps():
+    scheduler = make_scheduler(main=RaceClock(START, lap_duration=20, total_laps=3))
+    now = at(35)
+
+    events = scheduler.get_schedule(now=now)
+
+    assert kinds(events) == [("start", 0), ("prewarm", 2), ("lap", 2), ("prewarm", 3), ("lap", 3), ("final", 3)]
+    # Старт публикуется сразу, прогрев ближайшего круга - тоже (его время уже прошло)
+    assert events[0].scheduled_at == now and events[1].scheduled_at == now
+
+
+def test_schedule_after_race_or_without_start_is_empty():
+    assert make_scheduler(main=RaceClock(START, lap_duration=20, total_laps=3)).get_schedule(now=at(61)) == []
+    assert make_scheduler(main=RaceClock(None)).get_schedule(now=at(0)) == []
+
+
+def test_races_are_merged_by_time():
+    scheduler = make_scheduler(
+        long=RaceClock(START, lap_duration=30, total_laps=2),
+        short=RaceClock(at(10), lap_duration=10, total_laps=2),
+    )
+
+    events = [event for event in scheduler.get_schedule(now=at(-60)) if event.kind != "prewarm"]
+
+    assert [(event.race_id, event.kind, event.lap_number) for event in events] == [
+        ("long", "start", 0),
+        ("short", "start", 0),
+        ("short", "lap", 1),
+        ("long", "lap", 1),
+        ("short", "lap", 2),
+        ("short", "final", 2),
+        ("long", "lap", 2),
+        ("long", "final", 2),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_events_are_emitted_in_order():
+    scheduler = make_scheduler(main=RaceClock(datetime.now() + timedelta(seconds=0.1), lap_duration=0.1, total_laps=2))
+    received = []
+    finished = asyncio.Event()
+
+    async def handler(event):
+        received.append((event.kind, event.lap_number, datetime.now() >= event.scheduled_at))
+        if event.kind == "final":
+            finished.set()
+
+    async def failing_handler(event):
+        raise RuntimeError("ошибка подписчика")
+
+    scheduler.subscribe(failing_handler)
+    scheduler.subscribe(handler)
+    scheduler.start()
+    try:
+        await asyncio.wait_for(finished.wait(), timeout=2)
+    finally:
+        await scheduler.stop()
+
+    # Ошибка одного подписчика не останавливает планировщик; события не раньше своего времени
+    assert received == [
+        ("prewarm", 0, True), ("start", 0, True),
+        ("prewarm", 1, True), ("lap", 1, True),
+        ("prewarm", 2, True), ("lap", 2, True), ("final", 2, True),
+    ]
+    assert scheduler.last_lag is not None and scheduler.last_lag < 0.1
+
+
+@pytest.mark.asyncio
+async def test_stop_cancels_running_handlers():
+    scheduler = make_scheduler(main=RaceClock(datetime.now() - timedelta(seconds=1), lap_duration=60, total_laps=1))
+    started = asyncio.Event()
+    cancelled = []
+
+    async def slow_handler(event):
+        started.set()
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.append(event.kind)
+            raise
+
+    scheduler.subscribe(slow_handler)
+    scheduler.start()
+    await asyncio.wait_for(started.wait(), timeout=1)
+    await asyncio.wait_for(scheduler.stop(), timeout=1)
+
+    assert "start" in cancelled
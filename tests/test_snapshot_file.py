@@ -0,0 +1,164 @@
+"""Тесты бинарного снимка данных гонки."""
+import json
+import os
+import struct
+
+import pytest
+
+from bot.columnar import ParticipantColumns
+from bot.leaderboard import render_lap_leaderboard, render_final_leaderboard, render_user_leaderboard
+from bot.snapshot_file import (
+    SNAPSHOT_FORMAT_VERSION,
+    compile_snapshot,
+    content_hash,
+    read_snapshot,
+    snapshot_path_for,
+    write_snapshot,
+)
+from bot.standings import StandingsIndex
+
+from tests.data import TOTAL_LAPS, make_participants, sample_participants
+
+
+def build(participants, total_laps: int = TOTAL_LAPS) -> StandingsIndex:
+    return StandingsIndex(ParticipantColumns.from_records(participants, total_laps))
+
+
+def assert_same_index(restored: StandingsIndex, expected: StandingsIndex) -> None:
+    """Сравнивает все колонки и индексы восстановленного снимка со свежепостроенными."""
+    assert restored.total_laps == expected.total_laps
+    assert list(restored.columns.users) == list(expected.columns.users)
+    assert list(restored.columns.team_table) == list(expected.columns.team_table)
+    assert list(restored.columns.team_ids) == list(expected.columns.team_ids)
+    assert list(restored.columns.start_positions) == list(expected.columns.start_positions)
+    assert list(restored.start_order) == list(expected.start_order)
+    assert list(restored.final_deltas) == list(expected.final_deltas)
+    assert restored.final_movers == expected.final_movers
+    for lap_number in range(1, expected.total_laps + 1):
+        assert list(restored.columns.lap_column(lap_number)) == list(expected.columns.lap_column(lap_number))
+        assert list(restored.lap_orders[lap_number]) == list(expected.lap_orders[lap_number])
+        assert list(restored.lap_ranks[lap_number]) == list(expected.lap_ranks[lap_number])
+        assert list(restored.lap_deltas[lap_number]) == list(expected.lap_deltas[lap_number])
+        assert restored.lap_movers[lap_number] == expected.lap_movers[lap_number]
+
+
+def test_round_trip_with_missing_laps(tmp_path):
+    path = str(tmp_path / "race.snapshot")
+    expected = build(sample_participants())
+    assert write_snapshot(expected, path, "hash")
+
+    restored = read_snapshot(path, "hash")
+    assert_same_index(restored, expected)
+    assert restored.find_participant("account", "ALICE.NEAR")["user"] == "Alice.near"
+    assert restored.get_entity_ids("team", "red") == [0, 2]
+    for lap_number in range(1, TOTAL_LAPS + 1):
+        assert render_lap_leaderboard(restored, lap_number) == render_lap_leaderboard(expected, lap_number)
+        assert render_user_leaderboard(restored, lap_number, "team", "Red") == \
+            render_user_leaderboard(expected, lap_number, "team", "Red")
+    assert render_final_leaderboard(restored) == render_final_leaderboard(expected)
+
+
+def test_round_trip_larger_race(tmp_path):
+    path = str(tmp_path / "race.snapshot")
+    expected = build(make_participants(1000, total_laps=20), total_laps=20)
+    assert write_snapshot(expected, path, "hash")
+
+    assert_same_index(read_snapshot(path), expected)
+
+
+def test_round_trip_empty_roster(tmp_path):
+    path = str(tmp_path / "race.snapshot")
+    expected = build([])
+    assert write_snapshot(expected, path, "hash")
+
+    restored = read_snapshot(path, "hash")
+    assert_same_index(restored, expected)
+    assert len(restored) == 0
+
+
+def test_round_trip_empty_strings(tmp_path):
+    path = str(tmp_path / "race.snapshot")
+    participants = make_participants(3)
+    participants[1]["user"] = ""
+    participants[2]["team_name"] = ""
+    expected = build(participants)
+    assert write_snapshot(expected, path, "hash")
+
+    assert_same_index(read_snapshot(path), expected)
+
+
+def test_hash_mismatch_is_rejected(tmp_path):
+    path = str(tmp_path / "race.snapshot")
+    write_snapshot(build(make_participants(5)), path, "hash")
+
+    assert read_snapshot(path, "other") is None
+
+
+def test_format_version_mismatch_is_rejected(tmp_path):
+    path = tmp_path / "race.snapshot"
+    write_snapshot(build(make_participants(5)), str(path), "hash")
+
+    data = bytearray(path.read_bytes())
+    # Версия формата - второе поле заголовка после 8-байтовой сигнатуры
+    struct.pack_into("<I", data, 8, SNAPSHOT_FORMAT_VERSION + 1)
+    path.write_bytes(bytes(data))
+    assert read_snapshot(str(path)) is None
+
+
+def test_missing_or_empty_file(tmp_path):
+    path = tmp_path / "race.snapshot"
+    assert read_snapshot(str(path)) is None
+    path.write_bytes(b"")
+    assert read_snapshot(str(path)) is None
+
+
+def test_name_with_separator_is_not_written(tmp_path):
+    path = str(tmp_path / "race.snapshot")
+    participants = make_participants(3)
+    participants[1]["user"] = "bad\0name.near"
+
+    assert write_snapshot(build(participants), path, "hash") is False
+    assert not (tmp_path / "race.snapshot").exists()
+
+
+@pytest.fixture
+def results_file(tmp_path):
+    path = tmp_path / "race.json"
+    path.write_text(json.dumps(make_participants(10, total_laps=20)), encoding="utf-8")
+    return str(path)
+
+
+def test_compile_reuses_current_snapshot(results_file):
+    path = compile_snapshot(results_file, TOTAL_LAPS)
+    assert path == snapshot_path_for(results_file)
+    mtime = os.stat(path).st_mtime_ns
+
+    assert compile_snapshot(results_file, TOTAL_LAPS) == path
+    assert os.stat(path).st_mtime_ns == mtime
+    assert read_snapshot(path, content_hash(results_file)).total_laps == TOTAL_LAPS
+
+
+def test_compile_rebuilds_when_total_laps_changes(results_file):
+    path = compile_snapshot(results_file, TOTAL_LAPS)
+
+    assert compile_snapshot(results_file, 20) == path
+    restored = read_snapshot(path, content_hash(results_file))
+    assert restored.total_laps == 20
+    assert_same_index(restored, build(make_participants(10, total_laps=20), total_laps=20))
+
+
+def test_compile_rebuilds_when_source_changes(results_file, tmp_path):
+    path = compile_snapshot(results_file, TOTAL_LAPS)
+    (tmp_path / "race.json").write_text(json.dumps(make_participants(4)), encoding="utf-8")
+
+    assert compile_snapshot(results_file, TOTAL_LAPS) == path
+    assert len(read_snapshot(path, content_hash(results_file))) == 4
+
+
+def test_compile_falls_back_for_name_with_separator(tmp_path):
+    participants = make_participants(3)
+    participants[0]["team_name"] = "Team\0X"
+    path = tmp_path / "race.json"
+    path.write_text(json.dumps(participants), encoding="utf-8")
+
+    assert compile_snapshot(str(path), TOTAL_LAPS) is None
@@ -0,0 +1,82 @@
+"""Тесты индекса позиций StandingsIndex."""
+import pytest
+
+from bot.columnar import ParticipantColumns
+from bot.standings import StandingsIndex
+
+from tests.data import TOTAL_LAPS, sample_participants
+
+ALICE, BOB, CAROL, DAVE, EVE = range(5)
+
+
+@pytest.fixture
+def standings() -> StandingsIndex:
+    return StandingsIndex(ParticipantColumns.from_records(sample_participants(), TOTAL_LAPS))
+
+
+def test_account_lookup_ignores_case(standings):
+    assert standings.find_participant_id("account", "ALICE.NEAR") == ALICE
+    assert standings.find_participant("account", "alice.near")["user"] == "Alice.near"
+    assert standings.find_participant("account", "nobody.near") is None
+
+
+def test_duplicate_team_name_maps_to_all_members(standings):
+    assert standings.find_participant_id("team", "red") == ALICE
+    assert standings.get_entity_ids("team", "RED") == [ALICE, CAROL]
+    assert standings.get_entity_ids("team", "Blue") == [BOB]
+    assert standings.get_entity_ids("team", "Purple") == []
+
+
+def test_position_of_team_is_its_best_member(standings):
+    # Круг 1: Alice 2-я, Carol 3-я; круг 2: Alice 1-я
+    assert standings.find_position(1, "team", "Red") == (2, 1)
+    assert standings.find_position(2, "team", "red") == (1, 0)
+    assert standings.find_position(3, "account", "Bob.Near") == (1, 0)
+
+
+def test_orders(standings):
+    assert list(standings.get_start_order()) == [ALICE, BOB, CAROL, DAVE, EVE]
+    assert list(standings.get_lap_order(1)) == [BOB, ALICE, CAROL, DAVE, EVE]
+    assert list(standings.get_lap_order(TOTAL_LAPS)) == [BOB, CAROL, ALICE, EVE, DAVE]
+
+
+def test_missing_lap_excludes_participant(standings):
+    assert list(standings.get_lap_order(2)) == [ALICE, CAROL, BOB, EVE]
+    assert standings.find_position(2, "account", "dave.near") is None
+    assert standings.find_position(3, "account", "dave.near") == (4, 3)
+
+
+def test_first_lap_deltas_are_against_start(standings):
+    assert list(standings.get_lap_deltas(1)) == [-1, 1, 0, 0, 0]
+
+
+def test_deltas_around_missing_lap_are_zero(standings):
+    assert list(standings.get_lap_deltas(2)) == [1, -2, 1, 0, 1]
+    assert list(standings.get_lap_deltas(3)) == [-2, 2, 0, 0, -1]
+
+
+def test_final_deltas_are_against_start(standings):
+    assert list(standings.get_final_deltas()) == [-2, 1, 1, -1, 1]
+
+
+def test_movers(standings):
+    assert standings.get_lap_movers(1) == ([(BOB, 1)], [(ALICE, -1)])
+    assert standings.get_lap_movers(3) == ([(BOB, 2)], [(ALICE, -2), (EVE, -1)])
+    # Поровну поднявшиеся - в исходном порядке
+    assert standings.get_final_movers() == ([(BOB, 1), (CAROL, 1), (EVE, 1)], [(ALICE, -2), (DAVE, -1)])
+
+
+def test_lap_out_of_range_is_rejected(standings):
+    with pytest.raises(ValueError):
+        standings.get_lap_order(0)
+    with pytest.raises(ValueError):
+        standings.get_lap_deltas(TOTAL_LAPS + 1)
+
+
+def test_empty_roster():
+    standings = StandingsIndex(ParticipantColumns.from_records([], TOTAL_LAPS))
+
+    assert len(standings) == 0
+    assert list(standings.get_lap_order(1)) == []
+    assert standings.get_final_movers() == ([], [])
+    assert standings.find_participant("team", "Red") is None
@@ -0,0 +1,136 @@
+"""Тесты записи и восстановления состояния."""
+import pytest
+
+from bot.state import StateManager
+from bot.state_store import SQLiteStateStore, StateWriter
+from bot.user_state import UserStateManager
+
+GENERATION = "2026-01-01 10:00:00"
+
+
+def attach_writer(store: SQLiteStateStore, chats: StateManager, users: UserStateManager) -> StateWriter:
+    """Подключает отложенную запись к менеджерам так же, как это делает Race."""
+    writer = StateWriter(store, user_row=users.get_row, chat_row=chats.get_row, interval=60, batch_size=1000)
+    users.on_change = writer.mark_user
+    chats.on_change = writer.mark_chat
+    return writer
+
+
+def restore(store: SQLiteStateStore):
+    """Восстанавливает менеджеры из хранилища."""
+    chats, users = StateManager(), UserStateManager()
+    chats.restore(store.load_chats())
+    users.restore(store.load_users())
+    return chats, users
+
+
+@pytest.mark.asyncio
+async def test_flushed_state_is_restored(tmp_path):
+    path = str(tmp_path / "state.db")
+    store = SQLiteStateStore(path, "main", GENERATION)
+    chats, users = StateManager(), UserStateManager()
+    writer = attach_writer(store, chats, users)
+
+    chats.activate_chat(-100)
+    chats.get_state(-100).mark_start_leaderboard_published()
+    chats.get_state(-100).mark_lap_published(1)
+    chats.get_state(-100).mark_lap_published(2)
+    users.set_language(7, "en")
+    users.start_tracking(7, "team", "Team 1")
+    users.mark_lap_sent(7, 2)
+    users.set_language(8, "ru")
+    users.reset_state(8)
+    assert writer.pending == 3
+
+    await writer.flush()
+    assert writer.pending == 0
+    store.close()
+
+    store = SQLiteStateStore(path, "main", GENERATION)
+    chats, users = restore(store)
+    store.close()
+
+    assert chats.active_chats == {-100}
+    state = chats.get_state(-100)
+    assert state.start_leaderboard_published
+    assert state.is_lap_published(2) and not state.is_lap_published(3)
+    assert users.get_row(7) == (7, "en", "team", "Team 1", 2, True)
+    assert users.get_row(8) is None
+    assert users.get_entity_trackers("team", "Team 1") == {7}
+
+
+@pytest.mark.asyncio
+async def test_stop_flushes_pending_changes(tmp_path):
+    path = str(tmp_path / "state.db")
+    store = SQLiteStateStore(path, "main", GENERATION)
+    chats, users = StateManager(), UserStateManager()
+    writer = attach_writer(store, chats, users)
+    writer.start()
+
+    chats.activate_chat(-100)
+    await writer.stop()
+    store.close()
+
+    store = SQLiteStateStore(path, "main", GENERATION)
+    assert [row[0] for row in store.load_chats()] == [-100]
+    store.close()
+
+
+def test_new_generation_keeps_subscriptions_only(tmp_path):
+    path = str(tmp_path / "state.db")
+    store = SQLiteStateStore(path, "main", GENERATION)
+    store.save(
+        [(7, "en", "team", "Team 1", 12, True)], [],
+        [(-100, True, True, 0b110, True), (-200, False, True, 0b10, False)], [],
+    )
+    store.close()
+
+    store = SQLiteStateStore(path, "main", "2026-02-01 10:00:00")
+    # Активные чаты и язык переносятся, прогресс прошлой гонки - нет
+    assert store.load_chats() == [(-100, True, False, 0, False)]
+    assert store.load_users() == [(7, "en", None, None, 0, False)]
+    store.close()
+
+
+def test_races_do_not_share_state(tmp_path):
+    path = str(tmp_path / "state.db")
+    main = SQLiteStateStore(path, "main", GENERATION)
+    main.save([], [], [(-100, True, False, 0, False)], [])
+    main.close()
+
+    other = SQLiteStateStore(path, "other", GENERATION)
+    assert other.load_chats() == []
+    other.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("lap_number", [1, 62, 63, 64, 200])
+async def test_high_lap_numbers_round_trip(tmp_path, lap_number):
+    path = str(tmp_path / "state.db")
+    store = SQLiteStateStore(path, "main", GENERATION)
+    chats, users = StateManager(), UserStateManager()
+    writer = attach_writer(store, chats, users)
+
+    chats.activate_chat(-100)
+    chats.get_state(-100).mark_lap_published(lap_number)
+    await writer.flush()
+    assert writer.errors == 0
+    store.close()
+
+    store = SQLiteStateStore(path, "main", GENERATION)
+    chats, _ = restore(store)
+    store.close()
+    state = chats.get_state(-100)
+    assert state.is_lap_published(lap_number)
+    assert not state.is_lap_published(lap_number - 1)
+
+
+def test_rows_carried_to_new_generation_have_no_published_laps(tmp_path):
+    path = str(tmp_path / "state.db")
+    store = SQLiteStateStore(path, "main", GENERATION)
+    store.save([], [], [(-100, True, True, 1 << 70, False)], [])
+    store.close()
+
+    store = SQLiteStateStore(path, "main", "2026-02-01 10:00:00")
+    assert store.load_chats() == [(-100, True, False, 0, False)]
+    store.close()
@@ -0,0 +1,117 @@
+"""Тесты пула процессов-шардов персональных лидерборд."""
+import asyncio
+import os
+import signal
+
+import pytest
+import pytest_asyncio
+
+from bot.leaderboard import render_user_leaderboard
+from bot.race_data import RaceSnapshot
+from bot.tracker_shards import TrackerShardPool
+
+from tests.data import make_participants
+
+LAP = 3
+
+
+class FakeUserState:
+    def __init__(self, user_id):
+        self.user_id = user_id
+
+
+@pytest.fixture
+def snapshot():
+    return RaceSnapshot.from_records(make_participants(40), 1, None)
+
+
+def make_groups(user_ids):
+    """Группа на каждого пользователя; пользователь N попадает в шард N % workers."""
+    return {
+        ("team", f"Team {user_id}", "ru"): [FakeUserState(user_id)]
+        for user_id in user_ids
+    }
+
+
+@pytest_asyncio.fixture
+async def pool():
+    pool = TrackerShardPool(2)
+    pool.start()
+    yield pool
+    await pool.stop()
+
+
+def expected_texts(snapshot, groups):
+    return {
+        key: render_user_leaderboard(snapshot.standings, LAP, key[0], key[1], key[2])
+        for key in groups
+    }
+
+
+@pytest.mark.asyncio
+async def test_render_matches_event_loop(pool, snapshot):
+    groups = make_groups(range(10))
+
+    texts = await pool.render("main", snapshot, LAP, groups, timeout=10)
+
+    assert texts == expected_texts(snapshot, groups)
+    assert pool.get_stats()["rendered"] == 10
+
+
+@pytest.mark.asyncio
+async def test_dead_idle_worker_is_restarted_before_render(pool, snapshot):
+    groups = make_groups(range(10))
+    process = pool._processes[0]
+    os.kill(process.pid, signal.SIGKILL)
+    await asyncio.to_thread(process.join, 5)
+
+    texts = await pool.render("main", snapshot, LAP, groups, timeout=10)
+
+    assert texts == expected_texts(snapshot, groups)
+    assert pool.restarts == 1
+    assert pool._processes[0] is not process and pool._processes[0].is_alive()
+
+
+@pytest.mark.asyncio
+async def test_worker_dying_mid_job_fails_render_and_is_restarted(pool, snapshot):
+    groups = make_groups([1])
+    process = pool._processes[1]
+    # Останавливаем процесс, чтобы задание гарантированно застало его живым
+    os.kill(process.pid, signal.SIGSTOP)
+
+    async def kill_later():
+        await asyncio.sleep(0.3)
+        os.kill(process.pid, signal.SIGKILL)
+
+    killer = asyncio.create_task(kill_later())
+    with pytest.raises(RuntimeError, match="процесс завершился"):
+        await pool.render("main", snapshot, LAP, groups, timeout=10)
+    await killer
+
+    assert pool.restarts == 1
+    assert pool.get_stats()["errors"] == 1
+    assert not pool._pending and not pool._job_shards
+    assert await pool.render("main", snapshot, LAP, groups, timeout=10) == expected_texts(snapshot, groups)
+
+
+@pytest.mark.asyncio
+async def test_hung_worker_times_out_and_is_restarted(pool, snapshot):
+    groups = make_groups(range(4))
+    hung = pool._processes[0]
+    healthy = pool._processes[1]
+    os.kill(hung.pid, signal.SIGSTOP)
+
+    with pytest.raises(asyncio.TimeoutError, match=r"\[0\]"):
+        await pool.render("main", snapshot, LAP, groups, timeout=0.5)
+
+    # Перезапускается только зависший шард
+    assert pool.restarts == 1
+    assert pool._processes[1] is healthy and pool._processes[0] is not hung
+    assert not pool._pending and not pool._job_shards
+    assert await pool.render("main", snapshot, LAP, groups, timeout=10) == expected_texts(snapshot, groups)
+
+
+@pytest.mark.asyncio
+async def test_render_requires_started_pool(snapshot):
+    with pytest.raises(RuntimeError, match="не запущен"):
+        await TrackerShardPool(1).render("main", snapshot, LAP, make_groups([0]), timeout=1)
@@ -0,0 +1,130 @@
+"""Тесты вторичных индексов менеджера состояний пользователей."""
+import random
+
+from bot.user_state import UserStateManager
+
+
+def assert_indexes_consistent(manager: UserStateManager):
+    """Сверяет индексы с полным перебором состояний."""
+    trackers = {
+        user_id: state for user_id, state in manager._states.items()
+        if state.is_tracking and state.entity_type and state.entity_value
+    }
+    by_entity, by_lap = {}, {}
+    for user_id, state in trackers.items():
+        by_entity.setdefault((state.entity_type, state.entity_value), set()).add(user_id)
+        by_lap.setdefault(state.last_sent_lap, set()).add(user_id)
+
+    assert manager._trackers == trackers
+    assert all(manager._trackers[user_id] is manager._states[user_id] for user_id in trackers)
+    assert manager._by_entity == by_entity
+    assert manager._by_last_sent_lap == by_lap
+
+
+def pending_ids(manager, lap_number):
+    return sorted(state.user_id for state in manager.get_pending_trackers(lap_number))
+
+
+def test_tracking_lifecycle_updates_indexes():
+    manager = UserStateManager()
+    manager.start_tracking(1, "team", "Red")
+    manager.start_tracking(2, "team", "Red")
+    manager.start_tracking(3, "account", "bob.near")
+    assert_indexes_consistent(manager)
+    assert manager.get_entity_trackers("team", "Red") == {1, 2}
+
+    manager.mark_lap_sent(1, 1)
+    manager.mark_lap_sent(3, 2)
+    assert_indexes_consistent(manager)
+    assert pending_ids(manager, 1) == [2]
+    assert pending_ids(manager, 2) == [1, 2]
+    assert pending_ids(manager, 3) == [1, 2, 3]
+
+    assert manager.stop_tracking(2) is True
+    assert manager.stop_tracking(2) is False
+    assert_indexes_consistent(manager)
+    assert manager.get_entity_trackers("team", "Red") == {1}
+    assert manager.tracker_count == 2
+
+    # Повторный старт переносит пользователя на новую сущность и сбрасывает круг
+    manager.start_tracking(1, "account", "bob.near")
+    assert_indexes_consistent(manager)
+    assert manager.get_entity_trackers("team", "Red") == set()
+    assert manager.get_entity_trackers("account", "bob.near") == {1, 3}
+    assert pending_ids(manager, 1) == [1]
+
+
+def test_mark_lap_sent_never_moves_backwards():
+    manager = UserStateManager()
+    manager.start_tracking(1, "team", "Red")
+    manager.mark_lap_sent(1, 5)
+    manager.mark_lap_sent(1, 3)
+    manager.mark_lap_sent(99, 3)
+
+    assert manager.get_state(1).last_sent_lap == 5
+    assert 99 not in manager._states
+    assert_indexes_consistent(manager)
+
+
+def test_restore_replaces_existing_states():
+    manager = UserStateManager()
+    manager.start_tracking(1, "team", "Red")
+    manager.start_tracking(2, "team", "Blue")
+
+    restored = manager.restore([
+        (1, "en", "account", "alice.near", 4, True),
+        (2, "ru", "team", "Blue", 2, False),
+        (3, "uk", "team", "Blue", 7, True),
+        (4, "ru", None, None, 0, False),
+    ])
+
+    assert restored == 4
+    assert_indexes_consistent(manager)
+    assert manager.get_entity_trackers("team", "Red") == set()
+    assert manager.get_entity_trackers("team", "Blue") == {3}
+    assert manager.get_entity_trackers("account", "alice.near") == {1}
+    assert pending_ids(manager, 8) == [1, 3]
+    assert manager.get_row(1) == (1, "en", "account", "alice.near", 4, True)
+
+
+def test_pending_groups_share_entity_and_language():
+    manager = UserStateManager()
+    for user_id, language in ((1, "ru"), (2, "ru"), (3, "en")):
+        manager.set_language(user_id, language)
+        manager.start_tracking(user_id, "team", "Red")
+    manager.mark_lap_sent(2, 1)
+
+    groups = manager.get_pending_groups(1)
+
+    assert {key: [state.user_id for state in states] for key, states in groups.items()} == {
+        ("team", "Red", "ru"): [1],
+        ("team", "Red", "en"): [3],
+    }
+
+
+def test_random_operations_keep_indexes_consistent():
+    rng = random.Random(7)
+    manager = UserStateManager()
+    changed = []
+    manager.on_change = changed.append
+    entities = [("team", "Red"), ("team", "Blue"), ("account", "alice.near")]
+
+    for _ in range(2000):
+        user_id = rng.randrange(30)
+        operation = rng.randrange(6)
+        if operation == 0:
+            manager.start_tracking(user_id, *rng.choice(entities))
+        elif operation == 1:
+            manager.mark_lap_sent(user_id, rng.randrange(1, 13))
+        elif operation == 2:
+            manager.stop_tracking(user_id)
+        elif operation == 3:
+            manager.set_tracked_entity(user_id, *rng.choice(entities))
+        elif operation == 4:
+            manager.reset_state(user_id)
+        else:
+            entity_type, entity_value = rng.choice(entities)
+            manager.restore([(user_id, "ru", entity_type, entity_value, rng.randrange(13), rng.random() < 0.5)])
+        assert_indexes_consistent(manager)
+
+    assert changed
@@ -0,0 +1,114 @@
+"""Тесты приёма обновлений через webhook с ограничением нагрузки."""
+import asyncio
+import time
+
+import pytest
+import pytest_asyncio
+from aiogram import Bot, Dispatcher
+from aiogram.types import Message
+from aiohttp import ClientSession, web
+from aiohttp.test_utils import TestServer
+
+from bot.webhook import RETRY_AFTER_SECONDS, WebhookRequestHandler
+
+PATH = "/webhook"
+
+
+def make_update(update_id: int, text: str = "hello") -> dict:
+    user = {"id": update_id, "is_bot": False, "first_name": "Racer"}
+    return {"update_id": update_id, "message": {
+        "message_id": update_id, "date": int(time.time()), "chat": {"id": update_id, "type": "private"},
+        "from": user, "text": text,
+    }}
+
+
+class GatedDispatcher:
+    """Диспетчер, обработчик которого ждёт разрешения и падает на тексте "fail"."""
+
+    def __init__(self):
+        self.dispatcher = Dispatcher()
+        self.gate = asyncio.Event()
+        self.running = 0
+        self.max_running = 0
+        self.dispatcher.message.register(self.handle)
+
+    async def handle(self, message: Message) -> None:
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await self.gate.wait()
+            if message.text == "fail":
+                raise RuntimeError("ошибка обработчика")
+        finally:
+            self.running -= 1
+
+
+@pytest_asyncio.fixture
+async def webhook():
+    """Запущенный webhook-сервер: (диспетчер, обработчик, функция отправки обновления)."""
+    gated = GatedDispatcher()
+    bot = Bot(token="42:TEST")
+    handler = WebhookRequestHandler(gated.dispatcher, bot, max_concurrency=1, max_pending=2)
+    app = web.Application()
+    handler.register(app, path=PATH)
+    async with TestServer(app) as server, ClientSession() as session:
+        async def post(update):
+            async with session.post(server.make_url(PATH), json=update) as response:
+                await response.read()
+                return response
+
+        yield gated, handler, post
+        gated.gate.set()
+        await handler.close()
+    await bot.session.close()
+
+
+@pytest.mark.asyncio
+async def test_rejects_with_retry_after_when_pending_is_full(webhook):
+    gated, handler, post = webhook
+
+    assert (await post(make_update(1))).status == 200
+    assert (await post(make_update(2))).status == 200
+    rejected = await post(make_update(3))
+
+    assert rejected.status == 503
+    assert rejected.headers["Retry-After"] == str(RETRY_AFTER_SECONDS)
+    assert handler.get_stats()["depth"] == 2
+
+    gated.gate.set()
+    await handler.close()
+    # После разгрузки повторная доставка принимается
+    assert (await post(make_update(3))).status == 200
+    await handler.close()
+
+    stats = handler.get_stats()
+    assert (stats["accepted"], stats["rejected"], stats["handled"], stats["depth"]) == (3, 1, 3, 0)
+    assert stats["max_depth"] == 2
+
+
+@pytest.mark.asyncio
+async def test_processes_at_most_max_concurrency_updates(webhook):
+    gated, handler, post = webhook
+
+    await post(make_update(1))
+    await post(make_update(2))
+    await asyncio.sleep(0.05)
+
+    assert gated.running == 1
+    gated.gate.set()
+    await handler.close()
+    assert gated.max_running == 1 and handler.handled == 2
+
+
+@pytest.mark.asyncio
+async def test_handler_error_is_counted(webhook):
+    gated, handler, post = webhook
+    gated.gate.set()
+
+    await post(make_update(1, "fail"))
+    await post(make_update(2))
+    await handler.close()
+
+    stats = handler.get_stats()
+    assert (stats["handled"], stats["errors"]) == (1, 1)
+    assert len(handler.latencies) == 1